@@ -0,0 +1,41 @@
+"""Import the integration's Home Assistant-free modules for benchmarking.
+
+The package __init__ imports Home Assistant, so the integration directory
+is mounted as a bare package and only the requested submodules are loaded.
+"""
+
+import importlib
+import json
+import pathlib
+import subprocess
+import sys
+import types
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+INTEGRATION_DIR = ROOT / "custom_components" / "starlight_ac_tuya"
+PACKAGE = "starlight_ac_tuya"
+
+
+def load(module: str):
+    """Return custom_components/starlight_ac_tuya/<module>.py as a module."""
+    if PACKAGE not in sys.modules:
+        package = types.ModuleType(PACKAGE)
+        package.__path__ = [str(INTEGRATION_DIR)]
+        sys.modules[PACKAGE] = package
+    return importlib.import_module(f"{PACKAGE}.{module}")
+
+
+def version_info() -> dict:
+    """Integration version and git revision, to label result files."""
+    manifest = json.loads((INTEGRATION_DIR / "manifest.json").read_text())
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {"version": manifest.get("version"), "git_revision": revision}
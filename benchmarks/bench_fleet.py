@@ -0,0 +1,320 @@
+"""Fleet-scale benchmark of the Tuya API client against the mock cloud.
+
+For each fleet size this measures:
+
+- setup: token plus a first status read per device, one after another as
+  async_setup_entry's first refreshes are, and device discovery
+- steady-state polling: every device polled on an interval the way its
+  coordinator polls (subscribed DP codes via the shadow API by default),
+  reporting throughput, poll latency, client CPU per device and event
+  loop lag
+- command latency: sequential commands, then one burst to every device
+- shutdown: async_close while a poll per device is in flight
+
+The mock cloud runs in a subprocess so its CPU time is not counted.
+Results are written as JSON; --compare prints changes against an earlier
+results file.
+
+    python benchmarks/bench_fleet.py --devices 5,50,500 --output bench.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import pathlib
+import platform
+import random
+import sys
+import time
+
+import _integration
+from mock_tuya_cloud import CLIENT_ID, CLIENT_SECRET, MockCloudProcess, device_ids
+
+tuya_api = _integration.load("tuya_api")
+metrics = _integration.load("metrics")
+
+# DP codes the climate, switch and select entities subscribe to
+POLL_CODES = [
+    "switch",
+    "mode",
+    "temp_set",
+    "temp_current",
+    "ai_eco_switch",
+    "health",
+    "beep",
+    "light",
+    "fan_speed_enum",
+    "sleep_enum",
+    "gear_vertical",
+    "gear_horizontal",
+]
+
+# Sampling period of the event loop lag probe (seconds)
+LAG_PROBE_INTERVAL = 0.05
+
+
+def new_client(url: str, max_concurrent: int):
+    api = tuya_api.TuyaAPI(CLIENT_ID, CLIENT_SECRET, base_url=url)
+    api.configure(max_concurrent_requests=max_concurrent)
+    return api
+
+
+async def poll(api, device_id: str, poll_api: str):
+    """Read one device the way its coordinator does."""
+    if poll_api == "shadow":
+        return await api.async_get_shadow_properties(device_id, POLL_CODES)
+    return await api.async_get_status(device_id)
+
+
+class LagProbe:
+    """Measure how late the event loop runs a periodic timer."""
+
+    def __init__(self):
+        self.histogram = metrics.LatencyHistogram()
+        self._task: asyncio.Task | None = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + LAG_PROBE_INTERVAL
+            await asyncio.sleep(LAG_PROBE_INTERVAL)
+            self.histogram.add(max(0.0, loop.time() - expected))
+
+    def __enter__(self):
+        self._task = asyncio.ensure_future(self._run())
+        return self
+
+    def __exit__(self, *exc):
+        self._task.cancel()
+
+
+async def bench_setup(url: str, ids: list, args) -> dict:
+    api = new_client(url, args.max_concurrent)
+    try:
+        started = time.perf_counter()
+        for device_id in ids:
+            await poll(api, device_id, "status")
+        setup = time.perf_counter() - started
+
+        started = time.perf_counter()
+        listed = await api.async_list_devices(category="kt")
+        discovery = time.perf_counter() - started
+    finally:
+        await api.async_close()
+    return {
+        "setup_s": round(setup, 3),
+        "setup_per_device_ms": round(setup / len(ids) * 1000, 2),
+        "discovery_s": round(discovery, 3),
+        "discovered": len(listed),
+    }
+
+
+async def bench_polling(url: str, ids: list, args) -> dict:
+    api = new_client(url, args.max_concurrent)
+    latency = metrics.LatencyHistogram()
+    counts = {"polls": 0, "errors": 0}
+    rng = random.Random(1)
+    try:
+        await api.async_get_token()
+        loop = asyncio.get_running_loop()
+        end = loop.time() + args.duration
+
+        async def _device(device_id):
+            # Coordinators start at different times; spread the first polls
+            await asyncio.sleep(rng.uniform(0, min(args.poll_interval, args.duration)))
+            while loop.time() < end:
+                started = loop.time()
+                try:
+                    await poll(api, device_id, args.poll_api)
+                    latency.add(loop.time() - started)
+                    counts["polls"] += 1
+                except Exception:
+                    counts["errors"] += 1
+                next_poll = started + args.poll_interval
+                if next_poll >= end:
+                    break
+                await asyncio.sleep(max(0.0, next_poll - loop.time()))
+
+        cpu_started = time.process_time()
+        wall_started = time.perf_counter()
+        with LagProbe() as lag:
+            await asyncio.gather(*(_device(device_id) for device_id in ids))
+        wall = time.perf_counter() - wall_started
+        cpu = time.process_time() - cpu_started
+    finally:
+        await api.async_close()
+    polls = counts["polls"]
+    return {
+        "duration_s": round(wall, 2),
+        "polls": polls,
+        "errors": counts["errors"],
+        "throughput_per_s": round(polls / wall, 2),
+        "target_per_s": round(len(ids) / args.poll_interval, 2),
+        "latency": latency.summary(),
+        "cpu_s": round(cpu, 3),
+        "cpu_ms_per_device_per_s": round(cpu / wall / len(ids) * 1000, 4),
+        "cpu_us_per_poll": round(cpu / polls * 1e6, 1) if polls else None,
+        "loop_lag": lag.histogram.summary(),
+        "concurrency": api.get_concurrency_stats(),
+    }
+
+
+async def bench_commands(url: str, ids: list, args) -> dict:
+    api = new_client(url, args.max_concurrent)
+    commands = [{"code": "temp_set", "value": 2300}]
+    sequential = metrics.LatencyHistogram()
+    burst = metrics.LatencyHistogram()
+    try:
+        await api.async_get_token()
+        for i in range(args.commands):
+            started = time.perf_counter()
+            await api.async_send_command(ids[i % len(ids)], commands)
+            sequential.add(time.perf_counter() - started)
+
+        async def _command(device_id):
+            started = time.perf_counter()
+            await api.async_send_command(device_id, commands)
+            burst.add(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(_command(device_id) for device_id in ids), return_exceptions=True
+        )
+        burst_wall = time.perf_counter() - started
+    finally:
+        await api.async_close()
+    return {
+        "sequential": sequential.summary(),
+        "burst": burst.summary(),
+        "burst_wall_s": round(burst_wall, 3),
+        "burst_errors": sum(isinstance(r, Exception) for r in results),
+    }
+
+
+async def bench_shutdown(url: str, ids: list, args) -> dict:
+    api = new_client(url, args.max_concurrent)
+    await api.async_get_token()
+    tasks = [asyncio.ensure_future(poll(api, did, args.poll_api)) for did in ids]
+    await asyncio.sleep(0.01)
+    started = time.perf_counter()
+    await api.async_close()
+    close = time.perf_counter() - started
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    return {
+        "close_s": round(close, 4),
+        "aborted": sum(isinstance(r, tuya_api.TuyaAPIClosedError) for r in results),
+        "leftover_tasks": len([t for t in api._tasks if not t.done()]),
+    }
+
+
+async def run_fleet(devices: int, args) -> dict:
+    ids = device_ids(devices)
+    result = {"devices": devices}
+    with MockCloudProcess(devices, args.latency_ms, args.jitter) as server:
+        print(f"[{devices} devices] setup...", file=sys.stderr)
+        result["setup"] = await bench_setup(server.url, ids, args)
+        print(f"[{devices} devices] polling for {args.duration}s...", file=sys.stderr)
+        result["polling"] = await bench_polling(server.url, ids, args)
+        print(f"[{devices} devices] commands...", file=sys.stderr)
+        result["commands"] = await bench_commands(server.url, ids, args)
+        result["shutdown"] = await bench_shutdown(server.url, ids, args)
+        result["server"] = await server.stats()
+    return result
+
+
+def flatten(value, prefix="") -> dict:
+    """Flatten nested results to {"a.b.c": number}."""
+    if isinstance(value, dict):
+        flat = {}
+        for key, item in value.items():
+            flat.update(flatten(item, f"{prefix}{key}."))
+        return flat
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return {prefix[:-1]: value}
+    return {}
+
+
+def compare(baseline: dict, current: dict):
+    """Print metrics that changed by more than 5% against a baseline file."""
+    runs = {run["devices"]: run for run in baseline.get("runs", [])}
+    for run in current["runs"]:
+        base = runs.get(run["devices"])
+        if base is None:
+            continue
+        print(f"\n{run['devices']} devices (baseline {baseline['meta']['revision']})")
+        old, new = flatten(base), flatten(run)
+        for key in sorted(new):
+            if key not in old or not old[key]:
+                continue
+            change = (new[key] - old[key]) / abs(old[key]) * 100
+            if abs(change) >= 5:
+                print(f"  {key:50} {old[key]:>12} -> {new[key]:>12} ({change:+.1f}%)")
+
+
+async def main_async(args) -> dict:
+    runs = []
+    for devices in args.devices:
+        runs.append(await run_fleet(devices, args))
+    version = _integration.version_info()
+    return {
+        "meta": {
+            "benchmark": "fleet",
+            "version": version["version"],
+            "revision": version["git_revision"],
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": {
+                key: value for key, value in vars(args).items() if key != "compare"
+            },
+        },
+        "runs": runs,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "--devices",
+        type=lambda value: [int(n) for n in value.split(",")],
+        default=[5, 50, 500],
+        help="comma-separated fleet sizes (default 5,50,500)",
+    )
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--duration", type=float, default=20, help="polling seconds")
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=5,
+        help="seconds between polls of one device (compressed from 120)",
+    )
+    parser.add_argument("--poll-api", choices=["shadow", "status"], default="shadow")
+    parser.add_argument("--commands", type=int, default=20)
+    parser.add_argument(
+        "--max-concurrent", type=int, default=tuya_api.MAX_CONCURRENT_REQUESTS
+    )
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="results file to compare against")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.ERROR)
+
+    results = asyncio.run(main_async(args))
+    text = json.dumps(results, indent=2)
+    if args.output:
+        pathlib.Path(args.output).write_text(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        compare(json.loads(pathlib.Path(args.compare).read_text()), results)
+
+
+if __name__ == "__main__":
+    main()
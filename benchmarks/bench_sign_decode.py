@@ -0,0 +1,138 @@
+"""Microbenchmark for request signing and response decoding.
+
+Times the API client's signing (HMAC state keyed once and copied) and JSON
+decoding from bytes, with orjson and with the stdlib fallback used when
+orjson isn't installed, against the implementation they replaced (HMAC
+re-keyed per request, body read as text then parsed). The response is a
+status reply with --dps data points.
+
+Only the orjson path decodes faster; the stdlib fallback runs the same
+decode-then-parse as before, so decode_stdlib_us and decode_before_us
+differ by noise alone.
+
+    python benchmarks/bench_sign_decode.py
+    python benchmarks/bench_sign_decode.py --number 500000 --output codec.json
+"""
+
+import argparse
+import hashlib
+import hmac
+import json
+import pathlib
+import platform
+import time
+import timeit
+
+import _integration
+from mock_tuya_cloud import CLIENT_ID, CLIENT_SECRET
+
+tuya_api = _integration.load("tuya_api")
+
+TOKEN = "bench-access-token-0123456789abcdef"
+TIMESTAMP = "1700000000000"
+COMMAND_PATH = "/v1.0/iot-03/devices/bench000000/commands"
+COMMAND_BODY = json.dumps({"commands": [{"code": "temp_set", "value": 24}]})
+
+
+def status_response(dps: int) -> bytes:
+    result = [{"code": f"dp_{index}", "value": index * 10} for index in range(dps)]
+    return json.dumps(
+        {"result": result, "success": True, "t": 1700000000000, "tid": "bench"}
+    ).encode()
+
+
+def sign_before() -> str:
+    """Signing as done before the HMAC state was cached."""
+    content_hash = hashlib.sha256(COMMAND_BODY.encode()).hexdigest()
+    string_to_sign = "POST" + "\n" + content_hash + "\n\n" + COMMAND_PATH
+    sign_msg = CLIENT_ID + TOKEN + TIMESTAMP + string_to_sign
+    return (
+        hmac.new(CLIENT_SECRET.encode(), sign_msg.encode(), hashlib.sha256)
+        .hexdigest()
+        .upper()
+    )
+
+
+def sign_now(api) -> str:
+    """Signing as done by TuyaAPI._async_send_request."""
+    string_to_sign = f"POST\n{api._sha256(COMMAND_BODY)}\n\n{COMMAND_PATH}"
+    return api._sign(f"{api.client_id}{api.token}{TIMESTAMP}{string_to_sign}")
+
+
+def decode_before(raw: bytes):
+    """Decoding as done before bodies were read as bytes (resp.text())."""
+    return json.loads(raw.decode("utf-8"))
+
+
+def measure(func, number: int, repeat: int) -> float:
+    """Best time per call over `repeat` runs, in microseconds."""
+    return round(
+        min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1e6, 3
+    )
+
+
+def run(args) -> dict:
+    api = tuya_api.TuyaAPI(CLIENT_ID, CLIENT_SECRET)
+    api.token = TOKEN
+    if sign_now(api) != sign_before():
+        raise SystemExit("Signature differs from the previous implementation")
+    raw = status_response(args.dps)
+
+    results = {
+        "sign_before_us": measure(sign_before, args.number, args.repeat),
+        "sign_us": measure(lambda: sign_now(api), args.number, args.repeat),
+        "decode_before_us": measure(
+            lambda: decode_before(raw), args.number, args.repeat
+        ),
+        "decode_orjson_us": None,
+    }
+    if tuya_api.orjson is not None:
+        results["decode_orjson_us"] = measure(
+            lambda: tuya_api._json_loads(raw), args.number, args.repeat
+        )
+    # The fallback the client uses when orjson can't be imported
+    orjson, tuya_api.orjson = tuya_api.orjson, None
+    try:
+        if tuya_api._json_loads(raw) != decode_before(raw):
+            raise SystemExit("Decoded response differs")
+        results["decode_stdlib_us"] = measure(
+            lambda: tuya_api._json_loads(raw), args.number, args.repeat
+        )
+    finally:
+        tuya_api.orjson = orjson
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--number", type=int, default=200000, help="calls per run")
+    parser.add_argument("--repeat", type=int, default=5, help="runs; best is kept")
+    parser.add_argument("--dps", type=int, default=30, help="DPs in the response")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    version = _integration.version_info()
+    results = {
+        "meta": {
+            "benchmark": "sign_decode",
+            "version": version["version"],
+            "revision": version["git_revision"],
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "results": run(args),
+    }
+    text = json.dumps(results, indent=2)
+    if args.output:
+        pathlib.Path(args.output).write_text(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Check that closing the Tuya API client is prompt with polls in flight.
+
+Starts one status poll per device against the mock cloud while it hangs
+every request (slow), truncates every response so the polls sit in retry
+backoff (truncated), or answers half the requests with a 5xx and hangs
+the rest (server_error), then times TuyaAPI.async_close(). Fails unless
+each close takes under --limit seconds and leaves no poll or client task
+running, or if no poll was still pending when it started.
+
+This covers the API client only, the first and only cloud-facing step of
+async_unload_entry. Benchmarks run without Home Assistant, so the rest of
+the config entry unload is not exercised: coordinator shutdown, the
+online-check and discovery timers, and unloading the platforms. It does not
+show that reloading a config entry during an outage is bounded.
+
+    python benchmarks/check_shutdown.py
+    python benchmarks/check_shutdown.py --devices 200 --limit 0.5
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import time
+
+import _integration
+from mock_tuya_cloud import CLIENT_ID, CLIENT_SECRET, MockCloudProcess, device_ids
+
+tuya_api = _integration.load("tuya_api")
+
+SCENARIOS = {
+    "hanging": {"slow": 1},
+    "backoff": {"truncated": 1},
+    "server_error": {"server_error": 0.5, "slow": 1},
+}
+
+
+async def check(server, ids: list, faults: dict, settle: float) -> dict:
+    """Close a client with one poll per device pending; return the outcome."""
+    api = tuya_api.TuyaAPI(CLIENT_ID, CLIENT_SECRET, base_url=server.url)
+    # Fetch the token while healthy so the polls reach the faulty endpoint
+    await server.set_faults({})
+    await api.async_get_token()
+    await server.set_faults(faults, slow_seconds=60)
+    polls = [asyncio.create_task(api.async_get_status(did)) for did in ids]
+    await asyncio.sleep(settle)
+    pending = sum(not poll.done() for poll in polls)
+
+    started = time.perf_counter()
+    await api.async_close()
+    elapsed = time.perf_counter() - started
+    # Let the cancelled polls see their exceptions
+    await asyncio.sleep(0)
+    results = await asyncio.gather(*polls, return_exceptions=True)
+    return {
+        "pending_at_close": pending,
+        "close_s": round(elapsed, 3),
+        "polls_running": sum(not poll.done() for poll in polls),
+        "client_tasks_running": sum(not task.done() for task in api._tasks),
+        "closed_errors": sum(
+            isinstance(result, tuya_api.TuyaAPIClosedError) for result in results
+        ),
+    }
+
+
+async def run(args) -> dict:
+    ids = device_ids(args.devices)
+    results = {}
+    with MockCloudProcess(args.devices, args.latency_ms, 0) as server:
+        for name, faults in SCENARIOS.items():
+            results[name] = await check(server, ids, faults, args.settle)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--devices", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument(
+        "--settle", type=float, default=0.5, help="seconds of polling before close"
+    )
+    parser.add_argument("--limit", type=float, default=1.0, help="seconds per close")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.CRITICAL)
+
+    failed = False
+    for name, result in asyncio.run(run(args)).items():
+        ok = (
+            result["pending_at_close"]
+            and result["close_s"] < args.limit
+            and not result["polls_running"]
+            and not result["client_tasks_running"]
+        )
+        failed |= not ok
+        print(f"{'ok' if ok else 'FAIL':4} {name}: {result}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
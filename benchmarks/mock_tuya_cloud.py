@@ -0,0 +1,476 @@
+"""Local stand-in for the Tuya OpenAPI endpoints the integration uses.
+
+Serves token, status (single and batched), shadow properties, commands,
+device listing and bulk device info for a synthetic fleet of AC devices.
+Every request's HMAC signature is checked the same way the cloud does,
+responses can be delayed to simulate cloud latency, and a FaultInjector can
+make requests fail the way a degraded cloud does.
+
+Run standalone:
+
+    python benchmarks/mock_tuya_cloud.py --devices 50 --latency-ms 80
+
+or embed it with MockTuyaCloud(...).start().
+"""
+
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import random
+import subprocess
+import sys
+import time
+
+import aiohttp
+from aiohttp import web
+
+CLIENT_ID = "bench-client-id"
+CLIENT_SECRET = "bench-client-secret"
+TOKEN_TTL = 7200
+
+EMPTY_BODY_SHA256 = hashlib.sha256(b"").hexdigest()
+
+
+def device_ids(count: int) -> list:
+    """IDs of the synthetic fleet, in listing order."""
+    return [f"bench{i:06d}" for i in range(count)]
+
+
+def _initial_state(index: int) -> dict:
+    return {
+        "switch": index % 2 == 0,
+        "mode": "1",
+        "temp_set": 2400,
+        "temp_current": 2600 + index % 50,
+        "fan_speed_enum": "0",
+        "gear_vertical": "1",
+        "gear_horizontal": "11",
+        "ai_eco_switch": False,
+        "health": False,
+        "beep": True,
+        "light": True,
+        "sleep_enum": "0",
+    }
+
+
+# Truncated 200 response, as seen when the cloud drops a connection mid-body
+TRUNCATED_BODY = b'{"success":true,"result":[{"code":"switch","val'
+
+
+class FaultInjector:
+    """Probabilistic faults for MockTuyaCloud.
+
+    `rates` maps a fault to the probability that it hits a request:
+
+    - token_invalid: code 1010 on token-bearing requests (a token storm)
+    - server_error: HTTP 500, 502 or 503
+    - slow: an extra `slow_seconds` delay before a normal response
+    - truncated: a 200 response whose JSON body is cut short
+    """
+
+    FAULTS = ("token_invalid", "server_error", "slow", "truncated")
+
+    def __init__(self, seed: int | None = None):
+        self.rates: dict[str, float] = {}
+        self.slow_seconds = 5.0
+        self.injected: dict[str, int] = {}
+        self._random = random.Random(seed)
+
+    def configure(self, rates: dict, slow_seconds: float | None = None):
+        unknown = set(rates) - set(self.FAULTS)
+        if unknown:
+            raise ValueError(f"Unknown faults: {sorted(unknown)}")
+        self.rates = {name: float(rate) for name, rate in rates.items() if rate}
+        if slow_seconds is not None:
+            self.slow_seconds = slow_seconds
+
+    def _hit(self, name: str) -> bool:
+        rate = self.rates.get(name)
+        if not rate or self._random.random() >= rate:
+            return False
+        self.injected[name] = self.injected.get(name, 0) + 1
+        return True
+
+    async def __call__(self, request: web.Request, endpoint: str):
+        if not self.rates:
+            return None
+        if endpoint != "token" and self._hit("token_invalid"):
+            return _error(1010, "token invalid")
+        if self._hit("server_error"):
+            return web.Response(status=self._random.choice((500, 502, 503)))
+        if self._hit("truncated"):
+            return web.Response(body=TRUNCATED_BODY, content_type="application/json")
+        if self._hit("slow"):
+            await asyncio.sleep(self.slow_seconds)
+        return None
+
+
+class MockTuyaCloud:
+    """aiohttp application emulating the Tuya cloud for one project.
+
+    Args:
+        devices: Number of AC devices in the fleet.
+        latency: Mean response delay in seconds.
+        jitter: Relative +/- spread of the delay (0.2 = +/-20%).
+        verify_signatures: Reject badly signed requests with code 1004.
+    """
+
+    def __init__(
+        self,
+        devices: int = 10,
+        latency: float = 0.05,
+        jitter: float = 0.2,
+        client_id: str = CLIENT_ID,
+        client_secret: str = CLIENT_SECRET,
+        verify_signatures: bool = True,
+        seed: int | None = None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.verify_signatures = verify_signatures
+        self._random = random.Random(seed)
+        self.devices = {
+            device_id: _initial_state(i)
+            for i, device_id in enumerate(device_ids(devices))
+        }
+        # Last report time (ms) per device and DP code
+        now = int(time.time() * 1000)
+        self.report_times = {
+            device_id: {code: now for code in state}
+            for device_id, state in self.devices.items()
+        }
+        self.tokens: dict[str, float] = {}
+        # Requests served per endpoint and rejected signatures
+        self.requests: dict[str, int] = {}
+        self.signature_failures = 0
+        # Coroutine function (request, endpoint) -> web.Response | None
+        # consulted before each request; a response short-circuits it.
+        self.fault = FaultInjector(seed)
+        self._runner: web.AppRunner | None = None
+        self.url: str | None = None
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/v1.0/token", self._token)
+        app.router.add_get("/v1.0/iot-03/devices/status", self._status_batch)
+        app.router.add_get("/v1.0/iot-03/devices/{device_id}/status", self._status)
+        app.router.add_post("/v1.0/iot-03/devices/{device_id}/commands", self._commands)
+        app.router.add_get(
+            "/v2.0/cloud/thing/{device_id}/shadow/properties", self._shadow
+        )
+        app.router.add_get("/v2.0/cloud/thing/device", self._listing)
+        app.router.add_get("/v2.0/cloud/thing/batch", self._batch)
+        # Unsigned, for harnesses running the server in another process
+        app.router.add_get("/_mock/stats", self._stats)
+        app.router.add_post("/_mock/faults", self._faults)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start serving; returns the base URL."""
+        self._runner = web.AppRunner(self.app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def stats(self) -> dict:
+        return {
+            "requests": dict(self.requests),
+            "total_requests": sum(self.requests.values()),
+            "signature_failures": self.signature_failures,
+            "faults_injected": dict(getattr(self.fault, "injected", {})),
+        }
+
+    # -- request plumbing -------------------------------------------------
+
+    def _string_to_sign(self, request: web.Request, body: str) -> str:
+        path = request.path
+        if path.startswith("/v2.0/"):
+            # v2.0: empty-body hash and sorted query parameters
+            query = "&".join(f"{k}={v}" for k, v in sorted(request.query.items()))
+            path_with_query = f"{path}?{query}" if query else path
+            return f"{request.method}\n{EMPTY_BODY_SHA256}\n\n{path_with_query}"
+        # v1.0: body hash and the path as sent
+        path_with_query = request.path_qs
+        body_hash = hashlib.sha256(body.encode()).hexdigest()
+        return f"{request.method}\n{body_hash}\n\n{path_with_query}"
+
+    def _signature_ok(self, request: web.Request, body: str, token: bool) -> bool:
+        headers = request.headers
+        if headers.get("client_id") != self.client_id:
+            return False
+        access_token = headers.get("access_token", "") if token else ""
+        message = (
+            f"{self.client_id}{access_token}{headers.get('t', '')}"
+            f"{self._string_to_sign(request, body)}"
+        )
+        expected = (
+            hmac.new(self.client_secret.encode(), message.encode(), hashlib.sha256)
+            .hexdigest()
+            .upper()
+        )
+        return hmac.compare_digest(expected, headers.get("sign", ""))
+
+    async def _prepare(self, request: web.Request, endpoint: str, token=True):
+        """Count, delay, inject faults and authenticate a request.
+
+        Returns (error response or None, request body).
+        """
+        self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+        body = await request.text()
+        if self.latency:
+            spread = self.latency * self.jitter
+            await asyncio.sleep(
+                max(0.0, self._random.uniform(-spread, spread) + self.latency)
+            )
+        if self.fault is not None:
+            response = await self.fault(request, endpoint)
+            if response is not None:
+                return response, body
+        if self.verify_signatures and not self._signature_ok(request, body, token):
+            self.signature_failures += 1
+            return _error(1004, "sign invalid"), body
+        if token:
+            expiry = self.tokens.get(request.headers.get("access_token", ""))
+            if expiry is None or expiry < time.time():
+                return _error(1010, "token invalid"), body
+        return None, body
+
+    # -- endpoints --------------------------------------------------------
+
+    async def _stats(self, request):
+        return web.json_response(self.stats())
+
+    async def _faults(self, request):
+        """Set fault rates: {"rates": {...}, "slow_seconds": n}."""
+        config = await request.json()
+        try:
+            self.fault.configure(config.get("rates", {}), config.get("slow_seconds"))
+        except ValueError as err:
+            return web.json_response({"error": str(err)}, status=400)
+        return web.json_response({"rates": self.fault.rates})
+
+    async def _token(self, request):
+        error, _ = await self._prepare(request, "token", token=False)
+        if error is not None:
+            return error
+        access_token = f"tok-{len(self.tokens)}-{self._random.getrandbits(32):08x}"
+        self.tokens[access_token] = time.time() + TOKEN_TTL
+        return _ok({"access_token": access_token, "expire_time": TOKEN_TTL})
+
+    async def _status(self, request):
+        error, _ = await self._prepare(request, "status")
+        if error is not None:
+            return error
+        state = self.devices.get(request.match_info["device_id"])
+        if state is None:
+            return _error(2001, "device is offline")
+        return _ok([{"code": code, "value": value} for code, value in state.items()])
+
+    async def _status_batch(self, request):
+        error, _ = await self._prepare(request, "status_batch")
+        if error is not None:
+            return error
+        ids = request.query.get("device_ids", "").split(",")
+        return _ok(
+            [
+                {
+                    "id": did,
+                    "status": [
+                        {"code": code, "value": value}
+                        for code, value in self.devices[did].items()
+                    ],
+                }
+                for did in ids
+                if did in self.devices
+            ]
+        )
+
+    async def _shadow(self, request):
+        error, _ = await self._prepare(request, "shadow")
+        if error is not None:
+            return error
+        device_id = request.match_info["device_id"]
+        state = self.devices.get(device_id)
+        if state is None:
+            return _error(2001, "device is offline")
+        codes = request.query.get("codes", "")
+        wanted = codes.split(",") if codes else list(state)
+        times = self.report_times[device_id]
+        return _ok(
+            {
+                "properties": [
+                    {"code": code, "value": state[code], "time": times[code]}
+                    for code in wanted
+                    if code in state
+                ]
+            }
+        )
+
+    async def _commands(self, request):
+        error, body = await self._prepare(request, "command")
+        if error is not None:
+            return error
+        device_id = request.match_info["device_id"]
+        state = self.devices.get(device_id)
+        if state is None:
+            return _error(2001, "device is offline")
+        try:
+            commands = json.loads(body)["commands"]
+        except (ValueError, KeyError, TypeError):
+            return _error(1109, "param is illegal")
+        now = int(time.time() * 1000)
+        for command in commands:
+            state[command["code"]] = command["value"]
+            self.report_times[device_id][command["code"]] = now
+        return _ok(True)
+
+    async def _listing(self, request):
+        error, _ = await self._prepare(request, "listing")
+        if error is not None:
+            return error
+        page_size = int(request.query.get("page_size", 20))
+        ids = list(self.devices)
+        start = 0
+        last_id = request.query.get("last_id")
+        if last_id in self.devices:
+            start = ids.index(last_id) + 1
+        return _ok([_device_record(did) for did in ids[start : start + page_size]])
+
+    async def _batch(self, request):
+        error, _ = await self._prepare(request, "batch")
+        if error is not None:
+            return error
+        ids = request.query.get("device_ids", "").split(",")
+        unknown = [did for did in ids if did not in self.devices]
+        if unknown:
+            return _error(1106, "permission deny")
+        return _ok([_device_record(did) for did in ids])
+
+
+def _device_record(device_id: str) -> dict:
+    return {
+        "id": device_id,
+        "name": f"Bench AC {device_id[-4:]}",
+        "category": "kt",
+        "productId": "benchproduct",
+        "isOnline": True,
+    }
+
+
+def _ok(result) -> web.Response:
+    return web.json_response(
+        {"success": True, "result": result, "t": int(time.time() * 1000)}
+    )
+
+
+def _error(code: int, msg: str) -> web.Response:
+    return web.json_response(
+        {"success": False, "code": code, "msg": msg, "t": int(time.time() * 1000)}
+    )
+
+
+class MockCloudProcess:
+    """Mock cloud in a subprocess, for the duration of a `with` block.
+
+    Keeps the server's CPU time and allocations out of the measuring
+    process; it is controlled over the unsigned /_mock endpoints.
+    """
+
+    def __init__(self, devices: int, latency_ms: float, jitter: float, seed=1):
+        self.args = [
+            sys.executable,
+            __file__,
+            "--devices",
+            str(devices),
+            "--latency-ms",
+            str(latency_ms),
+            "--jitter",
+            str(jitter),
+            "--seed",
+            str(seed),
+        ]
+        self.process: subprocess.Popen | None = None
+        self.url: str | None = None
+
+    def __enter__(self):
+        self.process = subprocess.Popen(
+            self.args, stdout=subprocess.PIPE, text=True, bufsize=1
+        )
+        line = self.process.stdout.readline()
+        if not line.startswith("listening on "):
+            self.process.kill()
+            raise RuntimeError(f"Mock cloud failed to start: {line!r}")
+        self.url = line.split()[-1]
+        return self
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        self.process.wait(timeout=10)
+
+    async def stats(self) -> dict:
+        async with (
+            aiohttp.ClientSession() as session,
+            session.get(f"{self.url}/_mock/stats") as resp,
+        ):
+            return await resp.json()
+
+    async def set_faults(self, rates: dict, slow_seconds: float | None = None):
+        async with (
+            aiohttp.ClientSession() as session,
+            session.post(
+                f"{self.url}/_mock/faults",
+                json={"rates": rates, "slow_seconds": slow_seconds},
+            ) as resp,
+        ):
+            resp.raise_for_status()
+
+
+async def _serve(args):
+    cloud = MockTuyaCloud(
+        devices=args.devices,
+        latency=args.latency_ms / 1000,
+        jitter=args.jitter,
+        verify_signatures=not args.no_verify,
+        seed=args.seed,
+    )
+    url = await cloud.start(args.host, args.port)
+    # Parent processes wait for this line
+    print(f"listening on {url}", flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await cloud.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--devices", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument(
+        "--no-verify", action="store_true", help="skip signature checks"
+    )
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""Replay a recorded cassette through the Tuya API client, offline.
+
+Cassettes come from the integration's record_cassette service or
+tuya_status.py --cassette-record (or --record here, against the mock cloud).
+Each recorded request is replayed at its recorded offset, with the
+cassette answering instead of the cloud. Status, shadow property, command
+and device lookup requests go through the TuyaAPI method the integration
+calls for them (token refresh on 1010, request gate, signing, shared GETs,
+JSON decoding, error handling, metrics); anything else is re-issued as a
+raw request. --speed compresses both the schedule and the response times;
+--speed 0 replays everything back to back, --concurrency requests at a
+time, without delays.
+
+This replays the API client, not the whole integration: coordinators and
+entities need Home Assistant, so their code (polling schedule, the choice
+between shadow properties and full status, stale-state handling, command
+building) is not run. Their recorded requests are replayed as they were
+made.
+
+    python benchmarks/replay.py starlight_ac_tuya_cassette_20260101.ndjson.gz
+    python benchmarks/replay.py cassette.ndjson.gz --speed 0 --output replay.json
+
+    # Record a cassette from the mock cloud, e.g. to try this script
+    python benchmarks/replay.py --record mock.ndjson.gz --devices 20 --duration 30
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import pathlib
+import sys
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import _integration
+from mock_tuya_cloud import CLIENT_ID, CLIENT_SECRET, MockCloudProcess, device_ids
+
+tuya_api = _integration.load("tuya_api")
+cassette = _integration.load("cassette")
+metrics = _integration.load("metrics")
+
+# Requested by the client itself (before replaying) rather than re-issued
+SKIPPED_PATHS = ("/v1.0/token",)
+
+
+def client_call(api, item) -> tuple:
+    """Return (kind, coroutine) of the TuyaAPI call behind a recorded request."""
+    method = item["method"]
+    url = urlsplit(item["path"])
+    query = parse_qs(url.query)
+    parts = url.path.strip("/").split("/")
+    if parts[:3] == ["v1.0", "iot-03", "devices"] and len(parts) == 5:
+        device_id = parts[3]
+        if method == "GET" and parts[4] == "status":
+            return "status", api.async_get_status(device_id)
+        if method == "POST" and parts[4] == "commands":
+            body = json.loads(item.get("body") or "{}")
+            return "command", api.async_send_command(device_id, body["commands"])
+    if parts[:3] == ["v2.0", "cloud", "thing"] and method == "GET":
+        if parts[4:] == ["shadow", "properties"] and len(parts) == 6:
+            codes = query.get("codes", [""])[0].split(",")
+            return "shadow", api.async_get_shadow_properties(parts[3], codes)
+        if parts[3:] == ["batch"]:
+            device_ids = query.get("device_ids", [""])[0].split(",")
+            return "lookup", api.async_lookup_devices(device_ids)
+    return "raw", api._async_request(method, item["path"], body=item.get("body", ""))
+
+
+async def replay(args) -> dict:
+    player = cassette.Player.load(args.cassette, args.speed)
+    api = tuya_api.TuyaAPI("replay", "replay", base_url="http://cassette.invalid")
+    api.configure(max_concurrent_requests=args.max_concurrent)
+    api.player = player
+    requests = [
+        item
+        for item in player.interactions
+        if not item["path"].startswith(SKIPPED_PATHS)
+    ]
+    latency = metrics.LatencyHistogram()
+    errors = 0
+    calls = {}
+    loop = asyncio.get_running_loop()
+
+    async def _issue(item):
+        nonlocal errors
+        started = loop.time()
+        kind, call = client_call(api, item)
+        calls[kind] = calls.get(kind, 0) + 1
+        try:
+            await call
+        except Exception:
+            errors += 1
+        latency.add(loop.time() - started)
+
+    cpu_started = time.process_time()
+    wall_started = loop.time()
+    try:
+        await api.async_get_token()
+        if args.speed:
+            tasks = []
+            for item in requests:
+                await asyncio.sleep(
+                    max(0.0, wall_started + item["t"] / args.speed - loop.time())
+                )
+                tasks.append(asyncio.ensure_future(_issue(item)))
+            await asyncio.gather(*tasks)
+        else:
+            pending = iter(requests)
+
+            async def _worker():
+                for item in pending:
+                    await _issue(item)
+
+            await asyncio.gather(*(_worker() for _ in range(args.concurrency)))
+        wall = loop.time() - wall_started
+        cpu = time.process_time() - cpu_started
+    finally:
+        await api.async_close()
+    recorded = max((item["t"] + item["elapsed"] for item in requests), default=0.0)
+    return {
+        "cassette": str(args.cassette),
+        "speed": args.speed,
+        "requests": len(requests),
+        "errors": errors,
+        "calls": calls,
+        "recorded_s": round(recorded, 2),
+        "wall_s": round(wall, 3),
+        "cpu_s": round(cpu, 3),
+        "cpu_us_per_request": round(cpu / len(requests) * 1e6, 1) if requests else None,
+        "latency": latency.summary(),
+        "player": player.stats(),
+        "client_metrics": api.get_metrics(),
+    }
+
+
+async def record_mock(args):
+    """Record a polling and command session against the mock cloud."""
+    ids = device_ids(args.devices)
+    with MockCloudProcess(args.devices, args.latency_ms, 0.3) as server:
+        api = tuya_api.TuyaAPI(CLIENT_ID, CLIENT_SECRET, base_url=server.url)
+        api.recorder = cassette.Recorder()
+        loop = asyncio.get_running_loop()
+        end = loop.time() + args.duration
+
+        async def _device(index, device_id):
+            await asyncio.sleep(index * args.poll_interval / len(ids))
+            while loop.time() < end:
+                await api.async_get_status(device_id)
+                if index % 5 == 0:
+                    await api.async_send_command(
+                        device_id, [{"code": "temp_set", "value": 2200 + index}]
+                    )
+                await asyncio.sleep(args.poll_interval)
+
+        try:
+            await asyncio.gather(*(_device(i, did) for i, did in enumerate(ids)))
+        finally:
+            await api.async_close()
+    count = api.recorder.write(args.record)
+    print(f"Recorded {count} requests to {args.record}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("cassette", nargs="?", type=pathlib.Path)
+    parser.add_argument(
+        "--speed", type=float, default=1.0, help="replay speed-up; 0 for no delays"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=4, help="requests at a time at --speed 0"
+    )
+    parser.add_argument(
+        "--max-concurrent", type=int, default=tuya_api.MAX_CONCURRENT_REQUESTS
+    )
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--record", help="record a cassette from the mock cloud")
+    parser.add_argument("--devices", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--poll-interval", type=float, default=5)
+    parser.add_argument("--latency-ms", type=float, default=80)
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.CRITICAL)
+
+    if args.record:
+        asyncio.run(record_mock(args))
+        return
+    if args.cassette is None:
+        parser.error("a cassette file is required")
+    results = asyncio.run(replay(args))
+    text = json.dumps(results, indent=2)
+    if args.output:
+        pathlib.Path(args.output).write_text(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
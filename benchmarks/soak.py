@@ -0,0 +1,362 @@
+"""Fault-injection soak test for the Tuya API client.
+
+A simulated fleet polls every device on an interval and sends commands at
+random, against the mock cloud in a subprocess, while a schedule switches
+cloud faults on and off: 1010 token storms, 5xx bursts, slow responses and
+truncated JSON. Polls follow the coordinator's policy of dropping
+request-level retries after a failed poll.
+
+Reported per phase and overall:
+
+- memory: traced allocations of this process (tracemalloc) and growth
+- task leaks: asyncio tasks, client-owned tasks and shared requests left
+  behind once the fleet stops
+- request amplification: cloud requests per poll/command attempted
+- time to recovery: after a fault phase, until the first and until every
+  device polled successfully again
+
+    python benchmarks/soak.py --devices 50 --duration 7200 --output soak.json
+    python benchmarks/soak.py --devices 10 --duration 300 --scale 0.1
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import pathlib
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import _integration
+from mock_tuya_cloud import CLIENT_ID, CLIENT_SECRET, MockCloudProcess, device_ids
+
+tuya_api = _integration.load("tuya_api")
+metrics = _integration.load("metrics")
+
+# Phases as "fault=rate[+fault=rate]:seconds"; "healthy" clears all faults.
+# The schedule repeats until --duration is reached.
+DEFAULT_SCHEDULE = (
+    "healthy:120,"
+    "token_invalid=1:30,healthy:120,"
+    "server_error=0.5:60,healthy:120,"
+    "slow=0.3:60,healthy:120,"
+    "truncated=0.3:60,healthy:120,"
+    "token_invalid=0.2+server_error=0.2+truncated=0.1:60"
+)
+
+# DP codes the coordinators subscribe to (see bench_fleet.POLL_CODES)
+POLL_CODES = [
+    "switch",
+    "mode",
+    "temp_set",
+    "temp_current",
+    "fan_speed_enum",
+    "gear_vertical",
+    "gear_horizontal",
+]
+
+
+def parse_schedule(text: str, scale: float = 1.0) -> list:
+    """Parse DEFAULT_SCHEDULE-style text into (name, rates, seconds) tuples."""
+    phases = []
+    for entry in text.split(","):
+        spec, seconds = entry.strip().rsplit(":", 1)
+        rates = {}
+        if spec != "healthy":
+            for fault in spec.split("+"):
+                name, _, rate = fault.partition("=")
+                rates[name] = float(rate or 1)
+        phases.append((spec, rates, float(seconds) * scale))
+    return phases
+
+
+class Fleet:
+    """Simulated coordinators (one poll loop per device) plus commands."""
+
+    def __init__(self, api, ids: list, args):
+        self.api = api
+        self.ids = ids
+        self.args = args
+        self.counts = dict.fromkeys(
+            ("polls_ok", "polls_failed", "commands_ok", "commands_failed"), 0
+        )
+        self.poll_latency = metrics.LatencyHistogram()
+        self._failures = dict.fromkeys(ids, 0)
+        self._recovery_start: float | None = None
+        self._recovered: dict[str, float] = {}
+        self._tasks: list = []
+        self._random = random.Random(2)
+
+    def start(self):
+        self._tasks = [asyncio.ensure_future(self._device(did)) for did in self.ids]
+        if self.args.command_rate:
+            self._tasks.append(asyncio.ensure_future(self._commands()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def track_recovery(self, started: float):
+        self._recovery_start = started
+        self._recovered = {}
+
+    def recovery(self) -> dict:
+        if self._recovery_start is None:
+            return {}
+        times = sorted(t - self._recovery_start for t in self._recovered.values())
+        return {
+            "first_success_s": round(times[0], 2) if times else None,
+            "all_devices_s": (
+                round(times[-1], 2) if len(times) == len(self.ids) else None
+            ),
+            "devices_recovered": len(times),
+        }
+
+    async def _device(self, device_id: str):
+        loop = asyncio.get_running_loop()
+        await asyncio.sleep(self._random.uniform(0, self.args.poll_interval))
+        while True:
+            started = loop.time()
+            # Like the coordinator: no request-level retries after a failure
+            retries = 0 if self._failures[device_id] else tuya_api.MAX_RETRIES
+            try:
+                if self.args.poll_api == "shadow":
+                    await self.api.async_get_shadow_properties(
+                        device_id, POLL_CODES, max_retries=retries
+                    )
+                else:
+                    await self.api.async_get_status(device_id, max_retries=retries)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self._failures[device_id] += 1
+                self.counts["polls_failed"] += 1
+            else:
+                now = loop.time()
+                self._failures[device_id] = 0
+                self.counts["polls_ok"] += 1
+                self.poll_latency.add(now - started)
+                if self._recovery_start is not None:
+                    self._recovered.setdefault(device_id, now)
+            await asyncio.sleep(
+                max(0.0, started + self.args.poll_interval - loop.time())
+            )
+
+    async def _commands(self):
+        while True:
+            await asyncio.sleep(self._random.expovariate(self.args.command_rate))
+            device_id = self._random.choice(self.ids)
+            value = self._random.choice((2200, 2300, 2400, 2500))
+            try:
+                await self.api.async_send_command(
+                    device_id, [{"code": "temp_set", "value": value}]
+                )
+                self.counts["commands_ok"] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.counts["commands_failed"] += 1
+
+
+def process_state(api) -> dict:
+    current, peak = (
+        tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+    )
+    return {
+        "traced_kb": round(current / 1024, 1),
+        "traced_peak_kb": round(peak / 1024, 1),
+        "asyncio_tasks": len(asyncio.all_tasks()),
+        "owned_tasks": len([t for t in api._tasks if not t.done()]),
+        "inflight_shared": len(api._inflight),
+        "queued": api.get_concurrency_stats()["queued"],
+    }
+
+
+async def run(args) -> dict:
+    phases = parse_schedule(args.schedule, args.scale)
+    ids = device_ids(args.devices)
+    loop = asyncio.get_running_loop()
+    results = []
+
+    with MockCloudProcess(args.devices, args.latency_ms, args.jitter) as server:
+        api = tuya_api.TuyaAPI(CLIENT_ID, CLIENT_SECRET, base_url=server.url)
+        api.configure(max_concurrent_requests=args.max_concurrent)
+        baseline_tasks = len(asyncio.all_tasks())
+        if not args.no_tracemalloc:
+            tracemalloc.start(10)
+        first_snapshot = None
+        fleet = Fleet(api, ids, args)
+        fleet.start()
+
+        soak_end = loop.time() + args.duration
+        previous_faulty = False
+        for name, rates, seconds in itertools.cycle(phases):
+            remaining = soak_end - loop.time()
+            if remaining <= 0:
+                break
+            seconds = min(seconds, remaining)
+            await server.set_faults(rates, slow_seconds=args.slow_seconds)
+            before_counts = dict(fleet.counts)
+            before_server = (await server.stats())["total_requests"]
+            before_attempts = api.get_metrics()["totals"]["attempts"]
+            started = loop.time()
+            if not rates and previous_faulty:
+                fleet.track_recovery(started)
+            print(f"phase {name} for {seconds:.0f}s", file=sys.stderr)
+            await asyncio.sleep(seconds)
+
+            after_server = (await server.stats())["total_requests"]
+            counts = {k: fleet.counts[k] - before_counts[k] for k in fleet.counts}
+            operations = sum(counts.values())
+            requests = after_server - before_server
+            phase = {
+                "phase": name,
+                "rates": rates,
+                "seconds": round(seconds, 1),
+                **counts,
+                "cloud_requests": requests,
+                "client_attempts": api.get_metrics()["totals"]["attempts"]
+                - before_attempts,
+                "amplification": (
+                    round(requests / operations, 3) if operations else None
+                ),
+                **process_state(api),
+            }
+            if not rates and previous_faulty:
+                phase["recovery"] = fleet.recovery()
+            if first_snapshot is None and tracemalloc.is_tracing():
+                # Baseline after the first phase, once caches and pools are warm
+                first_snapshot = tracemalloc.take_snapshot()
+            results.append(phase)
+            previous_faulty = bool(rates)
+
+        await server.set_faults({})
+        await fleet.stop()
+        # Give shared requests whose callers were cancelled time to finish
+        await asyncio.sleep(args.drain)
+        leftover = process_state(api)
+        top_growth = []
+        if first_snapshot is not None:
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                [tracemalloc.Filter(True, str(_integration.INTEGRATION_DIR / "*"))]
+            )
+            first = first_snapshot.filter_traces(
+                [tracemalloc.Filter(True, str(_integration.INTEGRATION_DIR / "*"))]
+            )
+            top_growth = [
+                {"where": str(stat.traceback[0]), "size_diff_kb": stat.size_diff / 1024}
+                for stat in snapshot.compare_to(first, "lineno")[:5]
+                if stat.size_diff > 0
+            ]
+        await api.async_close()
+        server_stats = await server.stats()
+        tracemalloc.stop()
+
+    healthy = [p for p in results if not p["rates"]]
+    memory = [p["traced_kb"] for p in results]
+    hours = args.duration / 3600
+    summary = {
+        "polls_ok": sum(p["polls_ok"] for p in results),
+        "polls_failed": sum(p["polls_failed"] for p in results),
+        "commands_ok": sum(p["commands_ok"] for p in results),
+        "commands_failed": sum(p["commands_failed"] for p in results),
+        "poll_latency": fleet.poll_latency.summary(),
+        "memory_start_kb": memory[0] if memory else None,
+        "memory_end_kb": memory[-1] if memory else None,
+        "memory_growth_kb_per_hour": (
+            round((memory[-1] - memory[0]) / hours, 1)
+            if len(memory) > 1 and hours
+            else None
+        ),
+        "memory_top_growth": top_growth,
+        "tasks_leaked": leftover["asyncio_tasks"] - baseline_tasks,
+        "owned_tasks_left": leftover["owned_tasks"],
+        "inflight_left": leftover["inflight_shared"],
+        "amplification_healthy": _ratio(healthy),
+        "amplification_faulty": _ratio([p for p in results if p["rates"]]),
+        "worst_recovery_s": max(
+            (
+                p["recovery"]["all_devices_s"]
+                for p in results
+                if p.get("recovery", {}).get("all_devices_s") is not None
+            ),
+            default=None,
+        ),
+        "unrecovered_phases": sum(
+            1
+            for p in results
+            if "recovery" in p and p["recovery"]["all_devices_s"] is None
+        ),
+        "client_metrics": api.get_metrics()["totals"],
+        "server": server_stats,
+    }
+    version = _integration.version_info()
+    return {
+        "meta": {
+            "benchmark": "soak",
+            "version": version["version"],
+            "revision": version["git_revision"],
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "args": vars(args),
+        },
+        "summary": summary,
+        "phases": results,
+    }
+
+
+def _ratio(phases: list) -> float | None:
+    operations = sum(
+        p["polls_ok"] + p["polls_failed"] + p["commands_ok"] + p["commands_failed"]
+        for p in phases
+    )
+    requests = sum(p["cloud_requests"] for p in phases)
+    return round(requests / operations, 3) if operations else None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--devices", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=3600, help="seconds")
+    parser.add_argument("--schedule", default=DEFAULT_SCHEDULE)
+    parser.add_argument(
+        "--scale", type=float, default=1.0, help="multiply phase lengths"
+    )
+    parser.add_argument("--poll-interval", type=float, default=10)
+    parser.add_argument("--poll-api", choices=["shadow", "status"], default="shadow")
+    parser.add_argument(
+        "--command-rate", type=float, default=0.2, help="commands per second"
+    )
+    parser.add_argument("--latency-ms", type=float, default=80)
+    parser.add_argument("--jitter", type=float, default=0.3)
+    parser.add_argument("--slow-seconds", type=float, default=8)
+    parser.add_argument(
+        "--max-concurrent", type=int, default=tuya_api.MAX_CONCURRENT_REQUESTS
+    )
+    parser.add_argument(
+        "--drain", type=float, default=5, help="seconds to wait after stopping"
+    )
+    parser.add_argument("--no-tracemalloc", action="store_true")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+    parse_schedule(args.schedule)  # fail early on typos
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.CRITICAL)
+
+    results = asyncio.run(run(args))
+    text = json.dumps(results, indent=2)
+    if args.output:
+        pathlib.Path(args.output).write_text(text + "\n")
+    print(json.dumps(results["summary"], indent=2))
+
+
+if __name__ == "__main__":
+    main()
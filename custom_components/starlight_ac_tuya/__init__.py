@@ -1,11 +1,216 @@
+from datetime import timedelta
+import asyncio
+import logging
+import time
+
+import voluptuous as vol
+
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+)
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.update_coordinator import UpdateFailed
 
-from .tuya_api import TuyaAPI
-from .coordinator import TuyaACCoordinator
+from .tuya_api import CALL_DEADLINES, MAX_CONCURRENT_REQUESTS, TuyaAPI, device_online
+from .coordinator import (
+    DEFAULT_SCAN_INTERVAL,
+    DEFAULT_STALE_MAX_FAILURES,
+    DEFAULT_STALE_MAX_SECONDS,
+    SIGNAL_DEVICES_ADDED,
+    TuyaACCoordinator,
+)
+from .config_flow import AC_CATEGORY, device_entry
+from .const import FAN_DP_CODES, NUMBER_DP_CODES, SELECT_DP_CODES
+from .cassette import Recorder
+from .loopmonitor import LoopMonitor
+from .profiler import MODES as PROFILE_MODES, Profiler
+from .tracing import OpenTelemetryExporter
 
 DOMAIN = "starlight_ac_tuya"
-PLATFORMS = ["climate", "switch", "number", "fan", "select"]
+PLATFORMS = ["climate", "switch", "number", "fan", "select", "sensor"]
+# DP codes a device must report for a platform to create entities for it;
+# None means every device gets entities on that platform. The platforms'
+# entity builders read the same constants.
+PLATFORM_DP_CODES = {
+    "climate": None,
+    "switch": None,
+    "number": NUMBER_DP_CODES,
+    "fan": FAN_DP_CODES,
+    "select": SELECT_DP_CODES,
+    # API client diagnostics, one set per entry
+    "sensor": None,
+}
+
+# How often the online state of all devices is checked with one bulk lookup
+ONLINE_CHECK_INTERVAL = timedelta(minutes=10)
+# How often the cloud device list is compared with the configured devices
+DISCOVERY_INTERVAL = timedelta(minutes=30)
+# The API endpoint the client last chose, kept across restarts
+ENDPOINT_STORAGE_VERSION = 1
+ENDPOINT_SAVE_DELAY = 10
+
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
+
+DUMP_TRACES_SCHEMA = vol.Schema(
+    {
+        vol.Optional("device_id"): cv.string,
+        vol.Optional("limit"): vol.All(vol.Coerce(int), vol.Range(min=1)),
+    }
+)
+
+PROFILE_SCHEMA = vol.Schema(
+    {
+        vol.Optional("mode", default="sampling"): vol.In(PROFILE_MODES),
+        vol.Optional("duration", default=30): vol.All(
+            vol.Coerce(float), vol.Range(min=1, max=600)
+        ),
+        vol.Optional("top", default=25): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=200)
+        ),
+    }
+)
+
+MONITOR_LOOP_SCHEMA = vol.Schema(
+    {
+        vol.Optional("duration", default=60): vol.All(
+            vol.Coerce(float), vol.Range(min=1, max=3600)
+        ),
+        vol.Optional("threshold_ms", default=10): vol.All(
+            vol.Coerce(float), vol.Range(min=0.1, max=1000)
+        ),
+        vol.Optional("top", default=25): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=200)
+        ),
+    }
+)
+
+RECORD_CASSETTE_SCHEMA = vol.Schema(
+    {
+        vol.Optional("duration", default=300): vol.All(
+            vol.Coerce(float), vol.Range(min=1, max=3600)
+        ),
+    }
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+async def async_setup(hass: HomeAssistant, config: dict) -> bool:
+    async def _async_dump_traces(call: ServiceCall) -> ServiceResponse:
+        """Return recent command traces of all entries, newest first."""
+        traces = []
+        for data in hass.data.get(DOMAIN, {}).values():
+            traces.extend(data["api"].tracer.dump(device_id=call.data.get("device_id")))
+        traces.sort(key=lambda trace: trace["start"], reverse=True)
+        limit = call.data.get("limit")
+        return {"traces": traces[:limit] if limit else traces}
+
+    hass.services.async_register(
+        DOMAIN,
+        "dump_traces",
+        _async_dump_traces,
+        schema=DUMP_TRACES_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+
+    async def _async_profile(call: ServiceCall) -> ServiceResponse:
+        """Profile the integration for a while and write the results."""
+        profiler = Profiler(call.data["mode"], call.data["top"])
+        try:
+            profiler.start()
+        except RuntimeError as err:
+            raise HomeAssistantError(f"Cannot start profiling: {err}") from err
+        try:
+            await asyncio.sleep(call.data["duration"])
+        finally:
+            profiler.stop()
+        basename = f"{DOMAIN}_profile_{time.strftime('%Y%m%d_%H%M%S')}"
+        summary = await hass.async_add_executor_job(
+            profiler.write, hass.config.path(), basename
+        )
+        _LOGGER.info(
+            "Profile written to %s (summary in %s)",
+            summary["profile_file"],
+            summary["summary_file"],
+        )
+        return summary
+
+    hass.services.async_register(
+        DOMAIN,
+        "profile",
+        _async_profile,
+        schema=PROFILE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+    async def _async_monitor_loop(call: ServiceCall) -> ServiceResponse:
+        """Time the integration's event loop slices for a while."""
+        monitor = LoopMonitor(call.data["threshold_ms"] / 1000, call.data["top"])
+        try:
+            monitor.start()
+        except RuntimeError as err:
+            raise HomeAssistantError(f"Cannot start loop monitor: {err}") from err
+        try:
+            await asyncio.sleep(call.data["duration"])
+        finally:
+            monitor.stop()
+        report = monitor.report()
+        _LOGGER.info(
+            "Loop monitor: %d slices took %.1f ms over %.0fs, %d over %.1f ms",
+            report["slices"],
+            report["total_ms"],
+            report["duration_s"],
+            report["slow"],
+            report["threshold_ms"],
+        )
+        return report
+
+    hass.services.async_register(
+        DOMAIN,
+        "monitor_loop",
+        _async_monitor_loop,
+        schema=MONITOR_LOOP_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+    async def _async_record_cassette(call: ServiceCall) -> ServiceResponse:
+        """Record all entries' cloud traffic to a cassette file."""
+        apis = [data["api"] for data in hass.data.get(DOMAIN, {}).values()]
+        if any(api.recorder is not None for api in apis):
+            raise HomeAssistantError("A cassette is already being recorded")
+        recorder = Recorder()
+        for api in apis:
+            api.recorder = recorder
+        try:
+            await asyncio.sleep(call.data["duration"])
+        finally:
+            for api in apis:
+                if api.recorder is recorder:
+                    api.recorder = None
+        path = hass.config.path(
+            f"{DOMAIN}_cassette_{time.strftime('%Y%m%d_%H%M%S')}.ndjson.gz"
+        )
+        count = await hass.async_add_executor_job(recorder.write, path)
+        _LOGGER.info("Recorded %d Tuya API exchanges to %s", count, path)
+        return {"file": path, "interactions": count, "dropped": recorder.dropped}
+
+    hass.services.async_register(
+        DOMAIN,
+        "record_cassette",
+        _async_record_cassette,
+        schema=RECORD_CASSETTE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    return True
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
@@ -17,38 +222,292 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     base_url = entry.data.get("base_url")
 
     api = TuyaAPI(client_id, client_secret, region=region, base_url=base_url)
+    api.configure(**_api_options(entry))
+    await _async_apply_trace_export(hass, entry, api)
+    await _async_restore_endpoint(hass, entry, api)
 
     hass.data[DOMAIN][entry.entry_id] = {
         "api": api,
         "devices": entry.data.get("devices", []),
         "coordinators": {},
+        "platforms": set(),
     }
 
-    scan_interval = entry.options.get("scan_interval", 120)
+    coordinator_options = _coordinator_options(entry)
     for device in hass.data[DOMAIN][entry.entry_id]["devices"]:
         device_id = device.get("id")
         if not device_id:
             continue
-        coordinator = TuyaACCoordinator(
-            hass, api, device_id, update_interval_seconds=scan_interval
-        )
+        coordinator = TuyaACCoordinator(hass, api, device_id, **coordinator_options)
         hass.data[DOMAIN][entry.entry_id]["coordinators"][device_id] = coordinator
-        await coordinator.async_config_entry_first_refresh()
+        try:
+            await coordinator.async_config_entry_first_refresh()
+        except BaseException:
+            # Setup is aborted (e.g. ConfigEntryNotReady during an outage);
+            # don't leave the client's session and tasks behind.
+            hass.data[DOMAIN].pop(entry.entry_id, None)
+            await api.async_close()
+            raise
+
+    coordinators = hass.data[DOMAIN][entry.entry_id]["coordinators"]
 
-    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    async def _async_check_online(now=None):
+        """Sync each coordinator with the cloud's online flag for its device."""
+        if not coordinators:
+            return
+        try:
+            infos = await api.async_get_devices_info(list(coordinators))
+        except Exception as err:
+            _LOGGER.debug("Online check failed: %s", err)
+            return
+        for info in infos:
+            coordinator = coordinators.get(info.get("id"))
+            online = device_online(info)
+            if coordinator is None or online is None or online == coordinator.online:
+                continue
+            coordinator.set_online(online)
+            if online:
+                await coordinator.async_request_refresh()
+            else:
+                coordinator.async_set_update_error(
+                    UpdateFailed(f"Device {coordinator.device_id} is offline")
+                )
+
+    entry.async_on_unload(
+        async_track_time_interval(hass, _async_check_online, ONLINE_CHECK_INTERVAL)
+    )
+    entry.async_on_unload(entry.add_update_listener(_async_options_updated))
+
+    discovery_lock = asyncio.Lock()
+
+    async def _async_discover(now=None):
+        if not entry.options.get("auto_discover", True) or discovery_lock.locked():
+            return
+        async with discovery_lock:
+            try:
+                await _async_reconcile_devices(hass, entry)
+            except Exception as err:
+                _LOGGER.debug("Device discovery failed: %s", err)
+
+    entry.async_on_unload(
+        async_track_time_interval(hass, _async_discover, DISCOVERY_INTERVAL)
+    )
+
+    # Only import and set up platforms that will create entities
+    platforms = _required_platforms(coordinators.values())
+    hass.data[DOMAIN][entry.entry_id]["platforms"].update(platforms)
+    await hass.config_entries.async_forward_entry_setups(entry, platforms)
     return True
 
 
+def _endpoint_store(hass: HomeAssistant, entry: ConfigEntry) -> Store:
+    return Store(hass, ENDPOINT_STORAGE_VERSION, f"{DOMAIN}.{entry.entry_id}.endpoint")
+
+
+async def _async_restore_endpoint(hass: HomeAssistant, entry: ConfigEntry, api):
+    """Start on the endpoint chosen before the restart and save new choices."""
+    store = _endpoint_store(hass, entry)
+    if len(api.endpoints) > 1:
+        stored = await store.async_load() or {}
+        if api.set_endpoint(stored.get("base_url")):
+            _LOGGER.debug("Using saved Tuya API endpoint %s", api.base_url)
+
+    def _save(url: str):
+        store.async_delay_save(lambda: {"base_url": url}, ENDPOINT_SAVE_DELAY)
+
+    api.on_endpoint_change = _save
+
+
+def _api_options(entry: ConfigEntry) -> dict:
+    """Return TuyaAPI.configure() arguments from the entry options."""
+    options = entry.options
+    return {
+        "fallback_urls": [
+            url for url in options.get("failover_urls", "").split(",") if url.strip()
+        ],
+        "max_concurrent_requests": options.get(
+            "max_concurrent_requests", MAX_CONCURRENT_REQUESTS
+        ),
+        "call_deadlines": {
+            "command": options.get("command_timeout", CALL_DEADLINES["command"]),
+            "status": options.get("status_timeout", CALL_DEADLINES["status"]),
+        },
+    }
+
+
+def _coordinator_options(entry: ConfigEntry) -> dict:
+    """Return coordinator polling settings from the entry options."""
+    options = entry.options
+    return {
+        "update_interval_seconds": options.get("scan_interval", DEFAULT_SCAN_INTERVAL),
+        "stale_max_failures": options.get(
+            "stale_max_failures", DEFAULT_STALE_MAX_FAILURES
+        ),
+        "stale_max_seconds": options.get(
+            "stale_max_seconds", DEFAULT_STALE_MAX_SECONDS
+        ),
+    }
+
+
+async def _async_reconcile_devices(hass: HomeAssistant, entry: ConfigEntry):
+    """Add ACs that appeared in the cloud and remove ones that are gone.
+
+    The listed AC IDs are compared with the previous listing, so only
+    changes are acted on: ACs present at setup but never selected are not
+    added, and manually entered devices the listing doesn't show are kept.
+    Devices that are unaffected keep their coordinators and entities. A
+    failed listing or lookup raises, so nothing is changed on an error.
+    """
+    data = hass.data.get(DOMAIN, {}).get(entry.entry_id)
+    if not data:
+        return
+    api = data["api"]
+    coordinators = data["coordinators"]
+
+    listed = {
+        device["id"]: device
+        for device in await api.async_list_devices(category=AC_CATEGORY)
+        if device.get("id")
+    }
+    previous = entry.data.get("discovered_ids")
+    # Without a baseline (e.g. discovery failed in the config flow) the
+    # first listing becomes it and nothing is added.
+    known = set(listed) if previous is None else set(previous)
+    appeared = [did for did in listed if did not in known]
+    vanished = [did for did in known if did not in listed and did in coordinators]
+    baseline = set(listed)
+
+    removed = set()
+    if vanished:
+        # Confirm before tearing down: only IDs the cloud explicitly rejects
+        # are gone. Unconfirmed ones stay in the baseline to be checked again.
+        _, rejected = await api.async_lookup_devices(vanished)
+        removed = set(rejected) & set(vanished)
+        baseline.update(did for did in vanished if did not in removed)
+
+    added = []
+    coordinator_options = _coordinator_options(entry)
+    for device_id in appeared:
+        if device_id in coordinators:
+            continue
+        coordinator = TuyaACCoordinator(hass, api, device_id, **coordinator_options)
+        await coordinator.async_refresh()
+        if not coordinator.last_update_success:
+            # Entities are built from the first status; try again next time
+            await coordinator.async_shutdown()
+            baseline.discard(device_id)
+            continue
+        coordinators[device_id] = coordinator
+        added.append(device_entry(listed[device_id], device_id))
+
+    if not added and not removed and baseline == known and previous is not None:
+        return
+
+    registry = dr.async_get(hass)
+    for device_id in removed:
+        _LOGGER.info("Removing Tuya device %s, no longer in the cloud", device_id)
+        await coordinators.pop(device_id).async_shutdown()
+        device = registry.async_get_device(identifiers={(DOMAIN, device_id)})
+        if device is not None:
+            registry.async_update_device(
+                device.id, remove_config_entry_id=entry.entry_id
+            )
+
+    devices = [d for d in data["devices"] if d.get("id") not in removed] + added
+    data["devices"] = devices
+    hass.config_entries.async_update_entry(
+        entry,
+        data={**entry.data, "devices": devices, "discovered_ids": sorted(baseline)},
+    )
+
+    if added:
+        _LOGGER.info("Adding Tuya devices: %s", ", ".join(d["id"] for d in added))
+        async_dispatcher_send(hass, SIGNAL_DEVICES_ADDED.format(entry.entry_id), added)
+        # Platforms set up from now on pick the new devices up from the list
+        missing = [
+            platform
+            for platform in _required_platforms(
+                coordinators[device["id"]] for device in added
+            )
+            if platform not in data["platforms"]
+        ]
+        if missing:
+            data["platforms"].update(missing)
+            forward = getattr(
+                hass.config_entries,
+                "async_late_forward_entry_setups",
+                hass.config_entries.async_forward_entry_setups,
+            )
+            await forward(entry, missing)
+
+
+def _required_platforms(coordinators) -> list:
+    """Return the platforms that have entities for any of the devices.
+
+    Capabilities are read from the coordinators' status snapshots.
+    """
+    coordinators = list(coordinators)
+    return [
+        platform
+        for platform in PLATFORMS
+        if (codes := PLATFORM_DP_CODES.get(platform)) is None
+        or any(c.data.get(code) is not None for c in coordinators for code in codes)
+    ]
+
+
+async def _async_apply_trace_export(hass: HomeAssistant, entry: ConfigEntry, api):
+    """Attach or detach the OpenTelemetry trace exporter per the options."""
+    if not entry.options.get("opentelemetry", False):
+        api.tracer.exporter = None
+        return
+    if api.tracer.exporter is not None:
+        return
+    try:
+        # Importing opentelemetry reads files; keep it off the event loop
+        api.tracer.exporter = await hass.async_add_executor_job(OpenTelemetryExporter)
+    except ImportError:
+        _LOGGER.warning(
+            "OpenTelemetry trace export is enabled but the opentelemetry "
+            "package is not installed"
+        )
+
+
+async def _async_options_updated(hass: HomeAssistant, entry: ConfigEntry):
+    """Apply changed options to the live client and coordinators.
+
+    Nothing is reloaded, so the token, session and device state are kept and
+    the change costs no API calls.
+    """
+    data = hass.data.get(DOMAIN, {}).get(entry.entry_id)
+    if not data:
+        return
+    data["api"].configure(**_api_options(entry))
+    await _async_apply_trace_export(hass, entry, data["api"])
+    coordinator_options = _coordinator_options(entry)
+    for coordinator in data["coordinators"].values():
+        coordinator.apply_options(**coordinator_options)
+    _LOGGER.debug("Applied options for %s: %s", entry.title, dict(entry.options))
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     data = hass.data.get(DOMAIN, {}).pop(entry.entry_id, None)
     if not data:
         return True
 
-    unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
-
+    # Cancel in-flight requests and retry sleeps first so neither coordinator
+    # refreshes nor entity commands can hold up the unload.
     try:
         await data["api"].async_close()
     except Exception:
-        pass
+        _LOGGER.debug("Error closing Tuya API client", exc_info=True)
+
+    for coordinator in data["coordinators"].values():
+        await coordinator.async_shutdown()
+
+    return await hass.config_entries.async_unload_platforms(
+        entry, list(data["platforms"])
+    )
+
 
-    return unload_ok
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    await _endpoint_store(hass, entry).async_remove()
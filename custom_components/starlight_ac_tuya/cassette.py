@@ -0,0 +1,177 @@
+"""Record Tuya cloud traffic to a cassette and replay it offline.
+
+A cassette is NDJSON (gzipped when the name ends in .gz): a header line,
+then one line per HTTP exchange with its offset from the start of the
+recording, method, path, request body, HTTP status, response time and the
+response. Request headers are not recorded, and credentials, tokens and
+location data in responses are replaced by REDACTED.
+
+Replay matches requests by method and path, in recorded order. Once a
+path's recorded responses are used up, its last one keeps being served, so
+a client can poll for longer than was recorded.
+
+Standard library only, so tuya_status.py can load it without Home
+Assistant or aiohttp.
+"""
+
+import gzip
+import json
+import time
+from collections import deque
+
+CASSETTE_VERSION = 1
+# Exchanges kept per recording; later ones are only counted
+MAX_INTERACTIONS = 20000
+REDACTED = "REDACTED"
+# Response fields replaced by REDACTED, at any depth
+SECRET_KEYS = frozenset(
+    {
+        "access_token",
+        "refresh_token",
+        "uid",
+        "owner_id",
+        "local_key",
+        "ip",
+        "lat",
+        "lon",
+    }
+)
+# Served for requests the cassette has no recording for; Tuya's
+# "uri path invalid" error, so clients don't retry it
+MISSING_RESPONSE = b'{"success": false, "code": 1108, "msg": "not in cassette", "t": 0}'
+
+
+def _open(path, mode: str):
+    if str(path).endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def scrub(value):
+    """Return a copy of a decoded response with SECRET_KEYS redacted."""
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if key in SECRET_KEYS else scrub(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [scrub(item) for item in value]
+    return value
+
+
+class Recorder:
+    """Collects HTTP exchanges in memory; write() saves them as a cassette.
+
+    record() only appends to a list, so it is cheap on the event loop;
+    decoding, scrubbing and file I/O happen in write().
+    """
+
+    def __init__(self, max_interactions: int = MAX_INTERACTIONS):
+        self.max_interactions = max_interactions
+        self.started = time.monotonic()
+        self.started_wall = time.time()
+        self.dropped = 0
+        self._exchanges: list = []
+
+    def __len__(self) -> int:
+        return len(self._exchanges)
+
+    def record(
+        self,
+        method: str,
+        path: str,
+        body: str,
+        status: int,
+        raw: bytes,
+        elapsed: float,
+    ):
+        """Add one exchange; path is relative to the base URL."""
+        if len(self._exchanges) >= self.max_interactions:
+            self.dropped += 1
+            return
+        offset = time.monotonic() - self.started - elapsed
+        self._exchanges.append((offset, method, path, body, status, raw, elapsed))
+
+    def write(self, path: str) -> int:
+        """Write the cassette file; returns the number of exchanges."""
+        with _open(path, "w") as file:
+            header = {
+                "cassette": CASSETTE_VERSION,
+                "recorded_at": time.strftime(
+                    "%Y-%m-%dT%H:%M:%S%z", time.localtime(self.started_wall)
+                ),
+                "interactions": len(self._exchanges),
+                "dropped": self.dropped,
+            }
+            file.write(json.dumps(header) + "\n")
+            for offset, method, url_path, body, status, raw, elapsed in self._exchanges:
+                line = {
+                    "t": round(max(offset, 0.0), 4),
+                    "method": method,
+                    "path": url_path,
+                    "status": status,
+                    "elapsed": round(elapsed, 4),
+                }
+                if body:
+                    line["body"] = body
+                try:
+                    line["response"] = scrub(json.loads(raw))
+                except ValueError:
+                    line["raw"] = raw.decode(errors="replace")
+                file.write(json.dumps(line, separators=(",", ":")) + "\n")
+        return len(self._exchanges)
+
+
+class Player:
+    """Serves recorded responses in place of the cloud.
+
+    speed scales the recorded response times: 1 replays them as recorded,
+    10 ten times faster and 0 without any delay.
+    """
+
+    def __init__(self, interactions: list, speed: float = 1.0):
+        self.interactions = interactions
+        self.speed = speed
+        self.hits = 0
+        self.misses = 0
+        self._queues: dict[tuple[str, str], deque] = {}
+        for item in interactions:
+            key = (item["method"], item["path"])
+            self._queues.setdefault(key, deque()).append(item)
+
+    @classmethod
+    def load(cls, path: str, speed: float = 1.0) -> "Player":
+        with _open(path, "r") as file:
+            interactions = [
+                item
+                for item in (json.loads(line) for line in file if line.strip())
+                if "method" in item
+            ]
+        return cls(interactions, speed)
+
+    def delay(self, item: dict | None) -> float:
+        """Seconds to wait before serving an exchange."""
+        if item is None or not self.speed:
+            return 0.0
+        return item["elapsed"] / self.speed
+
+    def lookup(self, method: str, path: str) -> tuple[dict | None, int, bytes]:
+        """Return (exchange, HTTP status, body) for a request."""
+        queue = self._queues.get((method, path))
+        if not queue:
+            self.misses += 1
+            return None, 200, MISSING_RESPONSE
+        self.hits += 1
+        item = queue.popleft() if len(queue) > 1 else queue[0]
+        if "response" in item:
+            raw = json.dumps(item["response"]).encode()
+        else:
+            raw = item.get("raw", "").encode()
+        return item, item["status"], raw
+
+    def stats(self) -> dict:
+        return {
+            "interactions": len(self.interactions),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -1,5 +1,13 @@
 from homeassistant.components.climate import ClimateEntity
-from homeassistant.components.climate.const import HVACMode, ClimateEntityFeature
+from homeassistant.components.climate.const import (
+    SWING_BOTH,
+    SWING_HORIZONTAL,
+    SWING_OFF,
+    SWING_VERTICAL,
+    HVACMode,
+    ClimateEntityFeature,
+)
+import asyncio
 import logging
 
 try:
@@ -9,29 +17,42 @@ except Exception:
 from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
+from .const import FAN_ENUM_MAP, FAN_ENUM_REVERSE
+from .coordinator import async_setup_device_entities
+from .tracing import traced
+
 
 async def async_setup_entry(hass, entry, async_add_entities):
-    data = hass.data.get("starlight_ac_tuya", {}).get(entry.entry_id)
-    if not data:
-        return
-    api = data["api"]
-    coordinators = data["coordinators"]
-    devices = data.get("devices", [])
+    async_setup_device_entities(hass, entry, async_add_entities, _device_entities)
 
-    entities = []
-    for device in devices:
-        device_id = device.get("id")
-        name = device.get("name") or device_id
-        coord = coordinators.get(device_id)
-        if not coord:
-            continue
-        entities.append(TuyaACClimate(coord, api, device_id, name))
 
-    async_add_entities(entities)
+def _device_entities(coord, api, device):
+    device_id = device["id"]
+    name = device.get("name") or device_id
+    return [TuyaACClimate(coord, api, device_id, name)]
 
 
 _LOGGER = logging.getLogger(__name__)
 
+_MODE_MAP = {
+    "0": HVACMode.AUTO,
+    "1": HVACMode.COOL,
+    "2": HVACMode.DRY,
+    "3": HVACMode.FAN_ONLY,
+    "4": HVACMode.HEAT,
+}
+_MODE_REVERSE = {v: k for k, v in _MODE_MAP.items()}
+
+# gear_vertical / gear_horizontal values (see select.py): "1" sweeps, "11"
+# holds the middle position, which swing off falls back to
+_GEAR_SWING = "1"
+_GEAR_FIXED = "11"
+# Swing DPs and the swing modes that sweep them
+_SWING_DPS = {
+    "gear_vertical": (SWING_VERTICAL, SWING_BOTH),
+    "gear_horizontal": (SWING_HORIZONTAL, SWING_BOTH),
+}
+
 
 class _FeatureMask(int):
     """Integer mask that also supports `in` checks for ClimateEntityFeature.
@@ -56,6 +77,20 @@ class TuyaACClimate(CoordinatorEntity, ClimateEntity):
         self.device_id = device_id
         self._attr_name = name
         self._attr_unique_id = f"{device_id}_climate"
+        data = coordinator.data or {}
+        # Fan and swing are only offered if the device reports their DPs
+        self._has_fan = data.get("fan_speed_enum") is not None
+        self._swing_dps = tuple(dp for dp in _SWING_DPS if data.get(dp) is not None)
+        self._dp_codes = ("switch", "mode", "temp_set", "temp_current")
+        if self._has_fan:
+            self._dp_codes += ("fan_speed_enum",)
+        self._dp_codes += self._swing_dps
+        # Values and task of the command collecting this iteration's changes
+        self._batch = None
+
+    async def async_added_to_hass(self):
+        await super().async_added_to_hass()
+        self.async_on_remove(self.coordinator.async_subscribe_codes(self._dp_codes))
 
     @property
     def hvac_modes(self):
@@ -75,18 +110,7 @@ class TuyaACClimate(CoordinatorEntity, ClimateEntity):
             return HVACMode.OFF
         mode_val = data.get("mode")
         if mode_val is not None:
-            try:
-                m = str(mode_val)
-                mode_map = {
-                    "0": HVACMode.AUTO,
-                    "1": HVACMode.COOL,
-                    "2": HVACMode.DRY,
-                    "3": HVACMode.FAN_ONLY,
-                    "4": HVACMode.HEAT,
-                }
-                return mode_map.get(m, HVACMode.AUTO)
-            except Exception:
-                return HVACMode.AUTO
+            return _MODE_MAP.get(str(mode_val), HVACMode.AUTO)
 
         return HVACMode.COOL
 
@@ -107,9 +131,62 @@ class TuyaACClimate(CoordinatorEntity, ClimateEntity):
         """Return the temperature step for the HVAC controls (1°C)."""
         return 1.0
 
+    @property
+    def fan_modes(self):
+        return list(FAN_ENUM_MAP.values()) if self._has_fan else None
+
+    @property
+    def fan_mode(self):
+        v = self.coordinator.data.get("fan_speed_enum")
+        if v is None:
+            return None
+        return FAN_ENUM_MAP.get(str(v), str(v))
+
+    @property
+    def swing_modes(self):
+        if not self._swing_dps:
+            return None
+        modes = [SWING_OFF]
+        if "gear_vertical" in self._swing_dps:
+            modes.append(SWING_VERTICAL)
+        if "gear_horizontal" in self._swing_dps:
+            modes.append(SWING_HORIZONTAL)
+        if len(self._swing_dps) == 2:
+            modes.append(SWING_BOTH)
+        return modes
+
+    @property
+    def swing_mode(self):
+        if not self._swing_dps:
+            return None
+        data = self.coordinator.data
+        vertical = str(data.get("gear_vertical")) == _GEAR_SWING
+        horizontal = str(data.get("gear_horizontal")) == _GEAR_SWING
+        if vertical and horizontal:
+            return SWING_BOTH
+        if vertical:
+            return SWING_VERTICAL
+        if horizontal:
+            return SWING_HORIZONTAL
+        return SWING_OFF
+
     @property
     def supported_features(self):
-        return _FeatureMask(int(ClimateEntityFeature.TARGET_TEMPERATURE))
+        features = int(ClimateEntityFeature.TARGET_TEMPERATURE)
+        if self._has_fan:
+            features |= int(ClimateEntityFeature.FAN_MODE)
+        if self._swing_dps:
+            features |= int(ClimateEntityFeature.SWING_MODE)
+        return _FeatureMask(features)
+
+    @property
+    def extra_state_attributes(self):
+        # While polls fail inside the stale window the last known state is
+        # kept; expose how old it is so automations can tell.
+        if getattr(self.coordinator, "stale", False):
+            age = self.coordinator.data_age
+            return {"data_age": int(age) if age is not None else None}
+        return None
 
     @property
     def device_info(self) -> DeviceInfo:
@@ -119,54 +196,100 @@ class TuyaACClimate(CoordinatorEntity, ClimateEntity):
             manufacturer="Star-Light",
         )
 
+    @traced("climate.set_temperature")
     async def async_set_temperature(self, **kwargs):
-        temp = kwargs.get("temperature")
-        if temp is None:
-            return
-        try:
-            resp = await self.api.async_send_command(
-                self.device_id, [{"code": "temp_set", "value": int(temp * 100)}]
-            )
-            if not (isinstance(resp, dict) and resp.get("success") is False):
-                try:
-                    new_data = dict(self.coordinator.data or {})
-                    new_data["temp_set"] = int(temp * 100)
-                    await self.coordinator.async_set_updated_data(new_data)
-                except Exception:
-                    _LOGGER.debug(
-                        "Could not update coordinator data for temperature for %s",
-                        self.device_id,
-                        exc_info=True,
-                    )
-        except Exception as err:
-            _LOGGER.error("Error setting temperature for %s: %s", self.device_id, err)
+        # climate.set_temperature may also carry an HVAC mode; both go out
+        # in one command
+        values = self._command_values(
+            hvac_mode=kwargs.get("hvac_mode"), temperature=kwargs.get("temperature")
+        )
+        await self._async_send(values, "temperature")
 
+    @traced("climate.set_hvac_mode")
     async def async_set_hvac_mode(self, hvac_mode):
-        hvac_to_mode = {
-            HVACMode.AUTO: "0",
-            HVACMode.COOL: "1",
-            HVACMode.DRY: "2",
-            HVACMode.FAN_ONLY: "3",
-            HVACMode.HEAT: "4",
-        }
-        mode_value = hvac_to_mode.get(hvac_mode, "0")
-        commands = [
-            {"code": "switch", "value": hvac_mode != HVACMode.OFF},
-            {"code": "mode", "value": mode_value},
-        ]
+        await self._async_send(self._command_values(hvac_mode=hvac_mode), "HVAC mode")
+
+    @traced("climate.set_fan_mode")
+    async def async_set_fan_mode(self, fan_mode):
+        await self._async_send(self._command_values(fan_mode=fan_mode), "fan mode")
+
+    @traced("climate.set_swing_mode")
+    async def async_set_swing_mode(self, swing_mode):
+        await self._async_send(
+            self._command_values(swing_mode=swing_mode), "swing mode"
+        )
+
+    def _command_values(
+        self, hvac_mode=None, temperature=None, fan_mode=None, swing_mode=None
+    ) -> dict:
+        """DP values for a set of climate changes, sent as one command."""
+        values = {}
+        if hvac_mode is not None:
+            values.update(self._hvac_values(hvac_mode))
+        if temperature is not None:
+            values["temp_set"] = int(temperature * 100)
+        if fan_mode is not None:
+            value = FAN_ENUM_REVERSE.get(fan_mode)
+            if value is None:
+                _LOGGER.error("Unknown fan mode %s for %s", fan_mode, self.device_id)
+            else:
+                values["fan_speed_enum"] = value
+        if swing_mode is not None:
+            values.update(self._swing_values(swing_mode))
+        return values
+
+    @staticmethod
+    def _hvac_values(hvac_mode) -> dict:
+        if hvac_mode == HVACMode.OFF:
+            # Keep the mode so the unit resumes in it when turned back on
+            return {"switch": False}
+        return {"switch": True, "mode": _MODE_REVERSE.get(hvac_mode, "0")}
+
+    def _swing_values(self, swing_mode) -> dict:
+        """Gear DP changes for a swing mode; fixed gears keep their position."""
+        values = {}
+        for dp in self._swing_dps:
+            swinging = str(self.coordinator.data.get(dp)) == _GEAR_SWING
+            if swing_mode in _SWING_DPS[dp]:
+                if not swinging:
+                    values[dp] = _GEAR_SWING
+            elif swinging:
+                values[dp] = _GEAR_FIXED
+        return values
+
+    async def _async_send(self, values: dict, what: str):
+        """Add DP values to the pending command and wait until it is sent.
+
+        Changes made in the same event loop iteration, such as mode, fan and
+        swing from parallel script actions, go out as one command.
+        """
+        if not values:
+            return
+        if self._batch is None:
+            batch = ({}, [])
+            self._batch = batch + (asyncio.ensure_future(self._async_flush(batch)),)
+        pending, whats, task = self._batch
+        pending.update(values)
+        whats.append(what)
+        await asyncio.shield(task)
+
+    async def _async_flush(self, batch):
+        # Let the other changes made in this iteration join the command
+        await asyncio.sleep(0)
+        self._batch = None
+        values, whats = batch
+        await self._async_send_now(values, ", ".join(whats))
+
+    async def _async_send_now(self, values: dict, what: str):
+        """Send DP values as one command, then write them optimistically."""
+        commands = [{"code": code, "value": value} for code, value in values.items()]
         try:
             resp = await self.api.async_send_command(self.device_id, commands)
-            if not (isinstance(resp, dict) and resp.get("success") is False):
-                try:
-                    new_data = dict(self.coordinator.data or {})
-                    new_data["switch"] = hvac_mode != HVACMode.OFF
-                    new_data["mode"] = mode_value
-                    await self.coordinator.async_set_updated_data(new_data)
-                except Exception:
-                    _LOGGER.debug(
-                        "Could not update coordinator data for HVAC mode for %s",
-                        self.device_id,
-                        exc_info=True,
-                    )
         except Exception as err:
-            _LOGGER.error("Error setting HVAC mode for %s: %s", self.device_id, err)
+            _LOGGER.error("Error setting %s for %s: %s", what, self.device_id, err)
+            return
+        if isinstance(resp, dict) and resp.get("success") is False:
+            return
+        self.coordinator.async_set_updated_data(
+            {**(self.coordinator.data or {}), **values}
+        )
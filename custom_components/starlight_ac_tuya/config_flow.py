@@ -4,9 +4,15 @@ import voluptuous as vol
 import logging
 from homeassistant import config_entries
 from homeassistant.const import CONF_CLIENT_ID, CONF_CLIENT_SECRET
+from homeassistant.core import callback
 from homeassistant.helpers import config_validation as cv
 
-from .tuya_api import TuyaAPI
+from .coordinator import (
+    DEFAULT_SCAN_INTERVAL,
+    DEFAULT_STALE_MAX_FAILURES,
+    DEFAULT_STALE_MAX_SECONDS,
+)
+from .tuya_api import CALL_DEADLINES, MAX_CONCURRENT_REQUESTS, TIMEOUT_MIN, TuyaAPI
 
 DOMAIN = "starlight_ac_tuya"
 
@@ -18,6 +24,11 @@ _LOGGER = logging.getLogger(__name__)
 class StarlightTuyaConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     VERSION = 1
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry):
+        return StarlightTuyaOptionsFlow(config_entry)
+
     async def async_step_user(self, user_input=None):
         if user_input is None:
             schema = vol.Schema(
@@ -41,7 +52,10 @@ class StarlightTuyaConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         api = TuyaAPI(client_id, client_secret, region=region, base_url=base_url)
         try:
             _LOGGER.info("Starting device discovery...")
-            devices = await api.async_list_devices()
+            devices = await api.async_list_devices(category=AC_CATEGORY)
+            if not devices:
+                _LOGGER.info("No AC devices found, listing all devices instead")
+                devices = await api.async_list_devices()
             _LOGGER.info(
                 "Device discovery: fetched %d devices from Tuya API", len(devices)
             )
@@ -63,7 +77,10 @@ class StarlightTuyaConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         except OSError as e:
             _LOGGER.warning(f"Network error during device discovery: {e}")
             _LOGGER.warning("Device discovery failed due to network issues.")
-            _LOGGER.warning("You can still use manual device entry.")
+            _LOGGER.warning(
+                "Manually entered device IDs are verified with the Tuya cloud, "
+                "so retry once it is reachable."
+            )
             _LOGGER.info(
                 "Possible causes: network unreachable, DNS issues, or firewall"
             )
@@ -148,42 +165,64 @@ class StarlightTuyaConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         ids = list(set(discovered_ids + manual_ids))
 
         if not ids:
-            schema_dict = {}
-            if devices_to_show:
-                device_options = {}
-                for device in devices_to_show:
-                    did = device.get("id")
-                    display = device.get("name", "Unknown")
-                    device_options[did] = f"{display} ({did})"
-
-                schema_dict[vol.Optional("discovered_device_ids", default=[])] = (
-                    cv.multi_select(device_options)
-                )
-            schema_dict[vol.Optional("manual_device_ids", default="")] = str
-
-            return self.async_show_form(
-                step_id="devices",
-                data_schema=vol.Schema(schema_dict),
+            return self._show_devices_form(
+                devices_to_show,
                 errors={"base": "no_devices_selected"},
-                description_placeholders={"info": "At least one device is required."},
+                info="At least one device is required.",
             )
 
-        selected = []
         device_map = {d.get("id"): d for d in all_devices}
 
-        for did in ids:
-            if did in device_map:
-                device = device_map[did]
-                name = device.get("customName", "").strip()
-                if not name:
-                    name = device.get("name", "").strip()
-                if not name:
-                    name = device.get("product_name", "").strip()
-                if not name:
-                    name = did
-                selected.append({"id": did, "name": name})
-            else:
-                selected.append({"id": did, "name": did})
+        unknown_ids = [did for did in ids if did not in device_map]
+        if unknown_ids:
+            # Resolve manually entered IDs in one bulk lookup so typos are
+            # caught here instead of becoming coordinators that never work.
+            api = TuyaAPI(
+                self.context.get("client_id"),
+                self.context.get("client_secret"),
+                region=self.context.get("region"),
+                base_url=self.context.get("base_url"),
+            )
+            try:
+                infos = await api.async_get_devices_info(unknown_ids)
+            except Exception as e:
+                _LOGGER.warning("Could not verify manual device IDs: %s", e)
+                return self._show_devices_form(
+                    devices_to_show,
+                    errors={"base": "cannot_verify_devices"},
+                    info=f"Could not verify device IDs with the Tuya cloud: {e}",
+                )
+            finally:
+                try:
+                    await api.async_close()
+                except Exception:
+                    pass
+
+            for info in infos:
+                if info.get("id"):
+                    device_map[info["id"]] = info
+
+            invalid_ids = [did for did in unknown_ids if did not in device_map]
+            if invalid_ids:
+                _LOGGER.warning("Unknown device IDs entered: %s", invalid_ids)
+                return self._show_devices_form(
+                    devices_to_show,
+                    errors={"manual_device_ids": "invalid_device_ids"},
+                    info="Unknown device IDs: " + ", ".join(invalid_ids),
+                )
+
+            for did in unknown_ids:
+                info = device_map[did]
+                _LOGGER.info(
+                    "Manual device %s: %s | Category: %s | Product: %s | Online: %s",
+                    did,
+                    _device_name(info, did),
+                    info.get("category"),
+                    info.get("productId") or info.get("product_id"),
+                    info.get("isOnline", info.get("online")),
+                )
+
+        selected = [device_entry(device_map[did], did) for did in ids]
 
         entry_data = {
             "client_id": self.context.get("client_id"),
@@ -192,5 +231,112 @@ class StarlightTuyaConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             "base_url": self.context.get("base_url"),
             "devices": selected,
         }
+        if all_devices:
+            # Baseline for runtime discovery: ACs listed now but not selected
+            # are not added later on.
+            entry_data["discovered_ids"] = sorted(
+                d["id"] for d in ac_devices if d.get("id")
+            )
 
         return self.async_create_entry(title="Starlight Tuya AC", data=entry_data)
+
+    def _show_devices_form(self, devices_to_show, errors, info):
+        schema_dict = {}
+        if devices_to_show:
+            device_options = {}
+            for device in devices_to_show:
+                did = device.get("id")
+                display = device.get("name", "Unknown")
+                device_options[did] = f"{display} ({did})"
+
+            schema_dict[vol.Optional("discovered_device_ids", default=[])] = (
+                cv.multi_select(device_options)
+            )
+        schema_dict[vol.Optional("manual_device_ids", default="")] = str
+
+        return self.async_show_form(
+            step_id="devices",
+            data_schema=vol.Schema(schema_dict),
+            errors=errors,
+            description_placeholders={"info": info},
+        )
+
+
+class StarlightTuyaOptionsFlow(config_entries.OptionsFlow):
+    """Polling, rate-limit, timeout and endpoint failover settings.
+
+    Saved options are applied to the running integration without a reload.
+    """
+
+    def __init__(self, config_entry):
+        self._entry = config_entry
+
+    async def async_step_init(self, user_input=None):
+        if user_input is not None:
+            return self.async_create_entry(title="", data=user_input)
+
+        options = self._entry.options
+        schema = vol.Schema(
+            {
+                vol.Optional(
+                    "scan_interval",
+                    default=options.get("scan_interval", DEFAULT_SCAN_INTERVAL),
+                ): vol.All(vol.Coerce(int), vol.Range(min=10, max=3600)),
+                vol.Optional(
+                    "max_concurrent_requests",
+                    default=options.get(
+                        "max_concurrent_requests", MAX_CONCURRENT_REQUESTS
+                    ),
+                ): vol.All(vol.Coerce(int), vol.Range(min=1, max=16)),
+                vol.Optional(
+                    "command_timeout",
+                    default=options.get("command_timeout", CALL_DEADLINES["command"]),
+                ): vol.All(vol.Coerce(int), vol.Range(min=TIMEOUT_MIN, max=60)),
+                vol.Optional(
+                    "status_timeout",
+                    default=options.get("status_timeout", CALL_DEADLINES["status"]),
+                ): vol.All(vol.Coerce(int), vol.Range(min=TIMEOUT_MIN, max=120)),
+                vol.Optional(
+                    "stale_max_failures",
+                    default=options.get(
+                        "stale_max_failures", DEFAULT_STALE_MAX_FAILURES
+                    ),
+                ): vol.All(vol.Coerce(int), vol.Range(min=0, max=20)),
+                vol.Optional(
+                    "stale_max_seconds",
+                    default=options.get("stale_max_seconds", DEFAULT_STALE_MAX_SECONDS),
+                ): vol.All(vol.Coerce(int), vol.Range(min=0, max=3600)),
+                vol.Optional(
+                    "auto_discover", default=options.get("auto_discover", True)
+                ): bool,
+                vol.Optional(
+                    "opentelemetry", default=options.get("opentelemetry", False)
+                ): bool,
+                # Comma-separated API base URLs of the same data center
+                vol.Optional(
+                    "failover_urls", default=options.get("failover_urls", "")
+                ): str,
+            }
+        )
+        return self.async_show_form(step_id="init", data_schema=schema)
+
+
+def device_entry(device: dict, device_id: str) -> dict:
+    """Return the record stored in the entry's device list for a Tuya device."""
+    entry = {"id": device_id, "name": _device_name(device, device_id)}
+    category = device.get("category")
+    if category:
+        entry["category"] = category
+    product_id = device.get("productId") or device.get("product_id")
+    if product_id:
+        entry["product_id"] = product_id
+    return entry
+
+
+def _device_name(device: dict, fallback: str) -> str:
+    """Return the best display name for a Tuya device record."""
+    for key in ("customName", "custom_name", "name", "product_name"):
+        name = (device.get(key) or "").strip()
+        if name:
+            return name
+    return fallback
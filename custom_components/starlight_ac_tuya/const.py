@@ -0,0 +1,27 @@
+"""Constants shared by the platforms.
+
+No Home Assistant imports, so importing this doesn't load another
+platform's integration.
+"""
+
+# fan_speed_enum values and the fan modes they are shown as
+FAN_ENUM_MAP = {
+    "0": "Auto",
+    "1": "Silent",
+    "3": "Low",
+    "5": "Mid",
+    "7": "Strong",
+}
+FAN_ENUM_REVERSE = {v: k for k, v in FAN_ENUM_MAP.items()}
+
+# DP codes the fan, number and select platforms build entities from; a
+# device gets an entity only for codes it reports, and a platform is set up
+# only if some device reports one of them. Fan speed is controlled from the
+# climate entity, so there is no fan entity, and no numeric DPs are exposed.
+FAN_DP_CODES = ()
+NUMBER_DP_CODES = ()
+SELECT_DP_CODES = ("gear_vertical", "gear_horizontal")
+
+# Instrumentation modules, left out of profile summaries and loop monitor
+# call sites so they only show the integration code being measured
+INSTRUMENTATION_MODULES = frozenset({"loopmonitor.py", "profiler.py"})
@@ -1,7 +1,14 @@
+from homeassistant.core import callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 from datetime import timedelta
 from typing import TYPE_CHECKING
 import logging
+import time
+
+from .loopmonitor import monitored
+from .tracing import span
+from .tuya_api import MAX_RETRIES, device_online
 
 if TYPE_CHECKING:
     # Import for type checking only to satisfy linters without adding runtime dependency
@@ -9,26 +16,302 @@ if TYPE_CHECKING:
 
 _LOGGER = logging.getLogger(__name__)
 
+# Dispatcher signal (formatted with the entry ID) carrying the device records
+# added to a running entry
+SIGNAL_DEVICES_ADDED = "starlight_ac_tuya_devices_added_{}"
+
+# Default status poll interval (seconds)
+DEFAULT_SCAN_INTERVAL = 120
+# Consecutive failed polls after which a device is treated as offline
+OFFLINE_FAILURE_THRESHOLD = 3
+# Upper bound for the backed-off probe interval of an offline device (seconds)
+OFFLINE_PROBE_MAX = 3600
+
+# Stale-while-revalidate: keep serving the last good state through this many
+# consecutive failed polls or this many seconds, whichever ends first.
+DEFAULT_STALE_MAX_FAILURES = 3
+DEFAULT_STALE_MAX_SECONDS = 600
+# Poll interval while serving stale data (seconds)
+STALE_RETRY_INTERVAL = 15
+
 
 class TuyaACCoordinator(DataUpdateCoordinator):
     def __init__(
-        self, hass, api: "TuyaAPI", device_id: str, update_interval_seconds: int = 120
+        self,
+        hass,
+        api: "TuyaAPI",
+        device_id: str,
+        update_interval_seconds: int = DEFAULT_SCAN_INTERVAL,
+        stale_max_failures: int = DEFAULT_STALE_MAX_FAILURES,
+        stale_max_seconds: int = DEFAULT_STALE_MAX_SECONDS,
     ):
         super().__init__(
             hass,
             _LOGGER,
             name=f"Tuya AC {device_id}",
             update_interval=timedelta(seconds=update_interval_seconds),
+            # Unchanged polls return the same dict, so listeners are skipped
+            always_update=False,
         )
         self.api = api
         self.device_id = device_id
         self.data = {}
+        self._base_interval = timedelta(seconds=update_interval_seconds)
+        self.online = True
+        self.consecutive_failures = 0
+        self._probe_count = 0
+        self.stale_max_failures = stale_max_failures
+        self.stale_max_seconds = stale_max_seconds
+        self.stale = False
+        self._last_success: float | None = None
+        # DP codes used by loaded entities (code -> subscriber count) and the
+        # report time of each code as last seen via the shadow API.
+        self._codes: dict[str, int] = {}
+        self._dp_times: dict[str, int] = {}
+        self._use_shadow = True
+
+    def apply_options(
+        self,
+        update_interval_seconds: int | None = None,
+        stale_max_failures: int | None = None,
+        stale_max_seconds: int | None = None,
+    ):
+        """Change polling settings in place, without refreshing.
+
+        An offline device keeps its probe backoff and a stale one its short
+        retry interval; the new base interval applies once they recover.
+        """
+        if stale_max_failures is not None:
+            self.stale_max_failures = stale_max_failures
+        if stale_max_seconds is not None:
+            self.stale_max_seconds = stale_max_seconds
+        if update_interval_seconds is None:
+            return
+        interval = timedelta(seconds=update_interval_seconds)
+        if interval == self._base_interval:
+            return
+        self._base_interval = interval
+        if self.online and not self.stale:
+            self.update_interval = interval
+            # Re-arm the pending poll so a shorter interval applies now
+            # rather than after the previously scheduled refresh.
+            if self._listeners:
+                self._schedule_refresh()
+
+    def async_subscribe_codes(self, codes):
+        """Register DP codes an entity reads; returns a function to undo it.
+
+        Once any codes are registered, polls fetch only those codes.
+        """
+        codes = tuple(codes)
+        for code in codes:
+            self._codes[code] = self._codes.get(code, 0) + 1
+
+        def _unsubscribe():
+            for code in codes:
+                count = self._codes.get(code, 0) - 1
+                if count > 0:
+                    self._codes[code] = count
+                else:
+                    self._codes.pop(code, None)
+
+        return _unsubscribe
+
+    def async_set_updated_data(self, data):
+        # Optimistic writes from entities: make the next poll re-read any code
+        # whose value changed, even if its report time did not.
+        changed = [code for code, value in data.items() if self.data.get(code) != value]
+        for code in changed:
+            self._dp_times.pop(code, None)
+        with span("state_write", device_id=self.device_id, codes=",".join(changed)):
+            super().async_set_updated_data(data)
+
+    async def _async_fetch(self, max_retries: int) -> dict:
+        """Fetch the device state, limited to subscribed DP codes if possible."""
+        if self._codes and self._use_shadow:
+            properties = await self.api.async_get_shadow_properties(
+                self.device_id, sorted(self._codes), max_retries=max_retries
+            )
+            if properties is not None:
+                return self._merge_properties(properties)
+            _LOGGER.info(
+                "Shadow properties API not available to this project, "
+                "polling full status for %s",
+                self.device_id,
+            )
+            self._use_shadow = False
+        status = await self.api.async_get_status(
+            self.device_id, max_retries=max_retries
+        )
+        return {dp["code"]: dp["value"] for dp in status}
+
+    def _merge_properties(self, properties: list) -> dict:
+        """Merge shadow properties into the current data.
+
+        Codes whose report time is unchanged are skipped. If nothing changed
+        the current dict itself is returned so no state writes are triggered.
+        """
+        data = self.data
+        changed = False
+        for prop in properties:
+            code = prop.get("code")
+            if code is None:
+                continue
+            report_time = prop.get("time")
+            if (
+                report_time is not None
+                and self._dp_times.get(code) == report_time
+                and code in data
+            ):
+                continue
+            self._dp_times[code] = report_time
+            value = prop.get("value")
+            if code in data and data[code] == value:
+                continue
+            if not changed:
+                data = dict(data)
+                changed = True
+            data[code] = value
+        return data
+
+    @property
+    def data_age(self) -> float | None:
+        """Seconds since the last successful poll, or None if never polled."""
+        if self._last_success is None:
+            return None
+        return time.monotonic() - self._last_success
 
+    def _within_stale_window(self) -> bool:
+        age = self.data_age
+        return (
+            bool(self.data)
+            and age is not None
+            and self.consecutive_failures <= self.stale_max_failures
+            and age <= self.stale_max_seconds
+        )
+
+    def set_online(self, online: bool):
+        """Apply the device's online state.
+
+        Offline devices are no longer polled for status; instead they get a
+        cheap device-info probe on an exponentially growing interval until the
+        cloud reports them online again.
+        """
+        if online == self.online:
+            return
+        self.online = online
+        if online:
+            _LOGGER.info("Device %s is back online", self.device_id)
+            # Failure and probe counters are only reset by a successful poll,
+            # so a device that keeps failing neither re-enters the stale
+            # window nor restarts its backoff.
+            self.update_interval = self._base_interval
+        else:
+            _LOGGER.warning(
+                "Device %s is offline, backing off status polling", self.device_id
+            )
+            self._schedule_probe()
+
+    def _schedule_probe(self):
+        delay = self._base_interval.total_seconds() * 2 ** (self._probe_count + 1)
+        self._probe_count += 1
+        self.update_interval = timedelta(seconds=min(delay, OFFLINE_PROBE_MAX))
+
+    async def _async_probe(self):
+        """Check whether an offline device has come back, without retries."""
+        try:
+            infos = await self.api.async_get_devices_info(
+                [self.device_id], max_retries=0
+            )
+        except Exception as e:
+            self._schedule_probe()
+            raise UpdateFailed(e)
+        if not infos or not device_online(infos[0]):
+            self._schedule_probe()
+            raise UpdateFailed(f"Device {self.device_id} is offline")
+        self.set_online(True)
+
+    @monitored("poll")
     async def _async_update_data(self):
+        if not self.online:
+            await self._async_probe()
+        # After a failed poll, don't multiply load with request-level retries
+        max_retries = 0 if self.consecutive_failures else MAX_RETRIES
         try:
-            status = await self.api.async_get_status(self.device_id)
-            self.data = {dp["code"]: dp["value"] for dp in status}
-            _LOGGER.debug("Fetched status for %s: %s", self.device_id, self.data)
-            return self.data
+            data = await self._async_fetch(max_retries)
         except Exception as e:
+            self.consecutive_failures += 1
+            if self._within_stale_window():
+                # Keep entities available on the last known state and
+                # revalidate sooner than the normal interval.
+                self.stale = True
+                _LOGGER.warning(
+                    "Polling %s failed (%d in a row), serving state from %ds ago: %s",
+                    self.device_id,
+                    self.consecutive_failures,
+                    self.data_age,
+                    e,
+                )
+                self.update_interval = timedelta(
+                    seconds=min(
+                        STALE_RETRY_INTERVAL, self._base_interval.total_seconds()
+                    )
+                )
+                # The data itself is unchanged; write states for the age attribute
+                self.async_update_listeners()
+                return self.data
+            self.stale = False
+            if self.consecutive_failures >= OFFLINE_FAILURE_THRESHOLD:
+                self.set_online(False)
+            else:
+                self.update_interval = self._base_interval
             raise UpdateFailed(e)
+
+        was_stale = self.stale
+        self.stale = False
+        if was_stale and data is self.data:
+            self.async_update_listeners()
+        self.data = data
+        self.consecutive_failures = 0
+        self._probe_count = 0
+        self._last_success = time.monotonic()
+        self.update_interval = self._base_interval
+        _LOGGER.debug("Fetched status for %s: %s", self.device_id, self.data)
+        return self.data
+
+
+def async_setup_device_entities(hass, entry, async_add_entities, build):
+    """Add a platform's entities for the entry's devices, now and later.
+
+    Args:
+        build: Called as build(coordinator, api, device) for each device
+            record; returns that device's entities.
+    """
+    data = hass.data.get("starlight_ac_tuya", {}).get(entry.entry_id)
+    if not data:
+        return
+    api = data["api"]
+    coordinators = data["coordinators"]
+    # Coordinator each device's entities were built for; a device that is
+    # removed and later found again gets a new coordinator and new entities.
+    added = {}
+
+    @callback
+    def _async_add_devices(devices):
+        entities = []
+        for device in devices:
+            device_id = device.get("id")
+            coord = coordinators.get(device_id)
+            if not coord or added.get(device_id) is coord:
+                continue
+            added[device_id] = coord
+            entities.extend(build(coord, api, device))
+        if entities:
+            async_add_entities(entities)
+
+    _async_add_devices(data.get("devices", []))
+    entry.async_on_unload(
+        async_dispatcher_connect(
+            hass, SIGNAL_DEVICES_ADDED.format(entry.entry_id), _async_add_devices
+        )
+    )
@@ -0,0 +1,38 @@
+from homeassistant.components.diagnostics import async_redact_data
+
+DOMAIN = "starlight_ac_tuya"
+
+TO_REDACT = {"client_id", "client_secret", "access_token", "token"}
+
+
+async def async_get_config_entry_diagnostics(hass, entry) -> dict:
+    """Return API client metrics and per-device polling health."""
+    diagnostics = {"entry": async_redact_data(entry.as_dict(), TO_REDACT)}
+    data = hass.data.get(DOMAIN, {}).get(entry.entry_id)
+    if not data:
+        return diagnostics
+
+    api = data["api"]
+    diagnostics["api"] = {
+        "base_url": api.base_url,
+        "endpoints": api.get_endpoint_stats(),
+        "call_deadlines": api.call_deadlines,
+        "timeouts": api.get_timeouts(),
+        "concurrency": api.get_concurrency_stats(),
+        "metrics": api.get_metrics(),
+    }
+    diagnostics["traces"] = api.tracer.dump()
+    diagnostics["platforms"] = sorted(data.get("platforms", ()))
+    diagnostics["coordinators"] = {
+        device_id: {
+            "online": coordinator.online,
+            "stale": coordinator.stale,
+            "last_update_success": coordinator.last_update_success,
+            "consecutive_failures": coordinator.consecutive_failures,
+            "data_age": coordinator.data_age,
+            "update_interval": coordinator.update_interval.total_seconds(),
+            "data": coordinator.data,
+        }
+        for device_id, coordinator in data["coordinators"].items()
+    }
+    return diagnostics
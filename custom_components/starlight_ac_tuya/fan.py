@@ -3,22 +3,22 @@ from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 import logging
 
+from .const import FAN_DP_CODES, FAN_ENUM_MAP
+from .coordinator import async_setup_device_entities
+
 _LOGGER = logging.getLogger(__name__)
 
 _FAN_DP_PREFER = ["fan_speed_enum"]
 
-_FAN_ENUM_MAP = {
-    "0": "Auto",
-    "1": "Silent",
-    "3": "Low",
-    "5": "Mid",
-    "7": "Strong",
-}
-_FAN_ENUM_REVERSE = {v: k for k, v in _FAN_ENUM_MAP.items()}
-
 
 async def async_setup_entry(hass, entry, async_add_entities):
-    return
+    async_setup_device_entities(hass, entry, async_add_entities, _device_entities)
+
+
+def _device_entities(coord, api, device):
+    if not any(coord.data.get(dp) is not None for dp in FAN_DP_CODES):
+        return []
+    return [TuyaACFan(coord, api, device["id"], "Fan")]
 
 
 class TuyaACFan(CoordinatorEntity, FanEntity):
@@ -29,6 +29,11 @@ class TuyaACFan(CoordinatorEntity, FanEntity):
         self.device_id = device_id
         self._attr_name = name
         self._attr_unique_id = f"{device_id}_fan"
+        self._dp_codes = ("switch", *_FAN_DP_PREFER)
+
+    async def async_added_to_hass(self):
+        await super().async_added_to_hass()
+        self.async_on_remove(self.coordinator.async_subscribe_codes(self._dp_codes))
 
     @property
     def is_on(self):
@@ -69,14 +74,14 @@ class TuyaACFan(CoordinatorEntity, FanEntity):
     def preset_modes(self) -> list[str] | None:
         if self.coordinator.data.get("fan_speed_enum") is None:
             return None
-        return list(_FAN_ENUM_MAP.values())
+        return list(FAN_ENUM_MAP.values())
 
     @property
     def preset_mode(self) -> str | None:
         v = self.coordinator.data.get("fan_speed_enum")
         if v is None:
             return None
-        return _FAN_ENUM_MAP.get(str(v), str(v))
+        return FAN_ENUM_MAP.get(str(v), str(v))
 
     @property
     def device_info(self) -> DeviceInfo:
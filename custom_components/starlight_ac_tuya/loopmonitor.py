@@ -0,0 +1,279 @@
+"""Event-loop blocking detector for the integration's coroutines.
+
+While a LoopMonitor runs, coroutines passed through track() (coordinator
+polls, entity commands and the API client's request tasks) are wrapped so
+that every synchronous slice, the code run between two suspending awaits,
+is timed on the loop thread. Slices over the threshold are logged and kept
+with the integration code lines they resumed and suspended at, and loop
+time is summed per device and per operation.
+
+Time spent in a tracked coroutine awaited directly by another one counts
+only for the inner one. Nothing is wrapped while no monitor is running.
+Standard library only.
+"""
+
+import functools
+import logging
+import os
+import time
+from collections import abc, deque
+
+from .const import INSTRUMENTATION_MODULES
+
+_LOGGER = logging.getLogger(__name__)
+
+# Slow slices kept per run; older ones drop out but stay counted
+MAX_SLOW_SLICES = 200
+# Reported under this device for account-wide work (token, device lists)
+ACCOUNT = "account"
+
+INTEGRATION_DIR = os.path.dirname(os.path.abspath(__file__))
+_ROOT_DIR = os.path.dirname(INTEGRATION_DIR)
+
+_active: "LoopMonitor | None" = None
+# Inner slice time per running tracked slice, innermost last
+_running: list = []
+
+
+def _site(coro) -> tuple:
+    """Return the integration frames a suspended coroutine awaits in.
+
+    Outermost first, as (file, line, function) tuples; empty once the
+    coroutine has finished.
+    """
+    site = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None)
+        if frame is None:
+            break
+        code = frame.f_code
+        if code.co_filename.startswith(INTEGRATION_DIR) and (
+            os.path.basename(code.co_filename) not in INSTRUMENTATION_MODULES
+        ):
+            site.append((code.co_filename, frame.f_lineno, code.co_name))
+        coro = coro.cr_await
+    return tuple(site)
+
+
+def _label(site: tuple) -> str:
+    if not site:
+        return "(returned)"
+    return " > ".join(
+        f"{os.path.relpath(filename, _ROOT_DIR)}:{lineno}({name})"
+        for filename, lineno, name in site
+    )
+
+
+class _Stats:
+    __slots__ = ("max", "slices", "slow", "total")
+
+    def __init__(self):
+        self.slices = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.slow = 0
+
+    def add(self, seconds: float, slow: bool):
+        self.slices += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        if slow:
+            self.slow += 1
+
+    def as_dict(self) -> dict:
+        return {
+            "slices": self.slices,
+            "total_ms": round(self.total * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+            "slow": self.slow,
+        }
+
+
+class _TrackedCoroutine(abc.Coroutine):
+    """Forwards a coroutine, timing each send()/throw() on the loop."""
+
+    __slots__ = ("_coro", "_device_id", "_monitor", "_name", "_resumed_at")
+
+    def __init__(self, coro, monitor: "LoopMonitor", device_id: str, name: str):
+        self._coro = coro
+        self._monitor = monitor
+        self._device_id = device_id
+        self._name = name
+        code = coro.cr_code
+        self._resumed_at = ((code.co_filename, code.co_firstlineno, code.co_name),)
+
+    def send(self, value):
+        return self._step(self._coro.send, value)
+
+    def throw(self, *args):
+        return self._step(self._coro.throw, *args)
+
+    def close(self):
+        return self._coro.close()
+
+    def __await__(self):
+        return self
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.send(None)
+
+    # Let asyncio's task repr and _site() see through the wrapper
+    @property
+    def cr_await(self):
+        return self._coro.cr_await
+
+    @property
+    def cr_frame(self):
+        return self._coro.cr_frame
+
+    @property
+    def cr_code(self):
+        return self._coro.cr_code
+
+    @property
+    def cr_running(self):
+        return self._coro.cr_running
+
+    def _step(self, method, *args):
+        monitor = self._monitor
+        if not monitor.running:
+            return method(*args)
+        _running.append(0.0)
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            elapsed = time.perf_counter() - started
+            inner = _running.pop()
+            if _running:
+                _running[-1] += elapsed
+            resumed_at = self._resumed_at
+            self._resumed_at = _site(self._coro)
+            monitor.record(
+                self._device_id,
+                self._name,
+                elapsed - inner,
+                resumed_at,
+                self._resumed_at,
+            )
+
+
+def track(coro, device_id: str, name: str):
+    """Return coro, timed by the running monitor if there is one."""
+    monitor = _active
+    if monitor is None:
+        return coro
+    return _TrackedCoroutine(coro, monitor, device_id or ACCOUNT, name)
+
+
+def monitored(name: str):
+    """Track an async method as operation `name` of `self.device_id`."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            return await track(func(self, *args, **kwargs), self.device_id, name)
+
+        return wrapper
+
+    return decorator
+
+
+class LoopMonitor:
+    """One monitoring run; start() and stop() on the event loop thread."""
+
+    def __init__(self, threshold: float = 0.01, top: int = 25):
+        self.threshold = threshold
+        self.top = top
+        self.running = False
+        self.started: float | None = None
+        self.duration = 0.0
+        self.total = _Stats()
+        self.devices: dict[str, _Stats] = {}
+        self.operations: dict[str, _Stats] = {}
+        self.slow_slices: deque = deque(maxlen=MAX_SLOW_SLICES)
+
+    def start(self):
+        """Start tracking newly started coroutines; one run at a time."""
+        global _active
+        if _active is not None:
+            raise RuntimeError("The loop monitor is already running")
+        _active = self
+        self.running = True
+        self.started = time.monotonic()
+
+    def stop(self):
+        """Stop tracking; coroutines wrapped so far run on untimed."""
+        global _active
+        if _active is not self:
+            return
+        self.duration = time.monotonic() - self.started
+        self.running = False
+        _active = None
+
+    def record(
+        self,
+        device_id: str,
+        name: str,
+        seconds: float,
+        resumed_at: tuple,
+        suspended_at: tuple,
+    ):
+        slow = seconds >= self.threshold
+        self.total.add(seconds, slow)
+        device = self.devices.get(device_id)
+        if device is None:
+            device = self.devices[device_id] = _Stats()
+        device.add(seconds, slow)
+        operation = self.operations.get(name)
+        if operation is None:
+            operation = self.operations[name] = _Stats()
+        operation.add(seconds, slow)
+        if not slow:
+            return
+        _LOGGER.warning(
+            "%s for %s blocked the event loop for %.1f ms, from %s to %s",
+            name,
+            device_id,
+            seconds * 1000,
+            _label(resumed_at),
+            _label(suspended_at),
+        )
+        self.slow_slices.append(
+            (time.monotonic(), device_id, name, seconds, resumed_at, suspended_at)
+        )
+
+    def report(self) -> dict:
+        """Return loop time per device and operation, and the slow slices."""
+        duration = (
+            self.duration if not self.running else time.monotonic() - self.started
+        )
+
+        def _ranked(stats: dict) -> dict:
+            ranked = sorted(stats.items(), key=lambda item: item[1].total, reverse=True)
+            return {key: value.as_dict() for key, value in ranked[: self.top]}
+
+        return {
+            "duration_s": round(duration, 3),
+            "threshold_ms": round(self.threshold * 1000, 3),
+            **self.total.as_dict(),
+            "loop_share": round(self.total.total / duration, 5) if duration else None,
+            "devices": _ranked(self.devices),
+            "operations": _ranked(self.operations),
+            "slow_slices": [
+                {
+                    "at_s": round(at - self.started, 3),
+                    "device_id": device_id,
+                    "operation": name,
+                    "ms": round(seconds * 1000, 3),
+                    "resumed_at": _label(resumed_at),
+                    "suspended_at": _label(suspended_at),
+                }
+                for at, device_id, name, seconds, resumed_at, suspended_at in sorted(
+                    self.slow_slices, key=lambda item: item[3], reverse=True
+                )[: self.top]
+            ],
+        }
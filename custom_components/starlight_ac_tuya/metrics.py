@@ -0,0 +1,227 @@
+"""Bounded-memory request metrics for the Tuya API client.
+
+Latencies go into fixed-bucket histograms, both since startup and over a
+rolling window made of a few per-slot histograms, so memory use does not
+grow with the number of requests.
+"""
+
+import time
+from collections import deque
+
+# Upper bounds of the latency histogram buckets (seconds); one more bucket
+# collects everything slower.
+LATENCY_BUCKETS = (
+    0.05,
+    0.1,
+    0.15,
+    0.2,
+    0.3,
+    0.4,
+    0.5,
+    0.75,
+    1.0,
+    1.5,
+    2.0,
+    3.0,
+    5.0,
+    7.5,
+    10.0,
+    15.0,
+    20.0,
+)
+
+# Rolling window for the reported percentiles: WINDOW_SLOTS slots of
+# WINDOW_SLOT_SECONDS each (5 minutes)
+WINDOW_SLOT_SECONDS = 30
+WINDOW_SLOTS = 10
+
+# Distinct error codes / HTTP statuses kept per endpoint class; any further
+# ones are counted under "other".
+MAX_ERROR_CODES = 16
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram."""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float):
+        index = len(LATENCY_BUCKETS)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def merge(self, other: "LatencyHistogram"):
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q: float) -> float | None:
+        """Estimate the q-th percentile (0-100), interpolating in its bucket."""
+        if not self.count:
+            return None
+        rank = q / 100 * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if not count or seen + count < rank:
+                seen += count
+                continue
+            lower = LATENCY_BUCKETS[i - 1] if i else 0.0
+            upper = LATENCY_BUCKETS[i] if i < len(LATENCY_BUCKETS) else self.max
+            upper = min(upper, self.max)
+            lower = min(lower, upper)
+            return lower + (upper - lower) * (rank - seen) / count
+        return self.max
+
+    def summary(self) -> dict:
+        """Return count, mean, max and p50/p95/p99 in milliseconds."""
+
+        def _ms(value):
+            return None if value is None else round(value * 1000, 1)
+
+        return {
+            "count": self.count,
+            "mean_ms": _ms(self.total / self.count if self.count else None),
+            "max_ms": _ms(self.max if self.count else None),
+            "p50_ms": _ms(self.percentile(50)),
+            "p95_ms": _ms(self.percentile(95)),
+            "p99_ms": _ms(self.percentile(99)),
+        }
+
+
+class RollingHistogram:
+    """Latency histogram over the last WINDOW_SLOTS * WINDOW_SLOT_SECONDS."""
+
+    def __init__(self):
+        # (slot number, histogram) pairs, oldest first
+        self._slots: deque = deque(maxlen=WINDOW_SLOTS)
+
+    def add(self, seconds: float, now: float | None = None):
+        slot = int((time.monotonic() if now is None else now) // WINDOW_SLOT_SECONDS)
+        if not self._slots or self._slots[-1][0] != slot:
+            self._slots.append((slot, LatencyHistogram()))
+        self._slots[-1][1].add(seconds)
+
+    def snapshot(self, now: float | None = None) -> LatencyHistogram:
+        current = int((time.monotonic() if now is None else now) // WINDOW_SLOT_SECONDS)
+        merged = LatencyHistogram()
+        for slot, histogram in self._slots:
+            if current - slot < WINDOW_SLOTS:
+                merged.merge(histogram)
+        return merged
+
+
+def _count_bounded(counter: dict, key):
+    key = str(key)
+    if key not in counter and len(counter) >= MAX_ERROR_CODES:
+        key = "other"
+    counter[key] = counter.get(key, 0) + 1
+
+
+class EndpointMetrics:
+    """Counters and latencies for one endpoint class."""
+
+    def __init__(self):
+        self.attempts = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.retries = 0
+        self.shared = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.error_codes: dict[str, int] = {}
+        self.http_errors: dict[str, int] = {}
+        self.latency = LatencyHistogram()
+        self.recent = RollingHistogram()
+
+    def as_dict(self) -> dict:
+        return {
+            "attempts": self.attempts,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "retries": self.retries,
+            "shared": self.shared,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "error_codes": dict(self.error_codes),
+            "http_errors": dict(self.http_errors),
+            "latency": self.latency.summary(),
+            "latency_recent": self.recent.snapshot().summary(),
+        }
+
+
+class ApiMetrics:
+    """Request metrics of one TuyaAPI client, per endpoint class."""
+
+    def __init__(self, endpoints):
+        self.endpoints = {name: EndpointMetrics() for name in endpoints}
+        self.token_refreshes = 0
+        self.token_invalidations = 0
+
+    def record_response(
+        self,
+        endpoint: str,
+        seconds: float,
+        bytes_sent: int,
+        bytes_received: int,
+        status: int,
+    ):
+        """Record a completed HTTP round trip (any status)."""
+        metrics = self.endpoints[endpoint]
+        metrics.attempts += 1
+        metrics.bytes_sent += bytes_sent
+        metrics.bytes_received += bytes_received
+        metrics.latency.add(seconds)
+        metrics.recent.add(seconds)
+        if status >= 400:
+            _count_bounded(metrics.http_errors, status)
+
+    def record_failure(self, endpoint: str, timeout: bool = False):
+        """Record an attempt that got no usable response."""
+        metrics = self.endpoints[endpoint]
+        metrics.failures += 1
+        if timeout:
+            metrics.timeouts += 1
+
+    def record_retry(self, endpoint: str):
+        self.endpoints[endpoint].retries += 1
+
+    def record_shared(self, endpoint: str):
+        """Record a GET answered by joining an identical in-flight request."""
+        self.endpoints[endpoint].shared += 1
+
+    def record_error_code(self, endpoint: str, code):
+        """Record an unsuccessful API response ("success": false)."""
+        _count_bounded(self.endpoints[endpoint].error_codes, code)
+
+    def totals(self) -> dict:
+        """Return counters summed over all endpoint classes."""
+        endpoints = self.endpoints.values()
+        return {
+            "attempts": sum(m.attempts for m in endpoints),
+            "failures": sum(m.failures for m in endpoints),
+            "retries": sum(m.retries for m in endpoints),
+            "api_errors": sum(sum(m.error_codes.values()) for m in endpoints),
+            "bytes_received": sum(m.bytes_received for m in endpoints),
+            "token_refreshes": self.token_refreshes,
+            "token_invalidations": self.token_invalidations,
+        }
+
+    def as_dict(self) -> dict:
+        return {
+            "totals": self.totals(),
+            "endpoints": {
+                name: metrics.as_dict() for name, metrics in self.endpoints.items()
+            },
+        }
@@ -3,30 +3,26 @@ from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 import logging
 
-_LOGGER = logging.getLogger(__name__)
+from .const import NUMBER_DP_CODES
+from .coordinator import async_setup_device_entities
+from .tracing import traced
 
-_NUMERIC_DP_CANDIDATES = []
+_LOGGER = logging.getLogger(__name__)
 
 
 async def async_setup_entry(hass, entry, async_add_entities):
-    data = hass.data.get("starlight_ac_tuya", {}).get(entry.entry_id)
-    if not data:
-        return
-    api = data["api"]
-    coordinators = data["coordinators"]
-    devices = data.get("devices", [])
+    async_setup_device_entities(hass, entry, async_add_entities, _device_entities)
+
 
+def _device_entities(coord, api, device):
+    device_id = device["id"]
     entities = []
-    for device in devices:
-        device_id = device.get("id")
-        coord = coordinators.get(device_id)
-        if not coord:
+    for dp in NUMBER_DP_CODES:
+        if coord.data.get(dp) is None:
             continue
-        for dp in _NUMERIC_DP_CANDIDATES:
-            display_name = dp.replace("_", " ").title()
-            entities.append(TuyaACNumber(coord, api, device_id, dp, display_name))
-
-    async_add_entities(entities)
+        display_name = dp.replace("_", " ").title()
+        entities.append(TuyaACNumber(coord, api, device_id, dp, display_name))
+    return entities
 
 
 class TuyaACNumber(CoordinatorEntity, NumberEntity):
@@ -41,6 +37,11 @@ class TuyaACNumber(CoordinatorEntity, NumberEntity):
         self._attr_native_min_value = 0
         self._attr_native_max_value = 100
         self._attr_native_step = 1
+        self._dp_codes = (dp_code,)
+
+    async def async_added_to_hass(self):
+        await super().async_added_to_hass()
+        self.async_on_remove(self.coordinator.async_subscribe_codes(self._dp_codes))
 
     @property
     def native_value(self):
@@ -59,6 +60,7 @@ class TuyaACNumber(CoordinatorEntity, NumberEntity):
             manufacturer="Star-Light",
         )
 
+    @traced("number.set_value")
     async def async_set_native_value(self, value: float) -> None:
         try:
             await self.api.async_send_command(
@@ -67,7 +69,7 @@ class TuyaACNumber(CoordinatorEntity, NumberEntity):
             try:
                 new_data = dict(self.coordinator.data or {})
                 new_data[self.dp_code] = value
-                await self.coordinator.async_set_updated_data(new_data)
+                self.coordinator.async_set_updated_data(new_data)
             except Exception:
                 _LOGGER.debug(
                     "Could not optimistically update %s %s",
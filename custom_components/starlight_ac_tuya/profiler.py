@@ -0,0 +1,245 @@
+"""On-demand profiling of the integration's work on the event loop.
+
+Two modes:
+
+- "sampling": a SIGPROF timer records the event loop's Python stack every
+  few milliseconds of CPU time, so an idle loop is not sampled. Cheap
+  enough for a busy instance; needs the loop on the main thread, as Home
+  Assistant runs it. The profile file holds folded stacks (one "a;b;c
+  count" line per stack) for flamegraph.pl or speedscope.
+- "cprofile": deterministic profiling of everything the event loop thread
+  runs. Exact call counts, but it slows the loop down while running; the
+  profile file is a pstats dump for snakeviz or python -m pstats.
+
+Summaries only count code in this integration's directory, other than the
+profiler and loop monitor themselves, together with what it calls (request
+signing, JSON parsing, coordinator updates, entity state writes). Nothing
+is installed while no profile is running.
+"""
+
+import cProfile
+import os
+import pstats
+import signal
+import time
+from collections import Counter
+
+from .const import INSTRUMENTATION_MODULES
+
+MODES = ("sampling", "cprofile")
+# Seconds of process CPU time between stack samples in sampling mode
+SAMPLE_INTERVAL = 0.005
+
+INTEGRATION_DIR = os.path.dirname(os.path.abspath(__file__))
+_ROOT_DIR = os.path.dirname(INTEGRATION_DIR)
+
+_active: "Profiler | None" = None
+
+
+def _in_integration(filename: str) -> bool:
+    return (
+        filename.startswith(INTEGRATION_DIR)
+        and os.path.basename(filename) not in INSTRUMENTATION_MODULES
+    )
+
+
+def _label(filename: str, lineno: int, name: str) -> str:
+    if _in_integration(filename):
+        filename = os.path.relpath(filename, _ROOT_DIR)
+    return f"{filename}:{lineno}({name})"
+
+
+class Profiler:
+    """One profiling run; start() and stop() on the event loop thread."""
+
+    def __init__(self, mode: str = "sampling", top: int = 25):
+        if mode not in MODES:
+            raise ValueError(f"Unknown profiling mode: {mode}")
+        self.mode = mode
+        self.top = top
+        self.started: float | None = None
+        self.duration = 0.0
+        self._profile: cProfile.Profile | None = None
+        self._stacks: Counter = Counter()
+        self._samples = 0
+        self._previous_handler = None
+
+    def start(self):
+        """Start profiling the calling thread; only one run at a time."""
+        global _active
+        if _active is not None:
+            raise RuntimeError("A profile is already running")
+        if self.mode == "cprofile":
+            self._profile = cProfile.Profile()
+            try:
+                self._profile.enable()
+            except ValueError as err:
+                # Another profiler (e.g. HA's profiler integration) is active
+                raise RuntimeError(str(err)) from err
+        else:
+            if not hasattr(signal, "setitimer"):
+                raise RuntimeError("Sampling needs signal.setitimer")
+            try:
+                self._previous_handler = signal.signal(signal.SIGPROF, self._sample)
+            except ValueError as err:
+                # Signal handlers can only be set from the main thread
+                raise RuntimeError(f"Sampling needs the main thread: {err}") from err
+            signal.setitimer(signal.ITIMER_PROF, SAMPLE_INTERVAL, SAMPLE_INTERVAL)
+        _active = self
+        self.started = time.monotonic()
+
+    def stop(self):
+        """Stop profiling; call write() (in an executor) for the results."""
+        global _active
+        if _active is not self:
+            return
+        self.duration = time.monotonic() - self.started
+        if self._profile is not None:
+            self._profile.disable()
+        else:
+            signal.setitimer(signal.ITIMER_PROF, 0)
+            signal.signal(signal.SIGPROF, self._previous_handler)
+        _active = None
+
+    def _sample(self, signum, frame):
+        stack = []
+        while frame is not None:
+            stack.append(frame.f_code)
+            frame = frame.f_back
+        self._samples += 1
+        self._stacks[tuple(stack)] += 1
+
+    def write(self, directory: str, basename: str) -> dict:
+        """Write the profile and a text summary; return the summary.
+
+        Does file I/O and the summary computation, so run it in an executor.
+        """
+        if self.mode == "cprofile":
+            profile_path = os.path.join(directory, f"{basename}.prof")
+            self._profile.dump_stats(profile_path)
+            summary = self._cprofile_summary()
+        else:
+            profile_path = os.path.join(directory, f"{basename}.folded")
+            with open(profile_path, "w", encoding="utf-8") as file:
+                for stack, count in self._stacks.items():
+                    if any(_in_integration(code.co_filename) for code in stack):
+                        names = (
+                            f"{os.path.basename(code.co_filename)}:{code.co_name}"
+                            for code in reversed(stack)
+                        )
+                        file.write(f"{';'.join(names)} {count}\n")
+            summary = self._sampling_summary()
+        summary_path = os.path.join(directory, f"{basename}_summary.txt")
+        with open(summary_path, "w", encoding="utf-8") as file:
+            file.write(format_summary(summary))
+        summary["profile_file"] = profile_path
+        summary["summary_file"] = summary_path
+        return summary
+
+    def _cprofile_summary(self) -> dict:
+        stats = pstats.Stats(self._profile).stats
+        own = {key: value for key, value in stats.items() if _in_integration(key[0])}
+        # Time spent in the integration, including what it calls: cumulative
+        # time of integration functions entered from outside the integration
+        inclusive = sum(
+            edge[3]
+            for _, _, _, _, callers in own.values()
+            for caller, edge in callers.items()
+            if not _in_integration(caller[0])
+        )
+        ranked = sorted(own.items(), key=lambda item: item[1][3], reverse=True)
+        return {
+            "mode": self.mode,
+            "duration_s": round(self.duration, 3),
+            "integration_s": round(inclusive, 4),
+            "integration_share": _share(inclusive, self.duration),
+            "functions": [
+                {
+                    "function": _label(*key),
+                    "calls": calls,
+                    "self_ms": round(tottime * 1000, 3),
+                    "cumulative_ms": round(cumtime * 1000, 3),
+                }
+                for key, (_, calls, tottime, cumtime, _) in ranked[: self.top]
+            ],
+        }
+
+    def _sampling_summary(self) -> dict:
+        busy = 0
+        integration = 0
+        inclusive: Counter = Counter()
+        innermost: Counter = Counter()
+        for stack, count in self._stacks.items():
+            # Samples taken for other threads' CPU time land while the loop
+            # waits in the selector
+            if not stack[0].co_filename.endswith("selectors.py"):
+                busy += count
+            own = [code for code in stack if _in_integration(code.co_filename)]
+            if not own:
+                continue
+            integration += count
+            innermost[own[0]] += count
+            for code in set(own):
+                inclusive[code] += count
+        return {
+            "mode": self.mode,
+            "duration_s": round(self.duration, 3),
+            "samples": self._samples,
+            "busy_samples": busy,
+            "integration_samples": integration,
+            "integration_share": _share(integration * SAMPLE_INTERVAL, self.duration),
+            "integration_share_of_busy": _share(integration, busy),
+            "functions": [
+                {
+                    "function": _label(
+                        code.co_filename, code.co_firstlineno, code.co_name
+                    ),
+                    "inclusive_pct": round(count / busy * 100, 2),
+                    "innermost_pct": round(innermost[code] / busy * 100, 2),
+                }
+                for code, count in inclusive.most_common(self.top)
+            ],
+        }
+
+
+def _share(part: float, whole: float) -> float | None:
+    return round(part / whole, 4) if whole else None
+
+
+def format_summary(summary: dict) -> str:
+    """Render a profile summary as a text report."""
+    lines = [
+        f"starlight_ac_tuya {summary['mode']} profile, {summary['duration_s']:.1f}s"
+    ]
+    share = summary["integration_share"]
+    share_text = "n/a" if share is None else f"{share * 100:.2f}%"
+    if summary["mode"] == "cprofile":
+        lines.append(
+            f"Integration (incl. callees): {summary['integration_s']:.3f}s, "
+            f"{share_text} of wall time"
+        )
+        lines.append("")
+        lines.append(f"{'calls':>8} {'self ms':>10} {'cum ms':>10}  function")
+        for item in summary["functions"]:
+            lines.append(
+                f"{item['calls']:>8} {item['self_ms']:>10.3f} "
+                f"{item['cumulative_ms']:>10.3f}  {item['function']}"
+            )
+    else:
+        busy = summary["integration_share_of_busy"]
+        lines.append(
+            f"CPU samples: {summary['samples']}, event loop busy in "
+            f"{summary['busy_samples']}, integration in "
+            f"{summary['integration_samples']} (~{share_text} of wall time, "
+            f"{'n/a' if busy is None else f'{busy * 100:.2f}%'} of loop CPU)"
+        )
+        lines.append("")
+        # Percentages of loop CPU; "inner" is time not in a nested
+        # integration function
+        lines.append(f"{'incl %':>8} {'inner %':>8}  function")
+        for item in summary["functions"]:
+            lines.append(
+                f"{item['inclusive_pct']:>8.2f} {item['innermost_pct']:>8.2f}  "
+                f"{item['function']}"
+            )
+    return "\n".join(lines) + "\n"
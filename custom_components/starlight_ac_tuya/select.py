@@ -3,9 +3,11 @@ from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 import logging
 
-_LOGGER = logging.getLogger(__name__)
+from .const import SELECT_DP_CODES
+from .coordinator import async_setup_device_entities
+from .tracing import traced
 
-_SWING_DP = ["gear_vertical", "gear_horizontal"]
+_LOGGER = logging.getLogger(__name__)
 
 _VERTICAL_MAP = {
     "1": "Up-Down Flow",
@@ -25,31 +27,23 @@ _HORIZONTAL_REVERSE = {v: k for k, v in _HORIZONTAL_MAP.items()}
 
 
 async def async_setup_entry(hass, entry, async_add_entities):
-    data = hass.data.get("starlight_ac_tuya", {}).get(entry.entry_id)
-    if not data:
-        return
-    api = data["api"]
-    coordinators = data["coordinators"]
-    devices = data.get("devices", [])
+    async_setup_device_entities(hass, entry, async_add_entities, _device_entities)
+
 
+def _device_entities(coord, api, device):
+    device_id = device["id"]
     entities = []
-    for device in devices:
-        device_id = device.get("id")
-        coord = coordinators.get(device_id)
-        if not coord:
+    for dp in SELECT_DP_CODES:
+        if coord.data.get(dp) is None:
             continue
-        for dp in _SWING_DP:
-            if coord.data.get(dp) is None:
-                continue
-            if dp == "gear_vertical":
-                display_name = "Airflow - Vertical"
-            elif dp == "gear_horizontal":
-                display_name = "Airflow - Horizontal"
-            else:
-                display_name = dp.replace("_", " ").title()
-            entities.append(TuyaACSelect(coord, api, device_id, dp, display_name))
-
-    async_add_entities(entities)
+        if dp == "gear_vertical":
+            display_name = "Airflow - Vertical"
+        elif dp == "gear_horizontal":
+            display_name = "Airflow - Horizontal"
+        else:
+            display_name = dp.replace("_", " ").title()
+        entities.append(TuyaACSelect(coord, api, device_id, dp, display_name))
+    return entities
 
 
 class TuyaACSelect(CoordinatorEntity, SelectEntity):
@@ -61,6 +55,11 @@ class TuyaACSelect(CoordinatorEntity, SelectEntity):
         self.dp_code = dp_code
         self._attr_name = name
         self._attr_unique_id = f"{device_id}_{dp_code}_select"
+        self._dp_codes = (dp_code,)
+
+    async def async_added_to_hass(self):
+        await super().async_added_to_hass()
+        self.async_on_remove(self.coordinator.async_subscribe_codes(self._dp_codes))
 
     @property
     def current_option(self):
@@ -96,6 +95,7 @@ class TuyaACSelect(CoordinatorEntity, SelectEntity):
             manufacturer="Star-Light",
         )
 
+    @traced("select.select_option")
     async def async_select_option(self, option: str) -> None:
         try:
             value = option
@@ -116,7 +116,7 @@ class TuyaACSelect(CoordinatorEntity, SelectEntity):
             if not (isinstance(resp, dict) and resp.get("success") is False):
                 new_data = dict(self.coordinator.data or {})
                 new_data[self.dp_code] = value
-                await self.coordinator.async_set_updated_data(new_data)
+                self.coordinator.async_set_updated_data(new_data)
         except Exception as err:
             _LOGGER.error(
                 "Failed to set select %s for %s: %s", self.dp_code, self.device_id, err
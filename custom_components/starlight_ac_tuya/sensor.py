@@ -0,0 +1,140 @@
+import logging
+from datetime import timedelta
+
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorStateClass,
+)
+from homeassistant.const import EntityCategory, UnitOfInformation, UnitOfTime
+from homeassistant.helpers.device_registry import DeviceEntryType
+from homeassistant.helpers.entity import DeviceInfo
+
+_LOGGER = logging.getLogger(__name__)
+
+# Metrics are read from memory; one sample a minute is plenty
+SCAN_INTERVAL = timedelta(minutes=1)
+
+# (endpoint class, percentile, enabled by default) of the latency sensors.
+# Values cover the metrics' rolling window.
+_LATENCY_SENSORS = [
+    ("command", 50, False),
+    ("command", 95, True),
+    ("command", 99, False),
+    ("status", 50, False),
+    ("status", 95, True),
+    ("status", 99, False),
+]
+
+# (totals key, name) of the counter sensors
+_COUNTER_SENSORS = [
+    ("attempts", "API requests"),
+    ("failures", "API request failures"),
+    ("retries", "API retries"),
+    ("api_errors", "API error responses"),
+    ("token_refreshes", "Token refreshes"),
+    ("token_invalidations", "Token invalidations"),
+]
+
+
+async def async_setup_entry(hass, entry, async_add_entities):
+    data = hass.data.get("starlight_ac_tuya", {}).get(entry.entry_id)
+    if not data:
+        return
+    api = data["api"]
+
+    entities = [
+        TuyaApiLatencySensor(entry, api, endpoint, percentile, enabled)
+        for endpoint, percentile, enabled in _LATENCY_SENSORS
+    ]
+    entities.extend(
+        TuyaApiCounterSensor(entry, api, key, name) for key, name in _COUNTER_SENSORS
+    )
+    entities.append(TuyaApiBytesSensor(entry, api))
+    async_add_entities(entities)
+
+
+class _TuyaApiSensor(SensorEntity):
+    """Diagnostic sensor reading the API client's in-memory metrics."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_should_poll = True
+
+    def __init__(self, entry, api, key, name):
+        self.api = api
+        self._entry_id = entry.entry_id
+        self._attr_name = name
+        self._attr_unique_id = f"{entry.entry_id}_api_{key}"
+
+    @property
+    def device_info(self) -> DeviceInfo:
+        return DeviceInfo(
+            identifiers={("starlight_ac_tuya", self._entry_id)},
+            name="Tuya Cloud API",
+            manufacturer="Tuya",
+            entry_type=DeviceEntryType.SERVICE,
+        )
+
+
+class TuyaApiLatencySensor(_TuyaApiSensor):
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_icon = "mdi:timer-outline"
+
+    def __init__(self, entry, api, endpoint, percentile, enabled):
+        super().__init__(
+            entry,
+            api,
+            f"{endpoint}_latency_p{percentile}",
+            f"{endpoint.title()} latency p{percentile}",
+        )
+        self.endpoint = endpoint
+        self.percentile = percentile
+        self._attr_entity_registry_enabled_default = enabled
+
+    async def async_update(self):
+        recent = self.api.metrics.endpoints[self.endpoint].recent.snapshot()
+        value = recent.percentile(self.percentile)
+        self._attr_native_value = None if value is None else round(value * 1000, 1)
+        self._attr_extra_state_attributes = {"samples": recent.count}
+
+
+class TuyaApiCounterSensor(_TuyaApiSensor):
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+    _attr_icon = "mdi:counter"
+
+    def __init__(self, entry, api, key, name):
+        super().__init__(entry, api, key, name)
+        self.key = key
+
+    @property
+    def native_value(self):
+        return self.api.metrics.totals()[self.key]
+
+    @property
+    def extra_state_attributes(self):
+        endpoints = self.api.metrics.endpoints
+        if self.key == "api_errors":
+            return {
+                name: dict(m.error_codes)
+                for name, m in endpoints.items()
+                if m.error_codes
+            }
+        if self.key in ("attempts", "failures", "retries"):
+            return {name: getattr(m, self.key) for name, m in endpoints.items()}
+        return None
+
+
+class TuyaApiBytesSensor(_TuyaApiSensor):
+    _attr_device_class = SensorDeviceClass.DATA_SIZE
+    _attr_native_unit_of_measurement = UnitOfInformation.BYTES
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+    _attr_entity_registry_enabled_default = False
+
+    def __init__(self, entry, api):
+        super().__init__(entry, api, "bytes_received", "API data received")
+
+    @property
+    def native_value(self):
+        return self.api.metrics.totals()["bytes_received"]
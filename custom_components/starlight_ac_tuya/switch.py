@@ -3,54 +3,32 @@ from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 import logging
 
+from .coordinator import async_setup_device_entities
+from .tracing import traced
+
 
 async def async_setup_entry(hass, entry, async_add_entities):
-    data = hass.data.get("starlight_ac_tuya", {}).get(entry.entry_id)
-    if not data:
-        return
-    api = data["api"]
-    coordinators = data["coordinators"]
-    devices = data.get("devices", [])
+    async_setup_device_entities(hass, entry, async_add_entities, _device_entities)
+
 
+def _device_entities(coord, api, device):
+    device_id = device["id"]
     entities = []
-    seen_ids = set()
-
-    for device in devices:
-        device_id = device.get("id")
-        coord = coordinators.get(device_id)
-        if not coord:
-            continue
-
-        for dp_code in ["ai_eco_switch", "health", "beep", "light"]:
-            unique_id = f"{device_id}_{dp_code}_switch"
-            if unique_id not in seen_ids:
-                display_name = (
-                    "Eco"
-                    if dp_code == "ai_eco_switch"
-                    else dp_code.replace("_", " ").title()
-                )
-                entities.append(
-                    TuyaACSwitch(coord, api, device_id, dp_code, display_name)
-                )
-                seen_ids.add(unique_id)
-
-        if coord.data.get("fan_speed_enum") is not None:
-            for dp_code, display_name in [("fan_turbo", "Turbo"), ("fan_mute", "Mute")]:
-                unique_id = f"{device_id}_{dp_code}_switch"
-                if unique_id not in seen_ids:
-                    entities.append(
-                        TuyaACSwitch(coord, api, device_id, dp_code, display_name)
-                    )
-                    seen_ids.add(unique_id)
 
-        if coord.data.get("sleep_enum") is not None:
-            dp_code = "sleep_enum"
-            unique_id = f"{device_id}_{dp_code}_switch"
-            if unique_id not in seen_ids:
-                entities.append(TuyaACSwitch(coord, api, device_id, dp_code, "Sleep"))
-                seen_ids.add(unique_id)
+    for dp_code in ["ai_eco_switch", "health", "beep", "light"]:
+        display_name = (
+            "Eco" if dp_code == "ai_eco_switch" else dp_code.replace("_", " ").title()
+        )
+        entities.append(TuyaACSwitch(coord, api, device_id, dp_code, display_name))
+
+    if coord.data.get("fan_speed_enum") is not None:
+        for dp_code, display_name in [("fan_turbo", "Turbo"), ("fan_mute", "Mute")]:
+            entities.append(TuyaACSwitch(coord, api, device_id, dp_code, display_name))
 
-    async_add_entities(entities)
+    if coord.data.get("sleep_enum") is not None:
+        entities.append(TuyaACSwitch(coord, api, device_id, "sleep_enum", "Sleep"))
+
+    return entities
 
 
 _LOGGER = logging.getLogger(__name__)
@@ -76,6 +54,15 @@ class TuyaACSwitch(CoordinatorEntity, SwitchEntity):
         self._attr_name = name
         self._attr_unique_id = f"{device_id}_{dp_code}_switch"
         self._attr_icon = ICON_MAP.get(dp_code)
+        # Turbo and Mute are views of the fan speed DP, not DPs of their own
+        if dp_code in ("fan_turbo", "fan_mute"):
+            self._dp_codes = ("fan_speed_enum",)
+        else:
+            self._dp_codes = (dp_code,)
+
+    async def async_added_to_hass(self):
+        await super().async_added_to_hass()
+        self.async_on_remove(self.coordinator.async_subscribe_codes(self._dp_codes))
 
     @property
     def is_on(self):
@@ -99,6 +86,7 @@ class TuyaACSwitch(CoordinatorEntity, SwitchEntity):
             manufacturer="Star-Light",
         )
 
+    @traced("switch.turn_on")
     async def async_turn_on(self, **kwargs):
         try:
             if self.dp_code == "ai_eco_switch":
@@ -129,7 +117,7 @@ class TuyaACSwitch(CoordinatorEntity, SwitchEntity):
                         new_data["fan_turbo"] = False
                     if self.dp_code == "sleep_enum":
                         new_data["sleep_enum"] = "1"
-                    await self.coordinator.async_set_updated_data(new_data)
+                    self.coordinator.async_set_updated_data(new_data)
                 except Exception:
                     _LOGGER.debug(
                         "Could not update coordinator data for %s %s",
@@ -142,6 +130,7 @@ class TuyaACSwitch(CoordinatorEntity, SwitchEntity):
                 "Failed to turn on %s (%s): %s", self.device_id, self.dp_code, err
             )
 
+    @traced("switch.turn_off")
     async def async_turn_off(self, **kwargs):
         try:
             if self.dp_code == "ai_eco_switch":
@@ -186,7 +175,7 @@ class TuyaACSwitch(CoordinatorEntity, SwitchEntity):
                             new_data["fan_speed_enum"] = "0"
                     if self.dp_code == "sleep_enum":
                         new_data["sleep_enum"] = "0"
-                    await self.coordinator.async_set_updated_data(new_data)
+                    self.coordinator.async_set_updated_data(new_data)
                 except Exception:
                     _LOGGER.debug(
                         "Could not update coordinator data for %s %s",
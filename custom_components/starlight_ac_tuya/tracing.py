@@ -0,0 +1,260 @@
+"""Lightweight trace spans for following a command from entity to cloud.
+
+An entity action starts a trace (Tracer.trace); code it calls opens child
+spans with span(). The current span is carried in a context variable, so it
+follows awaits and tasks started from them. Outside a trace, span() returns
+a shared no-op span, so polling pays next to nothing.
+
+Finished traces are kept in a fixed-size ring buffer per API client and can
+optionally be handed to an exporter such as OpenTelemetryExporter.
+"""
+
+import contextvars
+import functools
+import itertools
+import logging
+import os
+import time
+from collections import deque
+
+from .loopmonitor import track
+
+_LOGGER = logging.getLogger(__name__)
+
+# Finished traces kept per API client
+TRACE_BUFFER_SIZE = 50
+# Spans recorded per trace; further ones are only counted
+MAX_SPANS_PER_TRACE = 64
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar(
+    "starlight_ac_tuya_span", default=None
+)
+
+
+class Span:
+    """A timed operation within a trace; use as a context manager."""
+
+    __slots__ = (
+        "_token",
+        "attributes",
+        "end",
+        "error",
+        "name",
+        "parent_id",
+        "span_id",
+        "start",
+        "start_wall",
+        "trace",
+    )
+
+    def __init__(self, name, trace, span_id, parent_id, attributes):
+        self.name = name
+        self.trace = trace
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start = time.monotonic()
+        self.start_wall = time.time()
+        self.end: float | None = None
+        self.error: str | None = None
+        self._token = None
+
+    def set(self, **attributes):
+        """Add attributes to the span."""
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end = time.monotonic()
+        if exc_type is not None:
+            self.error = (
+                f"{exc_type.__name__}: {exc}" if str(exc) else exc_type.__name__
+            )
+        _current_span.reset(self._token)
+        if self.parent_id is None:
+            self.trace.finish()
+        return False
+
+    @property
+    def duration(self) -> float | None:
+        return None if self.end is None else self.end - self.start
+
+    def as_dict(self) -> dict:
+        duration = self.duration
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "offset_ms": round((self.start - self.trace.root.start) * 1000, 1),
+            "duration_ms": None if duration is None else round(duration * 1000, 1),
+            "attributes": dict(self.attributes),
+            "error": self.error,
+        }
+
+
+class _NullSpan:
+    """Stand-in returned by span() when no trace is active."""
+
+    __slots__ = ()
+
+    def set(self, **attributes):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Trace:
+    """Spans sharing one correlation ID, rooted at an entity action."""
+
+    def __init__(self, tracer: "Tracer", name: str, attributes: dict):
+        self.tracer = tracer
+        self.trace_id = os.urandom(8).hex()
+        self._ids = itertools.count(1)
+        self.dropped = 0
+        self.root = Span(name, self, next(self._ids), None, attributes)
+        self.spans = [self.root]
+
+    def child(self, name: str, parent: Span, attributes: dict):
+        if len(self.spans) >= MAX_SPANS_PER_TRACE:
+            self.dropped += 1
+            return NULL_SPAN
+        span = Span(name, self, next(self._ids), parent.span_id, attributes)
+        self.spans.append(span)
+        return span
+
+    def finish(self):
+        self.tracer._finish(self)
+
+    def as_dict(self) -> dict:
+        duration = self.root.duration
+        return {
+            "trace_id": self.trace_id,
+            "name": self.root.name,
+            "start": time.strftime(
+                "%Y-%m-%dT%H:%M:%S", time.localtime(self.root.start_wall)
+            ),
+            "duration_ms": None if duration is None else round(duration * 1000, 1),
+            "attributes": dict(self.root.attributes),
+            "spans": [span.as_dict() for span in self.spans[1:]],
+            "dropped_spans": self.dropped,
+        }
+
+
+class Tracer:
+    """Starts traces and keeps the most recent finished ones."""
+
+    def __init__(self, size: int = TRACE_BUFFER_SIZE):
+        self._traces: deque = deque(maxlen=size)
+        # Optional callable receiving each finished Trace
+        self.exporter = None
+
+    def trace(self, name: str, **attributes):
+        """Start a new trace, or a child span if one is already active."""
+        if _current_span.get() is not None:
+            return span(name, **attributes)
+        return Trace(self, name, attributes).root
+
+    def _finish(self, trace: Trace):
+        self._traces.append(trace)
+        if self.exporter is not None:
+            try:
+                self.exporter(trace)
+            except Exception:
+                _LOGGER.debug("Trace export failed", exc_info=True)
+
+    def dump(self, limit: int | None = None, device_id: str | None = None) -> list:
+        """Return finished traces, newest first."""
+        traces = [
+            trace.as_dict()
+            for trace in reversed(self._traces)
+            if device_id is None or trace.root.attributes.get("device_id") == device_id
+        ]
+        return traces[:limit] if limit else traces
+
+
+def span(name: str, **attributes):
+    """Open a child span of the current span; a no-op outside a trace."""
+    parent = _current_span.get()
+    if parent is None:
+        return NULL_SPAN
+    return parent.trace.child(name, parent, attributes)
+
+
+def current_trace_id() -> str | None:
+    """Return the correlation ID of the active trace, if any."""
+    current = _current_span.get()
+    return None if current is None else current.trace.trace_id
+
+
+def traced(name: str):
+    """Run an entity method as the root of a trace.
+
+    The entity needs `api` (a TuyaAPI) and `device_id` attributes. A
+    running loop monitor times it as operation `name`.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            with self.api.tracer.trace(
+                name, entity_id=self.entity_id, device_id=self.device_id
+            ):
+                return await track(func(self, *args, **kwargs), self.device_id, name)
+
+        return wrapper
+
+    return decorator
+
+
+class OpenTelemetryExporter:
+    """Replay finished traces as OpenTelemetry spans.
+
+    Spans go to the globally configured tracer provider; without one the
+    OpenTelemetry API drops them. Raises ImportError if the opentelemetry
+    package is not installed.
+    """
+
+    def __init__(self):
+        from opentelemetry import trace as otel_trace
+
+        self._otel = otel_trace
+        self._tracer = otel_trace.get_tracer("starlight_ac_tuya")
+
+    def __call__(self, trace: Trace):
+        otel_spans = {}
+        for item in trace.spans:
+            parent = otel_spans.get(item.parent_id)
+            attributes = {
+                key: value if isinstance(value, (str, bool, int, float)) else str(value)
+                for key, value in item.attributes.items()
+                if value is not None
+            }
+            attributes["correlation_id"] = trace.trace_id
+            otel_spans[item.span_id] = self._tracer.start_span(
+                item.name,
+                context=self._otel.set_span_in_context(parent) if parent else None,
+                attributes=attributes,
+                start_time=int(item.start_wall * 1e9),
+            )
+        for item in trace.spans:
+            otel_span = otel_spans[item.span_id]
+            if item.error:
+                otel_span.set_status(
+                    self._otel.Status(self._otel.StatusCode.ERROR, item.error)
+                )
+            # Spans still open (e.g. a shared request outliving its caller)
+            # end with the trace
+            duration = item.duration
+            if duration is None:
+                duration = trace.root.duration or 0.0
+            otel_span.end(end_time=int((item.start_wall + duration) * 1e9))
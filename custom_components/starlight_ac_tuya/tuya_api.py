@@ -4,7 +4,21 @@ import hashlib
 import json
 import logging
 import asyncio
+import re
+from collections import deque
+from functools import lru_cache
+
 import aiohttp
+import yarl
+
+from .loopmonitor import track
+from .metrics import ApiMetrics
+from .tracing import Tracer, current_trace_id, span
+
+try:
+    import orjson
+except ImportError:  # orjson ships with Home Assistant, but stay usable without it
+    orjson = None
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -16,11 +30,319 @@ REGION_URLS = {
     "in": "https://openapi.tuyain.com",
 }
 
+# Endpoint failover happens only between URLs passed to
+# configure(fallback_urls). Tuya's data centers (e.g. openapi-weaz vs
+# openapi.tuyaeu) don't share devices or tokens, so none are assumed
+# equivalent. Consecutive failed calls before an endpoint is taken out of
+# rotation, and how long it stays out even if probes succeed (seconds):
+FAILOVER_THRESHOLD = 2
+FAILOVER_HOLD = 300
+# Background endpoint probes: interval and per-probe timeout (seconds). A
+# probe is an unsigned token request, answered with an error by a healthy
+# front-end without touching the account.
+PROBE_INTERVAL = 300
+PROBE_TIMEOUT = 5
+PROBE_PATH = "/v1.0/token?grant_type=1"
+# A healthy endpoint must be this much faster (fraction of the active one's
+# probe latency, and at least SWITCH_MIN_GAIN seconds) to move traffic to it
+SWITCH_MARGIN = 0.3
+SWITCH_MIN_GAIN = 0.05
+
 # Retry configuration
 MAX_RETRIES = 3
 RETRY_DELAY_BASE = 1  # seconds
 RETRY_BACKOFF_MULTIPLIER = 2
 
+# Device discovery paging; 20 is the largest page the listing endpoint serves
+DISCOVERY_PAGE_SIZE_MAX = 20
+
+# Maximum number of device IDs per bulk device-info request
+DEVICE_INFO_BATCH_SIZE = 20
+# Errors the device-info lookup answers with when an ID isn't in the
+# project: "permission deny", and "param is illegal" for a malformed ID
+DEVICE_UNKNOWN_CODES = frozenset({1106, 1109})
+# Errors meaning the project can't use an API at all: "permission deny",
+# "uri path invalid" and "API not subscribed"
+API_UNAVAILABLE_CODES = frozenset({1106, 1108, 28841101})
+
+# Maximum number of concurrent HTTP requests per API client
+MAX_CONCURRENT_REQUESTS = 4
+
+# How long async_close waits for cancelled requests to wind down (seconds)
+SHUTDOWN_TIMEOUT = 1.0
+
+# Adaptive per-attempt timeout bounds (seconds)
+TIMEOUT_INITIAL = 5
+TIMEOUT_MIN = 3
+TIMEOUT_MAX = 20
+TIMEOUT_BACKOFF_MAX = 4
+
+# Overall budget for one API call per endpoint class, covering every retry
+# attempt and backoff sleep (seconds).
+CALL_DEADLINES = {
+    "token": 20,
+    "command": 10,
+    "status": 30,
+    "discovery": 60,
+}
+
+
+def _endpoint_class(method: str, url_path: str) -> str:
+    """Map a request to the endpoint class used for latency tracking."""
+    if url_path.startswith("/v1.0/token"):
+        return "token"
+    if method != "GET":
+        return "command"
+    if url_path.startswith(("/v2.0/cloud/thing/device", "/v2.0/cloud/thing/batch")):
+        return "discovery"
+    return "status"
+
+
+# SHA-256 of an empty request body
+EMPTY_BODY_SHA256 = "e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855"
+
+
+@lru_cache(maxsize=64)
+def _body_sha256(body: str) -> str:
+    """Return the SHA-256 hex digest of a request body.
+
+    Command bodies repeat a lot (the same few switch/mode payloads), so the
+    digests are cached.
+    """
+    if not body:
+        return EMPTY_BODY_SHA256
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def _json_loads(raw: bytes):
+    """Decode a JSON response body, straight from bytes with orjson.
+
+    Without orjson this is the same decode-then-parse as before; passing
+    bytes to json.loads is slower, as it sniffs the encoding first.
+    """
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw.decode("utf-8"))
+
+
+def _path_with_params(url_path: str, params: dict | None) -> str:
+    """Append sorted query parameters to a path, as used for signing."""
+    if not params:
+        return url_path
+    query_string = "&".join(f"{key}={value}" for key, value in sorted(params.items()))
+    return url_path + "?" + query_string if query_string else url_path
+
+
+class TuyaAPIClosedError(Exception):
+    """Raised for API calls that were aborted or made after async_close."""
+
+
+class TuyaAPIError(Exception):
+    """Raised when the Tuya cloud rejects a request that can't be retried."""
+
+
+_DEVICE_PATH_RE = re.compile(r"/(?:devices|thing)/([^/?]+)/")
+
+
+def _device_key(url_path: str) -> str:
+    """Return the device a request is for, or "" for account-wide requests."""
+    match = _DEVICE_PATH_RE.search(url_path)
+    return match.group(1) if match else ""
+
+
+def device_online(info: dict) -> bool | None:
+    """Return the online flag of a device listing/info record, if present."""
+    online = info.get("isOnline", info.get("online"))
+    return None if online is None else bool(online)
+
+
+class _LatencyEstimator:
+    """Rolling round-trip estimate for one endpoint class.
+
+    Uses the smoothed RTT / RTT variance scheme from RFC 6298 so the derived
+    timeout follows the observed latency, and doubles it after each timeout
+    until a response arrives again.
+    """
+
+    def __init__(self):
+        self.srtt: float | None = None
+        self.rttvar: float = 0.0
+        self._backoff: float = 1.0
+
+    def observe(self, seconds: float):
+        if self.srtt is None:
+            self.srtt = seconds
+            self.rttvar = seconds / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - seconds)
+            self.srtt = 0.875 * self.srtt + 0.125 * seconds
+        self._backoff = 1.0
+
+    def on_timeout(self):
+        self._backoff = min(self._backoff * 2, TIMEOUT_BACKOFF_MAX)
+
+    @property
+    def timeout(self) -> float:
+        if self.srtt is None:
+            base = TIMEOUT_INITIAL
+        else:
+            base = self.srtt + 4 * self.rttvar
+        return min(max(base * self._backoff, TIMEOUT_MIN), TIMEOUT_MAX)
+
+
+class _FairGate:
+    """Concurrency limit that hands out free slots round-robin per key.
+
+    Waiters queue per key (the device a request is for) and keys are served
+    in turn, so one chatty device cannot hold every slot while requests for
+    other devices wait.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self.queued = 0
+        self.wait_avg = 0.0
+        self.wait_max = 0.0
+        self._queues: dict[str, deque] = {}
+        self._turns: deque = deque()
+
+    async def acquire(self, key: str) -> float:
+        """Wait for a free slot; returns the time spent queueing."""
+        if self.in_flight < self.limit and not self.queued:
+            self.in_flight += 1
+            return 0.0
+
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = deque()
+            self._turns.append(key)
+        queue.append(waiter)
+        self.queued += 1
+        started = loop.time()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was granted as we got cancelled; pass it on
+                self.release()
+            else:
+                self._discard(key, waiter)
+            raise
+
+        waited = loop.time() - started
+        self.wait_avg = 0.9 * self.wait_avg + 0.1 * waited
+        self.wait_max = max(self.wait_max, waited)
+        return waited
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake()
+
+    def close(self):
+        """Fail every queued waiter; used when the client shuts down."""
+        for queue in self._queues.values():
+            for waiter in queue:
+                if not waiter.done():
+                    waiter.set_exception(TuyaAPIClosedError("Tuya API client closed"))
+        self._queues.clear()
+        self._turns.clear()
+        self.queued = 0
+
+    def set_limit(self, limit: int):
+        self.limit = max(1, int(limit))
+        self._wake()
+
+    def _discard(self, key: str, waiter: asyncio.Future):
+        queue = self._queues.get(key)
+        if queue is None or waiter not in queue:
+            return
+        queue.remove(waiter)
+        self.queued -= 1
+        if not queue:
+            del self._queues[key]
+            self._turns.remove(key)
+
+    def _wake(self):
+        while self.in_flight < self.limit and self._turns:
+            key = self._turns.popleft()
+            queue = self._queues[key]
+            waiter = queue.popleft()
+            self.queued -= 1
+            if queue:
+                self._turns.append(key)
+            else:
+                del self._queues[key]
+            self.in_flight += 1
+            waiter.set_result(None)
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "queued_devices": len(self._queues),
+            "wait_avg": round(self.wait_avg, 3),
+            "wait_max": round(self.wait_max, 3),
+        }
+
+
+class _EndpointHealth:
+    """Probe latency and failure streak of one API front-end."""
+
+    def __init__(self, url: str, verified: bool = False):
+        self.url = url
+        # Until an endpoint has answered a request successfully, API-level
+        # rejections count as failures too: it may not serve this account
+        self.verified = verified
+        self.rejected = False
+        self.latency: float | None = None
+        self.failures = 0
+        self.held_until = 0.0
+        self.last_error: str | None = None
+        self.last_probe: float | None = None
+
+    def healthy(self, now: float) -> bool:
+        return self.failures < FAILOVER_THRESHOLD and now >= self.held_until
+
+    def observe_probe(self, seconds: float):
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            self.latency = 0.7 * self.latency + 0.3 * seconds
+
+    def as_dict(self, now: float) -> dict:
+        return {
+            "url": self.url,
+            "healthy": self.healthy(now),
+            "verified": self.verified,
+            "rejected": self.rejected,
+            "latency": None if self.latency is None else round(self.latency, 3),
+            "failures": self.failures,
+            "held_for": round(max(self.held_until - now, 0.0), 1),
+            "last_error": self.last_error,
+        }
+
+
+class _ReplayedResponse:
+    """The parts of an aiohttp response used here, for cassette replay."""
+
+    def __init__(self, method: str, url: str, status: int):
+        self.method = method
+        self.url = url
+        self.status = status
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise aiohttp.ClientResponseError(
+                aiohttp.RequestInfo(yarl.URL(self.url), self.method, {}),
+                (),
+                status=self.status,
+                message="replayed from cassette",
+            )
+
 
 class TuyaAPI:
     def __init__(
@@ -34,16 +356,53 @@ class TuyaAPI:
         self.client_secret = client_secret
         self.region = region or "eu"
         self.base_url = base_url or REGION_URLS.get(self.region, REGION_URLS["eu"])
+        # The configured URL first, then any fallbacks from configure()
+        self._primary_url = self.base_url
+        self._endpoints = {self.base_url: _EndpointHealth(self.base_url, True)}
+        self.endpoint_switches = 0
+        # Called with the new base URL whenever traffic moves to another
+        # endpoint, so the choice can be persisted
+        self.on_endpoint_change = None
+        self._probe_task: asyncio.Task | None = None
+        self._probe_wakeup = asyncio.Event()
         self._session: aiohttp.ClientSession | None = None
         self.token: str | None = None
         self.token_expiry: float = 0
+        # Keyed HMAC state, copied for each request instead of re-keying
+        self._hmac = hmac.new(client_secret.encode(), digestmod=hashlib.sha256)
+        self._latency = {name: _LatencyEstimator() for name in CALL_DEADLINES}
+        self.metrics = ApiMetrics(CALL_DEADLINES)
+        self.tracer = Tracer()
+        # Per-client copy so options can change budgets on a live client
+        self.call_deadlines = dict(CALL_DEADLINES)
+        # Shared in-flight GET requests keyed by signed path and token usage
+        self._inflight: dict[tuple[str, bool], asyncio.Future] = {}
+        self._gate = _FairGate(MAX_CONCURRENT_REQUESTS)
+        # Every request attempt, retry sleep and background task this client
+        # starts, so async_close can cancel them
+        self._tasks: set[asyncio.Task] = set()
+        self._closed = False
+        # Optional cassette.Recorder capturing each HTTP exchange, and
+        # cassette.Player answering requests instead of the cloud
+        self.recorder = None
+        self.player = None
 
     def _clear_token(self):
         """Clear cached access token to force refresh on next request."""
         self.token = None
         self.token_expiry = 0
+        self.metrics.token_invalidations += 1
         _LOGGER.debug("Cleared cached access token")
 
+    def _token_rejected(self, used: str):
+        """Drop the token a request was signed with after a 1010 reply.
+
+        A late reply to a request signed with an older token leaves the
+        token another task has refreshed in the meantime alone.
+        """
+        if self.token == used:
+            self._clear_token()
+
     def _is_token_invalid_error(self, response_data: dict) -> bool:
         """Check if API response indicates token is invalid (error 1010).
 
@@ -60,33 +419,382 @@ class TuyaAPI:
             return error_code == 1010 or "token" in error_msg
         return False
 
-    async def async_close(self):
+    async def async_close(self, timeout: float = SHUTDOWN_TIMEOUT):
+        """Cancel all in-flight work and close the HTTP session.
+
+        Pending calls fail with TuyaAPIClosedError. Waits at most `timeout`
+        seconds for the cancelled tasks to finish.
+        """
+        self._closed = True
+        self._gate.close()
+        tasks = [task for task in self._tasks if not task.done()]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=timeout)
+            if pending:
+                _LOGGER.warning(
+                    "%d Tuya API tasks still running after %.1fs shutdown",
+                    len(pending),
+                    timeout,
+                )
         if self._session:
             await self._session.close()
             self._session = None
 
-    def _sign(self, string_to_sign: str) -> str:
-        return (
-            hmac.new(
-                self.client_secret.encode(), string_to_sign.encode(), hashlib.sha256
+    def _create_task(self, coro, device_id: str = "") -> asyncio.Task:
+        """Start a task owned by this client; async_close cancels it.
+
+        device_id is the device the work is for, for the loop monitor.
+        """
+        if self._closed:
+            coro.close()
+            raise TuyaAPIClosedError("Tuya API client closed")
+        task = asyncio.ensure_future(track(coro, device_id, coro.__qualname__))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _await_owned(self, task: asyncio.Future):
+        """Await an owned task, reporting a shutdown as TuyaAPIClosedError.
+
+        A cancellation of the caller itself is re-raised unchanged.
+        """
+        try:
+            return await task
+        except asyncio.CancelledError:
+            current = asyncio.current_task()
+            if self._closed and not (current and current.cancelling()):
+                raise TuyaAPIClosedError("Tuya API client closed") from None
+            raise
+
+    @property
+    def endpoints(self) -> list[str]:
+        return list(self._endpoints)
+
+    def set_endpoint(self, url: str | None) -> bool:
+        """Send traffic to one of the configured endpoints, e.g. a saved one.
+
+        Returns False (and changes nothing) for an unknown URL.
+        """
+        if url not in self._endpoints:
+            return False
+        self.base_url = url
+        return True
+
+    def get_endpoint_stats(self) -> dict:
+        """Return the active endpoint and each endpoint's probe health."""
+        now = time.monotonic()
+        return {
+            "active": self.base_url,
+            "switches": self.endpoint_switches,
+            "endpoints": [health.as_dict(now) for health in self._endpoints.values()],
+        }
+
+    def _best_endpoint(self, exclude: str | None = None) -> _EndpointHealth | None:
+        """Return the fastest healthy endpoint.
+
+        Endpoints that rejected this account's requests rank last, then
+        unprobed ones.
+        """
+        now = time.monotonic()
+        candidates = [
+            health
+            for health in self._endpoints.values()
+            if health.url != exclude and health.healthy(now)
+        ]
+        if not candidates:
+            return None
+        return min(
+            candidates,
+            key=lambda health: (
+                health.rejected,
+                health.latency is None,
+                health.latency or 0.0,
+            ),
+        )
+
+    def _switch_endpoint(self, health: _EndpointHealth, reason: str):
+        _LOGGER.warning(
+            "Switching Tuya API endpoint from %s to %s (%s)",
+            self.base_url,
+            health.url,
+            reason,
+        )
+        self.base_url = health.url
+        self.endpoint_switches += 1
+        # Tokens are only valid where they were issued; fetch a new one
+        # from the new endpoint rather than find out through 1010s
+        self.token = None
+        self.token_expiry = 0
+        if self.on_endpoint_change is not None:
+            self.on_endpoint_change(health.url)
+
+    def _endpoint_failed(self, base_url: str, exc):
+        """Count a failed call against an endpoint; fail over when it's out."""
+        health = self._endpoints.get(base_url)
+        if health is None:
+            return
+        health.failures += 1
+        health.last_error = str(exc) or type(exc).__name__
+        if health.failures < FAILOVER_THRESHOLD:
+            return
+        if health.failures == FAILOVER_THRESHOLD:
+            health.held_until = time.monotonic() + FAILOVER_HOLD
+        if base_url != self.base_url:
+            return
+        best = self._best_endpoint(exclude=base_url)
+        if best is not None:
+            self._switch_endpoint(best, f"{health.failures} failed calls")
+            # Re-probe now rather than at the next interval
+            self._probe_wakeup.set()
+
+    def _endpoint_answered(self, base_url: str, data, include_token: bool):
+        """Account for an HTTP answer below 500 from an endpoint.
+
+        An endpoint is verified by its first successful token-bearing
+        request; a token alone doesn't show it serves the account's devices.
+        """
+        health = self._endpoints.get(base_url)
+        if health is None:
+            return
+        success = isinstance(data, dict) and data.get("success")
+        if success and include_token:
+            health.verified = True
+            health.rejected = False
+        if health.verified:
+            health.failures = 0
+        elif not success:
+            code = data.get("code", "unknown") if isinstance(data, dict) else None
+            health.rejected = True
+            self._endpoint_failed(base_url, f"rejected by unverified endpoint: {code}")
+
+    async def _async_probe_loop(self):
+        """Probe every endpoint periodically and move to the fastest one."""
+        while True:
+            await asyncio.gather(
+                *(self._async_probe(health) for health in self._endpoints.values())
+            )
+            self._rebalance()
+            self._probe_wakeup.clear()
+            try:
+                await asyncio.wait_for(self._probe_wakeup.wait(), PROBE_INTERVAL)
+            except TimeoutError:
+                pass
+
+    async def _async_probe(self, health: _EndpointHealth):
+        session = self._session
+        if session is None:
+            return
+        started = time.monotonic()
+        try:
+            async with session.get(
+                health.url + PROBE_PATH,
+                timeout=aiohttp.ClientTimeout(total=PROBE_TIMEOUT),
+            ) as resp:
+                await resp.read()
+                if resp.status >= 500:
+                    raise aiohttp.ClientResponseError(
+                        resp.request_info, (), status=resp.status
+                    )
+        except (aiohttp.ClientError, OSError, TimeoutError) as err:
+            health.failures = max(health.failures + 1, FAILOVER_THRESHOLD)
+            health.last_error = str(err) or type(err).__name__
+            _LOGGER.debug("Tuya API endpoint probe of %s failed: %s", health.url, err)
+        else:
+            health.observe_probe(time.monotonic() - started)
+            health.failures = 0
+        health.last_probe = time.monotonic()
+
+    def _rebalance(self):
+        """Move traffic off an unhealthy endpoint or to a clearly faster one."""
+        current = self._endpoints[self.base_url]
+        best = self._best_endpoint(exclude=self.base_url)
+        if best is None:
+            return
+        if not current.healthy(time.monotonic()):
+            self._switch_endpoint(best, "active endpoint unhealthy")
+        elif (
+            not best.rejected
+            and current.latency is not None
+            and best.latency is not None
+            and best.latency < current.latency * (1 - SWITCH_MARGIN)
+            and current.latency - best.latency >= SWITCH_MIN_GAIN
+        ):
+            self._switch_endpoint(
+                best,
+                f"probe latency {best.latency * 1000:.0f} ms vs "
+                f"{current.latency * 1000:.0f} ms",
             )
-            .hexdigest()
-            .upper()
+
+    async def _async_http(self, session, method, url, headers, body, timeout):
+        # The active endpoint may change while a request is in flight
+        path = url[url.index("/", url.index("//") + 2) :]
+        if self.player is not None:
+            item, status, raw = self.player.lookup(method, path)
+            await asyncio.sleep(self.player.delay(item))
+            return _ReplayedResponse(method, url, status), raw
+        started = time.monotonic()
+        resp = await session.request(
+            method,
+            url,
+            headers=headers,
+            data=body,
+            timeout=aiohttp.ClientTimeout(total=timeout),
         )
+        raw = await resp.read()
+        if self.recorder is not None:
+            self.recorder.record(
+                method, path, body, resp.status, raw, time.monotonic() - started
+            )
+        return resp, raw
+
+    def _sign(self, string_to_sign: str) -> str:
+        mac = self._hmac.copy()
+        mac.update(string_to_sign.encode())
+        return mac.hexdigest().upper()
 
     def _sha256(self, data: str) -> str:
-        return hashlib.sha256(data.encode()).hexdigest()
+        return _body_sha256(data)
 
     def _get_timestamp(self) -> str:
         return str(int(time.time() * 1000))
 
+    def _deadline(self, endpoint: str) -> float:
+        """Return the absolute loop time by which a call must have finished."""
+        return asyncio.get_running_loop().time() + self.call_deadlines[endpoint]
+
+    def configure(
+        self,
+        max_concurrent_requests: int | None = None,
+        call_deadlines: dict | None = None,
+        fallback_urls: list | None = None,
+    ):
+        """Apply rate-limit and timeout settings to the live client.
+
+        Takes effect for the next request; the session, token, learned
+        latencies and queued requests are kept.
+
+        Args:
+            max_concurrent_requests: Request slots shared by all devices.
+            call_deadlines: Overall budget (seconds) per endpoint class.
+            fallback_urls: API base URLs serving the same data center to
+                fail over to; an empty list disables failover.
+        """
+        if max_concurrent_requests is not None:
+            self._gate.set_limit(max_concurrent_requests)
+        for endpoint, seconds in (call_deadlines or {}).items():
+            if endpoint not in self.call_deadlines:
+                raise ValueError(f"Unknown endpoint class {endpoint!r}")
+            self.call_deadlines[endpoint] = max(float(seconds), TIMEOUT_MIN)
+        if fallback_urls is not None:
+            self._set_fallback_urls(fallback_urls)
+
+    def _set_fallback_urls(self, urls: list):
+        """Replace the fallback endpoints, keeping known endpoints' health."""
+        wanted = [self._primary_url]
+        for url in urls:
+            url = url.strip().rstrip("/")
+            if url and url not in wanted:
+                wanted.append(url)
+        self._endpoints = {
+            url: self._endpoints.get(url) or _EndpointHealth(url) for url in wanted
+        }
+        if self.base_url not in self._endpoints:
+            self._switch_endpoint(
+                self._endpoints[self._primary_url], "endpoint no longer configured"
+            )
+        if len(self._endpoints) < 2 and self._probe_task is not None:
+            self._probe_task.cancel()
+            self._probe_task = None
+
+    def get_concurrency_stats(self) -> dict:
+        """Return live in-flight/queue counts and queue wait times (seconds)."""
+        return self._gate.stats()
+
+    def get_metrics(self) -> dict:
+        """Return request counts, latency percentiles and errors per endpoint."""
+        return self.metrics.as_dict()
+
+    def get_timeouts(self) -> dict:
+        """Return the current per-attempt timeout for each endpoint class."""
+        return {name: est.timeout for name, est in self._latency.items()}
+
     async def _ensure_session(self):
         if self._session is None:
-            # Increase timeout for slow/unstable connections
-            timeout = aiohttp.ClientTimeout(total=30, connect=10, sock_read=20)
+            # Per-attempt timeouts are derived from observed latency in
+            # _async_request; this is only an upper bound.
+            timeout = aiohttp.ClientTimeout(total=TIMEOUT_MAX, connect=10)
             self._session = aiohttp.ClientSession(timeout=timeout)
+        if (
+            self._probe_task is None
+            and len(self._endpoints) > 1
+            and self.player is None
+        ):
+            self._probe_task = self._create_task(self._async_probe_loop())
 
     async def _async_request(
+        self,
+        method: str,
+        url_path: str,
+        body: str = "",
+        include_token: bool = True,
+        params: dict | None = None,
+        deadline: float | None = None,
+        max_retries: int = MAX_RETRIES,
+    ):
+        """Send a request, sharing one response between identical in-flight GETs.
+
+        Only idempotent GET requests are deduplicated; concurrent callers asking
+        for the same signed path await the same underlying request. Callers
+        must treat the returned data as read-only since it may be shared.
+        """
+        if self._closed:
+            raise TuyaAPIClosedError("Tuya API client closed")
+        if method != "GET":
+            return await self._async_send_request(
+                method,
+                url_path,
+                body,
+                include_token,
+                params,
+                deadline=deadline,
+                max_retries=max_retries,
+            )
+
+        key = (_path_with_params(url_path, params), include_token)
+        shared = self._inflight.get(key)
+        if shared is None:
+            shared = self._create_task(
+                self._async_send_request(
+                    method,
+                    url_path,
+                    body,
+                    include_token,
+                    params,
+                    deadline=deadline,
+                    max_retries=max_retries,
+                ),
+                _device_key(url_path),
+            )
+            self._inflight[key] = shared
+
+            def _done(fut: asyncio.Future):
+                if self._inflight.get(key) is fut:
+                    del self._inflight[key]
+                # Mark the exception as retrieved in case every waiter is gone
+                if not fut.cancelled():
+                    fut.exception()
+
+            shared.add_done_callback(_done)
+        else:
+            _LOGGER.debug("Joining in-flight Tuya API request %s %s", method, key[0])
+            self.metrics.record_shared(_endpoint_class(method, url_path))
+            with span("join_inflight", path=key[0]):
+                return await self._await_owned(asyncio.shield(shared))
+        return await self._await_owned(asyncio.shield(shared))
+
+    async def _async_send_request(
         self,
         method: str,
         url_path: str,
@@ -94,37 +802,56 @@ class TuyaAPI:
         include_token: bool = True,
         params: dict | None = None,
         retry_count: int = 0,
+        deadline: float | None = None,
+        max_retries: int = MAX_RETRIES,
     ):
+        if self._closed:
+            raise TuyaAPIClosedError("Tuya API client closed")
+        loop = asyncio.get_running_loop()
+        endpoint = _endpoint_class(method, url_path)
+        if deadline is None:
+            deadline = loop.time() + self.call_deadlines[endpoint]
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            raise TimeoutError(f"Deadline exceeded for Tuya API {method} {url_path}")
+        estimator = self._latency[endpoint]
+
         await self._ensure_session()
-        t = self._get_timestamp()
 
-        url_path_with_params = url_path
-        if params:
-            query_parts = []
-            for key, value in sorted(params.items()):
-                query_parts.append(f"{key}={value}")
-            query_string = "&".join(query_parts)
-            url_path_with_params = (
-                url_path + "?" + query_string if query_string else url_path
+        # Wait for a request slot; the wait counts against the call deadline
+        key = _device_key(url_path)
+        try:
+            with span("queue"):
+                waited = await asyncio.wait_for(self._gate.acquire(key), remaining)
+        except TimeoutError:
+            raise TimeoutError(
+                f"Deadline exceeded waiting to call Tuya API {method} {url_path}"
+            ) from None
+        if waited > 1:
+            _LOGGER.debug(
+                "Tuya API %s %s queued %.1fs (%s)",
+                method,
+                url_path,
+                waited,
+                self._gate.stats(),
             )
+        attempt_timeout = max(min(estimator.timeout, deadline - loop.time()), 0.1)
+
+        t = self._get_timestamp()
+
+        url_path_with_params = _path_with_params(url_path, params)
 
         if url_path.startswith("/v2.0/"):
-            content_hash = (
-                "e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855"
-            )
-            string_to_sign = (
-                method + "\n" + content_hash + "\n\n" + url_path_with_params
-            )
+            string_to_sign = f"{method}\n{EMPTY_BODY_SHA256}\n\n{url_path_with_params}"
         else:
-            content_hash = self._sha256(body)
-            string_to_sign = method + "\n" + content_hash + "\n\n" + url_path
+            string_to_sign = f"{method}\n{self._sha256(body)}\n\n{url_path}"
 
-        if include_token and self.token:
-            sign_msg = self.client_id + self.token + t + string_to_sign
+        # Token the request is signed with, for _token_rejected
+        token = self.token if include_token else None
+        if token:
+            signature = self._sign(f"{self.client_id}{token}{t}{string_to_sign}")
         else:
-            sign_msg = self.client_id + t + string_to_sign
-
-        signature = self._sign(sign_msg)
+            signature = self._sign(f"{self.client_id}{t}{string_to_sign}")
 
         headers = {
             "client_id": self.client_id,
@@ -132,23 +859,56 @@ class TuyaAPI:
             "t": t,
             "sign": signature,
         }
-        if include_token and self.token:
-            headers["access_token"] = self.token
+        if token:
+            headers["access_token"] = token
         if body:
             headers["Content-Type"] = "application/json"
 
-        url = self.base_url + url_path_with_params
+        base_url = self.base_url
+        url = base_url + url_path_with_params
         session = self._session
         assert session is not None
 
+        started = loop.time()
         try:
-            resp = await session.request(method, url, headers=headers, data=body)
-            text = await resp.text()
-        except (aiohttp.ClientError, OSError, asyncio.TimeoutError) as exc:
-            if retry_count < MAX_RETRIES:
-                retry_delay = RETRY_DELAY_BASE * (RETRY_BACKOFF_MULTIPLIER**retry_count)
+            with span(
+                "http", method=method, path=url_path, attempt=retry_count + 1
+            ) as http_span:
+                try:
+                    resp, raw = await self._await_owned(
+                        self._create_task(
+                            self._async_http(
+                                session, method, url, headers, body, attempt_timeout
+                            ),
+                            key,
+                        )
+                    )
+                finally:
+                    self._gate.release()
+                elapsed = loop.time() - started
+                self.metrics.record_response(
+                    endpoint, elapsed, len(body), len(raw), resp.status
+                )
+                http_span.set(status=resp.status, bytes=len(raw))
+                data = _json_loads(raw) if resp.status < 400 else None
+        except (aiohttp.ClientError, OSError, TimeoutError, ValueError) as exc:
+            # ValueError covers truncated or garbled JSON bodies, which are
+            # retried like transport errors instead of being read as {}.
+            timed_out = isinstance(exc, TimeoutError)
+            if timed_out:
+                estimator.on_timeout()
+            # Retries go to the new endpoint if this one is now out
+            self._endpoint_failed(base_url, exc)
+            self.metrics.record_failure(endpoint, timeout=timed_out)
+            retry_delay = RETRY_DELAY_BASE * (RETRY_BACKOFF_MULTIPLIER**retry_count)
+            # Only retry if the sleep still leaves room for another attempt
+            # within the call deadline.
+            if (
+                retry_count < max_retries
+                and loop.time() + retry_delay + TIMEOUT_MIN <= deadline
+            ):
                 msg = (
-                    "Network error when calling Tuya API %s %s (attempt %d/%d): %s. "
+                    "Error when calling Tuya API %s %s (attempt %d/%d): %s. "
                     "Retrying in %ds..."
                 )
                 _LOGGER.warning(
@@ -156,40 +916,80 @@ class TuyaAPI:
                     method,
                     url_path,
                     retry_count + 1,
-                    MAX_RETRIES + 1,
+                    max_retries + 1,
                     exc,
                     retry_delay,
                 )
-                await asyncio.sleep(retry_delay)
-                return await self._async_request(
-                    method, url_path, body, include_token, params, retry_count + 1
+                self.metrics.record_retry(endpoint)
+                with span("retry_sleep", seconds=retry_delay):
+                    await self._await_owned(
+                        self._create_task(asyncio.sleep(retry_delay), key)
+                    )
+                return await self._async_send_request(
+                    method,
+                    url_path,
+                    body,
+                    include_token,
+                    params,
+                    retry_count + 1,
+                    deadline,
+                    max_retries,
                 )
             else:
                 _LOGGER.error(
-                    "Network error when calling Tuya API %s %s after %d retries: %s",
+                    "Error when calling Tuya API %s %s after %d attempts: %s",
                     method,
                     url_path,
-                    MAX_RETRIES + 1,
+                    retry_count + 1,
                     exc,
                 )
+                if isinstance(exc, TimeoutError):
+                    raise TimeoutError(
+                        f"Tuya API {method} {url_path} timed out after "
+                        f"{retry_count + 1} attempts"
+                    ) from exc
                 raise
 
+        estimator.observe(elapsed)
+        if resp.status >= 500:
+            self._endpoint_failed(base_url, f"HTTP {resp.status}")
+        else:
+            self._endpoint_answered(base_url, data, include_token)
+
         if resp.status >= 400:
-            _LOGGER.debug("Tuya API error %s %s: %s", resp.status, url_path, text)
+            _LOGGER.debug(
+                "Tuya API error %s %s: %s",
+                resp.status,
+                url_path,
+                raw[:512].decode(errors="replace"),
+            )
             resp.raise_for_status()
-        try:
-            return json.loads(text)
-        except Exception:
+        if not isinstance(data, dict):
+            _LOGGER.warning(
+                "Unexpected Tuya API response for %s %s: %s", method, url_path, data
+            )
             return {}
+        if not data.get("success", True):
+            self.metrics.record_error_code(endpoint, data.get("code", "unknown"))
+            if token and self._is_token_invalid_error(data):
+                self._token_rejected(token)
+        return data
 
-    async def async_get_token(self) -> str:
+    async def async_get_token(self, deadline: float | None = None) -> str:
         if self.token and time.time() < self.token_expiry - 30:
             return self.token
 
         url_path = "/v1.0/token?grant_type=1"
-        data = await self._async_request("GET", url_path, body="", include_token=False)
+        with span("token"):
+            data = await self._async_request(
+                "GET", url_path, body="", include_token=False, deadline=deadline
+            )
         result = data.get("result") or {}
-        self.token = result.get("access_token")
+        token = result.get("access_token")
+        # Concurrent callers share one token response; count it once
+        if token and token != self.token:
+            self.metrics.token_refreshes += 1
+        self.token = token
         expire = result.get("expire_time")
         if expire is None:
             self.token_expiry = time.time() + 7000
@@ -197,46 +997,89 @@ class TuyaAPI:
             self.token_expiry = time.time() + int(expire)
         return self.token
 
-    async def async_send_command(self, device_id: str, commands: list):
-        """Send command to device with automatic token retry on error 1010."""
+    async def _async_token_request(
+        self, method: str, url_path: str, what: str, deadline: float, **kwargs
+    ) -> dict:
+        """Make a token-bearing request, refreshing the token once on 1010.
+
+        `what` describes the call for logs. Raises TuyaAPIError if the new
+        token is rejected too.
+        """
         for attempt in range(2):
-            await self.async_get_token()
-            body_str = json.dumps({"commands": commands})
-            url_path = f"/v1.0/iot-03/devices/{device_id}/commands"
-            _LOGGER.debug("Sending Tuya command to %s: %s", device_id, commands)
+            await self.async_get_token(deadline)
             data = await self._async_request(
-                "POST", url_path, body=body_str, include_token=True
+                method, url_path, include_token=True, deadline=deadline, **kwargs
             )
+            if not self._is_token_invalid_error(data):
+                return data
+            if attempt == 0:
+                _LOGGER.warning("ERROR 1010 (Token Invalid) detected when %s", what)
+        _LOGGER.error("ERROR 1010 persists after token refresh.")
+        _LOGGER.error("Check your API credentials.")
+        raise TuyaAPIError(
+            f"Tuya API error after token refresh: {data.get('msg', 'Unknown error')} "
+            f"(code: {data.get('code', 'unknown')})"
+        )
 
-            if self._is_token_invalid_error(data):
-                if attempt == 0:
-                    _LOGGER.warning(
-                        "ERROR 1010 (Token Invalid) detected when sending command"
-                    )
-                    _LOGGER.warning("Device %s token invalid", device_id)
-                    _LOGGER.info("Clearing cache for device %s", device_id)
-                    self._clear_token()
-                    continue
-                else:
-                    error_msg = data.get("msg", "Unknown error")
-                    error_code = data.get("code", "unknown")
-                    _LOGGER.error("ERROR 1010 persists after token refresh.")
-                    _LOGGER.error("Check your API credentials.")
-                    err = "Tuya API error after token refresh: {} (code: {})".format(
-                        error_msg, error_code
-                    )
-                    raise Exception(err)
+    async def async_send_command(self, device_id: str, commands: list):
+        """Send command to device with automatic token retry on error 1010."""
+        with span("send_command", device_id=device_id, commands=len(commands)):
+            deadline = self._deadline("command")
+            for attempt in range(2):
+                await self.async_get_token(deadline)
+                body_str = json.dumps({"commands": commands})
+                url_path = f"/v1.0/iot-03/devices/{device_id}/commands"
+                _LOGGER.debug(
+                    "Sending Tuya command to %s: %s (trace %s)",
+                    device_id,
+                    commands,
+                    current_trace_id(),
+                )
+                data = await self._async_request(
+                    "POST",
+                    url_path,
+                    body=body_str,
+                    include_token=True,
+                    deadline=deadline,
+                )
+
+                if self._is_token_invalid_error(data):
+                    if attempt == 0:
+                        _LOGGER.warning(
+                            "ERROR 1010 (Token Invalid) detected when sending command"
+                        )
+                        _LOGGER.warning("Device %s token invalid", device_id)
+                        continue
+                    else:
+                        error_msg = data.get("msg", "Unknown error")
+                        error_code = data.get("code", "unknown")
+                        _LOGGER.error("ERROR 1010 persists after token refresh.")
+                        _LOGGER.error("Check your API credentials.")
+                        err = (
+                            "Tuya API error after token refresh: {} (code: {})".format(
+                                error_msg, error_code
+                            )
+                        )
+                        raise Exception(err)
 
-            _LOGGER.debug("Tuya command response for %s: %s", device_id, data)
-            return data
+                _LOGGER.debug("Tuya command response for %s: %s", device_id, data)
+                return data
 
-    async def async_get_status(self, device_id: str) -> list:
+    async def async_get_status(
+        self, device_id: str, max_retries: int = MAX_RETRIES
+    ) -> list:
         """Get device status with automatic token retry on error 1010."""
+        deadline = self._deadline("status")
         for attempt in range(2):
-            await self.async_get_token()
+            await self.async_get_token(deadline)
             url_path = f"/v1.0/iot-03/devices/{device_id}/status"
             data = await self._async_request(
-                "GET", url_path, body="", include_token=True
+                "GET",
+                url_path,
+                body="",
+                include_token=True,
+                deadline=deadline,
+                max_retries=max_retries,
             )
 
             if self._is_token_invalid_error(data):
@@ -245,8 +1088,6 @@ class TuyaAPI:
                         "ERROR 1010 (Token Invalid) detected when getting status"
                     )
                     _LOGGER.warning("Device %s token invalid", device_id)
-                    _LOGGER.info("Clearing cache for device %s", device_id)
-                    self._clear_token()
                     continue
                 else:
                     error_msg = data.get("msg", "Unknown error")
@@ -260,36 +1101,157 @@ class TuyaAPI:
 
             return data.get("result", [])
 
-    async def async_list_devices(self) -> list:
-        """List all devices using v2.0 API with pagination and token retry."""
-        all_devices = []
-        last_id = None
-        page_size = 20
-        retry_count = 0
-        max_retries = 1
+    async def async_get_shadow_properties(
+        self, device_id: str, codes: list, max_retries: int = MAX_RETRIES
+    ) -> list | None:
+        """Get selected DP values with their report times (v2.0 shadow API).
+
+        Each property is a dict with at least "code", "value" and "time" (ms
+        timestamp of the last report). Returns None when the project has no
+        access to the shadow API, so callers can fall back to
+        async_get_status; raises TuyaAPIError for any other rejection (rate
+        limit, device offline...).
+        """
+        data = await self._async_token_request(
+            "GET",
+            f"/v2.0/cloud/thing/{device_id}/shadow/properties",
+            "getting shadow properties",
+            self._deadline("status"),
+            params={"codes": ",".join(codes)},
+            max_retries=max_retries,
+        )
+        if not data.get("success"):
+            msg = data.get("msg", "Unknown error")
+            code = data.get("code", "unknown")
+            if code in API_UNAVAILABLE_CODES:
+                _LOGGER.debug(
+                    "Shadow properties not available for %s: %s (code: %s)",
+                    device_id,
+                    msg,
+                    code,
+                )
+                return None
+            raise TuyaAPIError(
+                f"Tuya API error getting shadow properties: {msg} (code: {code})"
+            )
+        result = data.get("result") or {}
+        properties = result.get("properties") if isinstance(result, dict) else None
+        return properties if isinstance(properties, list) else []
+
+    async def async_get_devices_info(
+        self, device_ids: list, max_retries: int = MAX_RETRIES
+    ) -> list:
+        """Fetch device details (name, category, online state...) in bulk.
+
+        IDs that do not belong to the account are absent from the result.
+        Raises TuyaAPIError if the cloud rejects a lookup for another reason
+        (rate limit, missing API permission...).
+        """
+        devices, _ = await self.async_lookup_devices(device_ids, max_retries)
+        return devices
+
+    async def async_lookup_devices(
+        self, device_ids: list, max_retries: int = MAX_RETRIES
+    ) -> tuple[list, list]:
+        """Look devices up in bulk; return (details, IDs the cloud rejected).
+
+        IDs are looked up DEVICE_INFO_BATCH_SIZE at a time. The second list
+        only holds IDs the cloud explicitly answered with a
+        DEVICE_UNKNOWN_CODES error for; a batch rejected that way is split to
+        isolate them. Any other rejection raises TuyaAPIError.
+        """
+        devices = []
+        unknown = []
+        for start in range(0, len(device_ids), DEVICE_INFO_BATCH_SIZE):
+            batch = list(device_ids[start : start + DEVICE_INFO_BATCH_SIZE])
+            found, rejected = await self._async_lookup_batch(batch, max_retries)
+            devices.extend(found)
+            unknown.extend(rejected)
+        return devices, unknown
+
+    async def _async_lookup_batch(
+        self, batch: list, max_retries: int = MAX_RETRIES
+    ) -> tuple[list, list]:
+        data = await self._async_token_request(
+            "GET",
+            "/v2.0/cloud/thing/batch",
+            "getting device info",
+            self._deadline("discovery"),
+            params={"device_ids": ",".join(batch)},
+            max_retries=max_retries,
+        )
+        if data.get("success"):
+            result = data.get("result") or []
+            return (result if isinstance(result, list) else []), []
+
+        error_msg = data.get("msg", "Unknown error")
+        error_code = data.get("code", "unknown")
+        if error_code not in DEVICE_UNKNOWN_CODES:
+            raise TuyaAPIError(
+                f"Tuya API error looking up devices: {error_msg} (code: {error_code})"
+            )
+        _LOGGER.debug(
+            "Device info lookup rejected for %s: %s (code: %s)",
+            batch,
+            error_msg,
+            error_code,
+        )
+        if len(batch) == 1:
+            return [], batch
+        middle = len(batch) // 2
+        found, unknown = await self._async_lookup_batch(batch[:middle], max_retries)
+        found_rest, unknown_rest = await self._async_lookup_batch(
+            batch[middle:], max_retries
+        )
+        return found + found_rest, unknown + unknown_rest
+
+    async def async_iter_devices(
+        self,
+        category: str | None = None,
+        page_size: int = DISCOVERY_PAGE_SIZE_MAX,
+        last_id: str | None = None,
+    ):
+        """Yield devices from the v2.0 device listing, one page at a time.
+
+        Pages are only fetched as the caller consumes devices, so callers can
+        stop iterating as soon as they have what they need. Raises
+        TuyaAPIError if the cloud rejects a page.
+
+        Args:
+            category: Only yield devices of this Tuya category (e.g. "kt").
+            page_size: Devices per request, capped at DISCOVERY_PAGE_SIZE_MAX.
+            last_id: Resume listing after this device ID, e.g. the ID of the
+                last device yielded by an earlier, interrupted iteration.
+        """
+        page_size = max(1, min(int(page_size), DISCOVERY_PAGE_SIZE_MAX))
+        token_retried = False
+        url_path = "/v2.0/cloud/thing/device"
 
         while True:
-            await self.async_get_token()
+            deadline = self._deadline("discovery")
+            await self.async_get_token(deadline)
 
             params = {"page_size": page_size}
             if last_id:
                 params["last_id"] = last_id
 
-            url_path = "/v2.0/cloud/thing/device"
             data = await self._async_request(
-                "GET", url_path, body="", include_token=True, params=params
+                "GET",
+                url_path,
+                body="",
+                include_token=True,
+                params=params,
+                deadline=deadline,
             )
 
             if self._is_token_invalid_error(data):
-                if retry_count < max_retries:
+                if not token_retried:
                     _LOGGER.warning(
                         "ERROR 1010 (Token Invalid) detected during device discovery."
                     )
-                    _LOGGER.info("Clearing token cache")
-                    _LOGGER.info("Retrying device discovery")
-                    self._clear_token()
-                    retry_count += 1
-                    last_id = None
+                    _LOGGER.info("Retrying device discovery page")
+                    token_retried = True
+                    # Keep the cursor: re-fetch the same page with a new token
                     continue
                 else:
                     error_msg = data.get("msg", "Unknown error")
@@ -301,38 +1263,46 @@ class TuyaAPI:
                     )
                     raise Exception(err)
 
-            retry_count = 0
+            token_retried = False
 
             if not data.get("success"):
+                # Raise rather than end the listing early: a truncated
+                # listing would look like devices were removed
                 error_msg = data.get("msg", "Unknown error")
                 error_code = data.get("code", "unknown")
-                _LOGGER.error(
-                    "Tuya API error listing devices: %s (code: %s)",
-                    error_msg,
-                    error_code,
+                raise TuyaAPIError(
+                    f"Tuya API error listing devices: {error_msg} "
+                    f"(code: {error_code})"
                 )
-                break
 
             devices = data.get("result", [])
 
             if not isinstance(devices, list):
-                _LOGGER.error("Expected list of devices, got: %s", type(devices))
-                break
+                raise TuyaAPIError(
+                    f"Expected list of devices, got: {type(devices).__name__}"
+                )
 
             if not devices:
-                break
+                return
 
-            all_devices.extend(devices)
+            for device in devices:
+                if category is None or device.get("category") == category:
+                    yield device
 
             if len(devices) < page_size:
-                break
+                return
 
             last_id = devices[-1].get("id")
             if not last_id:
-                break
+                return
 
             _LOGGER.debug("Fetched %d devices, continuing pagination...", len(devices))
 
+    async def async_list_devices(self, category: str | None = None) -> list:
+        """List all devices (optionally of one category) as a list."""
+        all_devices = [
+            device async for device in self.async_iter_devices(category=category)
+        ]
         _LOGGER.info(
             "Successfully fetched %d total devices from Tuya API", len(all_devices)
         )
@@ -1,11 +1,37 @@
 #!/usr/bin/env python3
-"""Simple Tuya status / command helper (synchronous, requests).
+"""Simple Tuya status / command helper.
+
+--status, --command and --watch are synchronous and use requests
+(TuyaHelper; Watcher polls through one requests session). --bulk is
+asynchronous and uses aiohttp (AsyncTuyaHelper).
 
 Usage examples:
   python3 tuya_status.py --client-id ID --client-secret SECRET --status DEVICE_ID
   python3 tuya_status.py --client-id ID --client-secret SECRET --command DEVICE_ID '{"commands":[{"code":"temp_set","value":2400}]}'
 
+Bulk mode fetches many devices concurrently over one connection pool and one
+token (needs aiohttp), printing one JSON line per device as it completes:
+  python3 tuya_status.py --client-id ID --client-secret SECRET --bulk ID1 ID2 ID3
+  python3 tuya_status.py --client-id ID --client-secret SECRET --bulk-file ids.txt
+  python3 tuya_status.py --client-id ID --client-secret SECRET --bulk-file - < ids
+
+Watch mode keeps one session and token, polls the devices (20 per request)
+every --interval seconds and prints only DP changes, optionally recording
+them to CSV (gzipped if the name ends in .gz):
+  python3 tuya_status.py --client-id ID --client-secret SECRET --watch ID1 ID2 \\
+      --interval 5 --record changes.csv.gz
+
 Pass --base-url to override region (default https://openapi.tuyaeu.com).
+
+--cassette-record FILE saves every request and response (secrets redacted)
+to a cassette; --cassette-replay FILE answers requests from one instead of
+the cloud, at recorded speed or --replay-speed times faster (0: no delay).
+Cassettes are interchangeable with the integration's record_cassette
+service.
+
+The access token is cached per credential under ~/.cache/starlight_ac_tuya
+(readable only by you) and reused across runs until it expires or the cloud
+rejects it; --no-token-cache turns this off.
 """
 
 import time
@@ -13,8 +39,12 @@ import hmac
 import hashlib
 import json
 import argparse
-import requests
-from typing import Optional
+import contextlib
+import csv
+import gzip
+import os
+import sys
+from datetime import datetime
 
 REGION_URLS = {
     "eu": "https://openapi.tuyaeu.com",
@@ -23,6 +53,19 @@ REGION_URLS = {
     "in": "https://openapi.tuyain.com",
 }
 
+# Devices per batch status request
+STATUS_BATCH_SIZE = 20
+
+# Tuya error code for an expired or revoked access token
+TOKEN_INVALID = 1010
+# Batch status errors meaning this project can't use the endpoint at all:
+# "permission deny", "uri path invalid" and "API not subscribed"
+BATCH_UNAVAILABLE_CODES = frozenset({1106, 1108, 28841101})
+TOKEN_CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+    "starlight_ac_tuya",
+)
+
 
 def sha256_hex(data: str) -> str:
     return hashlib.sha256(data.encode()).hexdigest()
@@ -36,19 +79,67 @@ def get_timestamp_ms() -> str:
     return str(int(time.time() * 1000))
 
 
-class TuyaHelper:
+def token_cache_path(client_id: str, client_secret: str, base_url: str) -> str:
+    """Cache file for one set of credentials and region."""
+    key = sha256_hex(f"{client_id}\n{client_secret}\n{base_url}")[:16]
+    return os.path.join(TOKEN_CACHE_DIR, f"token-{key}.json")
+
+
+def load_cassette_module():
+    """The integration's cassette.py, loaded without Home Assistant."""
+    import importlib.util
+
+    path = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "custom_components",
+        "starlight_ac_tuya",
+        "cassette.py",
+    )
+    spec = importlib.util.spec_from_file_location("starlight_ac_tuya_cassette", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _replayed(status: int, raw: bytes):
+    text = raw.decode(errors="replace")
+    if status >= 400:
+        raise RuntimeError(f"HTTP {status} (replayed): {text[:200]}")
+    try:
+        return json.loads(text)
+    except ValueError:
+        return {"raw": text}
+
+
+class BatchNotPermitted(RuntimeError):
+    """The batch status endpoint isn't available to this project."""
+
+
+class _TuyaCredentials:
+    """Request signing and the token cache, shared by both helpers.
+
+    Subclasses do the I/O: _request, _send and get_token.
+    """
+
     def __init__(
-        self, client_id: str, client_secret: str, base_url: Optional[str] = None
+        self,
+        client_id: str,
+        client_secret: str,
+        base_url: str | None = None,
+        token_cache: str | None = None,
     ):
         self.client_id = client_id
         self.client_secret = client_secret
         self.base_url = base_url or REGION_URLS["eu"]
         self.token = None
         self.token_expiry = 0
+        # Optional file keeping the token across runs (see token_cache_path)
+        self.token_cache = token_cache
+        # Optional cassette Recorder / Player (see load_cassette_module)
+        self.recorder = None
+        self.player = None
 
-    def _request(
-        self, method: str, path: str, body: str = "", include_token: bool = True
-    ):
+    def _headers(self, method: str, path: str, body: str, include_token: bool):
         t = get_timestamp_ms()
         content_hash = sha256_hex(body)
         string_to_sign = method + "\n" + content_hash + "\n" + "\n" + path
@@ -68,20 +159,50 @@ class TuyaHelper:
             headers["access_token"] = self.token
         if body:
             headers["Content-Type"] = "application/json"
+        return headers
 
-        url = self.base_url + path
-        resp = requests.request(method, url, headers=headers, data=body, timeout=10)
-        resp.raise_for_status()
+    def _token_valid(self) -> bool:
+        """Whether a usable token is in memory, loading the cache if needed."""
+        if self.token is None and self.token_cache:
+            try:
+                with open(self.token_cache, encoding="utf-8") as file:
+                    cached = json.load(file)
+                self.token = cached["access_token"]
+                self.token_expiry = float(cached["expiry"])
+            except (OSError, ValueError, KeyError, TypeError):
+                pass
+        return bool(self.token) and time.time() < self.token_expiry - 30
+
+    def _token_rejected(self, data: dict, used: str | None) -> bool:
+        """Drop the token (and its cache) if the cloud rejected it."""
+        if not isinstance(data, dict) or data.get("code") != TOKEN_INVALID:
+            return False
+        if self.token == used:
+            self.token = None
+            self.token_expiry = 0
+            if self.token_cache:
+                try:
+                    os.remove(self.token_cache)
+                except OSError:
+                    pass
+        return True
+
+    def _save_token(self):
+        directory = os.path.dirname(self.token_cache)
         try:
-            return resp.json()
-        except Exception:
-            return {"raw": resp.text}
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+            os.chmod(directory, 0o700)
+            tmp = f"{self.token_cache}.{os.getpid()}.tmp"
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as file:
+                json.dump(
+                    {"access_token": self.token, "expiry": self.token_expiry}, file
+                )
+            os.replace(tmp, self.token_cache)
+        except OSError as e:
+            print(f"Could not cache token: {e}", file=sys.stderr)
 
-    def get_token(self) -> str:
-        if self.token and time.time() < self.token_expiry - 30:
-            return self.token
-        path = "/v1.0/token?grant_type=1"
-        data = self._request("GET", path, body="", include_token=False)
+    def _store_token(self, data: dict) -> str:
         result = data.get("result") or {}
         self.token = result.get("access_token")
         expire = result.get("expire_time")
@@ -91,14 +212,82 @@ class TuyaHelper:
             self.token_expiry = time.time() + 7000
         else:
             self.token_expiry = time.time() + int(expire)
+        if self.token_cache:
+            self._save_token()
         return self.token
 
+
+class TuyaHelper(_TuyaCredentials):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Optional requests.Session to reuse connections across calls
+        self.session = None
+
+    def _request(
+        self, method: str, path: str, body: str = "", include_token: bool = True
+    ):
+        used = self.token
+        data = self._send(method, path, body, include_token)
+        if include_token and self._token_rejected(data, used):
+            self.get_token()
+            data = self._send(method, path, body, include_token)
+        return data
+
+    def _send(self, method: str, path: str, body: str, include_token: bool):
+        if self.player is not None:
+            item, status, raw = self.player.lookup(method, path)
+            time.sleep(self.player.delay(item))
+            return _replayed(status, raw)
+
+        # Imported here so bulk mode only needs aiohttp
+        import requests
+
+        headers = self._headers(method, path, body, include_token)
+        url = self.base_url + path
+        http = self.session or requests
+        resp = http.request(method, url, headers=headers, data=body, timeout=10)
+        if self.recorder is not None:
+            self.recorder.record(
+                method,
+                path,
+                body,
+                resp.status_code,
+                resp.content,
+                resp.elapsed.total_seconds(),
+            )
+        resp.raise_for_status()
+        try:
+            return resp.json()
+        except Exception:
+            return {"raw": resp.text}
+
+    def get_token(self) -> str:
+        if self._token_valid():
+            return self.token
+        path = "/v1.0/token?grant_type=1"
+        data = self._request("GET", path, body="", include_token=False)
+        return self._store_token(data)
+
     def get_status(self, device_id: str):
         self.get_token()
         path = f"/v1.0/iot-03/devices/{device_id}/status"
         data = self._request("GET", path, body="", include_token=True)
         return data.get("result", [])
 
+    def get_status_batch(self, device_ids: list) -> dict:
+        """Status of up to STATUS_BATCH_SIZE devices in one request, by ID."""
+        self.get_token()
+        path = f"/v1.0/iot-03/devices/status?device_ids={','.join(device_ids)}"
+        data = self._request("GET", path, body="", include_token=True)
+        if not data.get("success", True):
+            error = f"{data.get('code')}: {data.get('msg')}"
+            if data.get("code") in BATCH_UNAVAILABLE_CODES:
+                raise BatchNotPermitted(error)
+            raise RuntimeError(error)
+        return {
+            item.get("id"): item.get("status", []) for item in data.get("result") or []
+        }
+
     def send_command(self, device_id: str, commands: list):
         self.get_token()
         path = f"/v1.0/iot-03/devices/{device_id}/commands"
@@ -107,10 +296,324 @@ class TuyaHelper:
         return data
 
 
+class AsyncTuyaHelper(_TuyaCredentials):
+    """Async TuyaHelper over one pooled aiohttp session, for bulk reads."""
+
+    def __init__(
+        self,
+        client_id: str,
+        client_secret: str,
+        base_url: str | None = None,
+        token_cache: str | None = None,
+        concurrency: int = 10,
+    ):
+        super().__init__(client_id, client_secret, base_url, token_cache)
+        self.concurrency = concurrency
+        self._session = None
+        self._token_lock = None
+
+    async def __aenter__(self):
+        import asyncio
+
+        import aiohttp
+
+        self._aiohttp = aiohttp
+        self._token_lock = asyncio.Lock()
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.concurrency),
+            timeout=aiohttp.ClientTimeout(total=10),
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._session.close()
+
+    async def _request(
+        self, method: str, path: str, body: str = "", include_token: bool = True
+    ):
+        used = self.token
+        data = await self._send(method, path, body, include_token)
+        if include_token and self._token_rejected(data, used):
+            await self.get_token()
+            data = await self._send(method, path, body, include_token)
+        return data
+
+    async def _send(self, method: str, path: str, body: str, include_token: bool):
+        import asyncio
+
+        if self.player is not None:
+            item, status, raw = self.player.lookup(method, path)
+            await asyncio.sleep(self.player.delay(item))
+            return _replayed(status, raw)
+        headers = self._headers(method, path, body, include_token)
+        started = time.monotonic()
+        async with self._session.request(
+            method, self.base_url + path, headers=headers, data=body
+        ) as resp:
+            raw = await resp.read()
+            if self.recorder is not None:
+                self.recorder.record(
+                    method, path, body, resp.status, raw, time.monotonic() - started
+                )
+            resp.raise_for_status()
+        text = raw.decode(errors="replace")
+        try:
+            return json.loads(text)
+        except ValueError:
+            return {"raw": text}
+
+    async def get_token(self) -> str:
+        # One token for all concurrent requests
+        async with self._token_lock:
+            if self._token_valid():
+                return self.token
+            path = "/v1.0/token?grant_type=1"
+            data = await self._request("GET", path, body="", include_token=False)
+            return self._store_token(data)
+
+    async def get_status(self, device_id: str):
+        await self.get_token()
+        path = f"/v1.0/iot-03/devices/{device_id}/status"
+        data = await self._request("GET", path, body="", include_token=True)
+        if not data.get("success", True):
+            raise RuntimeError(f"{data.get('code')}: {data.get('msg')}")
+        return data.get("result", [])
+
+
+def read_device_ids(ids: list, path: str | None) -> list:
+    """Device IDs from arguments and a file ("-" for stdin), in order, once."""
+    found = list(ids or [])
+    if path:
+        with (
+            contextlib.nullcontext(sys.stdin)
+            if path == "-"
+            else open(path, encoding="utf-8")
+        ) as file:
+            for line in file:
+                line = line.split("#", 1)[0]
+                found.extend(line.replace(",", " ").split())
+    return list(dict.fromkeys(found))
+
+
+async def bulk_status(helper: AsyncTuyaHelper, device_ids: list) -> int:
+    """Print one NDJSON line per device as it completes; return failures."""
+    import asyncio
+
+    queue = iter(device_ids)
+    failures = 0
+
+    async def _worker():
+        nonlocal failures
+        for device_id in queue:
+            started = time.monotonic()
+            line = {"device_id": device_id}
+            try:
+                line["status"] = await helper.get_status(device_id)
+            except Exception as e:
+                failures += 1
+                line["error"] = str(e) or type(e).__name__
+            line["elapsed_ms"] = round((time.monotonic() - started) * 1000, 1)
+            print(json.dumps(line), flush=True)
+
+    async with helper:
+        await asyncio.gather(*(_worker() for _ in range(helper.concurrency)))
+    return failures
+
+
+def make_helper(args, cassette: tuple, cls=TuyaHelper, **kwargs):
+    """Build a helper from the command line options.
+
+    cassette is the (recorder, player) pair, either of which may be None.
+    """
+    recorder, player = cassette
+    token_cache = None
+    # A replayed token is redacted, so it must not reach the cache
+    if not args.no_token_cache and player is None:
+        token_cache = token_cache_path(
+            args.client_id, args.client_secret, args.base_url or REGION_URLS["eu"]
+        )
+    helper = cls(
+        args.client_id,
+        args.client_secret,
+        base_url=args.base_url,
+        token_cache=token_cache,
+        **kwargs,
+    )
+    helper.recorder = recorder
+    helper.player = player
+    return helper
+
+
+def run_bulk(helper: AsyncTuyaHelper, device_ids: list) -> int:
+    import asyncio
+
+    try:
+        import aiohttp  # noqa: F401
+    except ImportError:
+        print("Bulk mode needs aiohttp: pip install aiohttp", file=sys.stderr)
+        return 2
+    started = time.monotonic()
+    failures = asyncio.run(bulk_status(helper, device_ids))
+    print(
+        f"{len(device_ids)} devices, {len(device_ids) - failures} ok, "
+        f"{failures} failed in {time.monotonic() - started:.1f}s",
+        file=sys.stderr,
+    )
+    return 1 if failures else 0
+
+
+class Watcher:
+    """Poll devices and report DP changes.
+
+    Only the last value of each DP is kept, so memory stays constant however
+    long it runs.
+    """
+
+    def __init__(self, helper: TuyaHelper, device_ids: list, record=None):
+        self.helper = helper
+        self.device_ids = device_ids
+        self.batched = len(device_ids) > 1
+        self.last = {}
+        self.failing = set()
+        self.changes = 0
+        self.polls = 0
+        self._writer = csv.writer(record) if record is not None else None
+        self._record = record
+
+    def poll(self):
+        """Fetch every device once and report what changed."""
+        stamp = datetime.now().isoformat(timespec="seconds")
+        for device_id, status, error in self._fetch():
+            if error is not None:
+                if device_id not in self.failing:
+                    self.failing.add(device_id)
+                    print(f"{stamp} {device_id} error: {error}", flush=True)
+                continue
+            if device_id in self.failing:
+                self.failing.discard(device_id)
+                print(f"{stamp} {device_id} recovered", flush=True)
+            self._diff(stamp, device_id, {dp["code"]: dp["value"] for dp in status})
+        self.polls += 1
+        if self._record is not None:
+            self._record.flush()
+
+    def _fetch(self):
+        """Yield (device_id, status, error) for every device."""
+        if not self.batched:
+            for device_id in self.device_ids:
+                yield self._fetch_one(device_id)
+            return
+        for start in range(0, len(self.device_ids), STATUS_BATCH_SIZE):
+            chunk = self.device_ids[start : start + STATUS_BATCH_SIZE]
+            try:
+                results = self.helper.get_status_batch(chunk)
+            except BatchNotPermitted as e:
+                print(
+                    f"Batch status not available ({e}), polling devices one by one",
+                    file=sys.stderr,
+                )
+                self.batched = False
+                for device_id in self.device_ids[start:]:
+                    yield self._fetch_one(device_id)
+                return
+            except Exception as e:
+                for device_id in chunk:
+                    yield device_id, None, str(e) or type(e).__name__
+                continue
+            for device_id in chunk:
+                if device_id in results:
+                    yield device_id, results[device_id], None
+                else:
+                    yield device_id, None, "no status returned"
+
+    def _fetch_one(self, device_id: str):
+        try:
+            self.helper.get_token()
+            data = self.helper._request(
+                "GET", f"/v1.0/iot-03/devices/{device_id}/status"
+            )
+        except Exception as e:
+            return device_id, None, str(e) or type(e).__name__
+        if not data.get("success", True):
+            return device_id, None, f"{data.get('code')}: {data.get('msg')}"
+        return device_id, data.get("result", []), None
+
+    def _diff(self, stamp: str, device_id: str, values: dict):
+        old = self.last.get(device_id)
+        self.last[device_id] = values
+        if old is None:
+            state = " ".join(f"{code}={json.dumps(v)}" for code, v in values.items())
+            print(f"{stamp} {device_id} {state}", flush=True)
+            changed = [(code, None, v) for code, v in values.items()]
+        else:
+            changed = [
+                (code, old.get(code), values.get(code))
+                for code in {**old, **values}
+                if old.get(code) != values.get(code)
+            ]
+            for code, before, after in changed:
+                self.changes += 1
+                print(
+                    f"{stamp} {device_id} {code}: "
+                    f"{json.dumps(before)} -> {json.dumps(after)}",
+                    flush=True,
+                )
+        if self._writer is not None:
+            for code, before, after in changed:
+                self._writer.writerow(
+                    [
+                        stamp,
+                        device_id,
+                        code,
+                        "" if before is None else json.dumps(before),
+                        "" if after is None else json.dumps(after),
+                    ]
+                )
+
+
+@contextlib.contextmanager
+def open_record(path: str):
+    """Open a CSV recording for appending, writing the header if it is new."""
+    new = not os.path.exists(path) or os.path.getsize(path) == 0
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "at", newline="", encoding="utf-8") as file:
+        if new:
+            csv.writer(file).writerow(["time", "device_id", "code", "old", "new"])
+        yield file
+
+
+def run_watch(args, helper: TuyaHelper, device_ids: list) -> int:
+    if helper.player is None:
+        import requests
+
+        helper.session = requests.Session()
+    with (
+        open_record(args.record) if args.record else contextlib.nullcontext()
+    ) as record:
+        watcher = Watcher(helper, device_ids, record)
+        next_poll = time.monotonic()
+        try:
+            while True:
+                watcher.poll()
+                next_poll += args.interval
+                time.sleep(max(0.0, next_poll - time.monotonic()))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if helper.session is not None:
+                helper.session.close()
+    print(
+        f"{watcher.polls} polls of {len(device_ids)} devices, "
+        f"{watcher.changes} changes",
+        file=sys.stderr,
+    )
+    return 0
+
+
 def main():
     p = argparse.ArgumentParser()
-    p.add_argument("--client-id", required=True)
-    p.add_argument("--client-secret", required=True)
+    p.add_argument("--client-id", help="Required unless replaying a cassette")
+    p.add_argument("--client-secret", help="Required unless replaying a cassette")
     p.add_argument("--base-url", default=None)
     p.add_argument("--status", help="Device ID to fetch status for")
     p.add_argument(
@@ -120,9 +623,97 @@ def main():
         "--command-json",
         help='JSON string for commands, e.g. "{"commands":[{"code":"temp_set","value":2400}]}"',
     )
+    p.add_argument(
+        "--bulk", nargs="+", metavar="DEVICE_ID", help="Device IDs to fetch status for"
+    )
+    p.add_argument(
+        "--bulk-file",
+        help="File of device IDs for --bulk or --watch, one or more per line "
+        "(- for stdin)",
+    )
+    p.add_argument(
+        "--concurrency",
+        type=int,
+        default=10,
+        help="Bulk mode: requests in flight at once (default 10)",
+    )
+    p.add_argument(
+        "--watch",
+        nargs="*",
+        metavar="DEVICE_ID",
+        help="Poll these devices and print DP changes until interrupted",
+    )
+    p.add_argument(
+        "--interval",
+        type=float,
+        default=5,
+        help="Watch mode: seconds between polls (default 5)",
+    )
+    p.add_argument("--record", help="Watch mode: append DP changes to this CSV file")
+    p.add_argument(
+        "--no-token-cache",
+        action="store_true",
+        help="Don't read or write the access token cache",
+    )
+    p.add_argument(
+        "--cassette-record",
+        metavar="FILE",
+        help="Record requests and responses to this cassette (.gz to compress)",
+    )
+    p.add_argument(
+        "--cassette-replay",
+        metavar="FILE",
+        help="Answer requests from this cassette instead of the cloud",
+    )
+    p.add_argument(
+        "--replay-speed",
+        type=float,
+        default=1.0,
+        help="Replay response times this many times faster; 0 for no delay",
+    )
     args = p.parse_args()
+    if args.cassette_replay:
+        args.client_id = args.client_id or "replay"
+        args.client_secret = args.client_secret or "replay"
+    elif not (args.client_id and args.client_secret):
+        p.error("--client-id and --client-secret are required")
+
+    recorder = player = None
+    if args.cassette_record or args.cassette_replay:
+        cassette = load_cassette_module()
+        if args.cassette_replay:
+            player = cassette.Player.load(args.cassette_replay, args.replay_speed)
+        if args.cassette_record:
+            recorder = cassette.Recorder()
+    try:
+        run(p, args, (recorder, player))
+    finally:
+        if recorder is not None:
+            count = recorder.write(args.cassette_record)
+            print(
+                f"Recorded {count} requests to {args.cassette_record}", file=sys.stderr
+            )
+        if player is not None and player.misses:
+            print(f"{player.misses} requests were not in the cassette", file=sys.stderr)
+
+
+def run(p, args, cassette: tuple):
+    if args.watch is not None:
+        device_ids = read_device_ids(args.watch, args.bulk_file)
+        if not device_ids:
+            p.error("no device IDs given")
+        sys.exit(run_watch(args, make_helper(args, cassette), device_ids))
+
+    if args.bulk or args.bulk_file:
+        device_ids = read_device_ids(args.bulk, args.bulk_file)
+        if not device_ids:
+            p.error("no device IDs given")
+        helper = make_helper(
+            args, cassette, AsyncTuyaHelper, concurrency=args.concurrency
+        )
+        sys.exit(run_bulk(helper, device_ids))
 
-    helper = TuyaHelper(args.client_id, args.client_secret, base_url=args.base_url)
+    helper = make_helper(args, cassette)
 
     if args.status:
         status = helper.get_status(args.status)